@@ -1,12 +1,14 @@
-# 随机效应回归模型
-from linearmodels.panel import RandomEffects
+# 随机效应回归模型（Swamy-Arora 方差分量，含常数项）
+from 固定效应估计 import fit_random_effects, hausman_test, mundlak_test
 
-# 随机效应模型：注意这里不在公式中加入 "RandomEffects"
-random_effect_model = RandomEffects.from_formula('GWG ~ FDI + GDP_per_capita + Total_average_wage + HDI + Fertility', data)
-random_effect_result = random_effect_model.fit()
+exog = ['FDI', 'GDP_per_capita', 'Total_average_wage', 'HDI', 'Fertility']
+random_effect_result = fit_random_effects(data.reset_index(), 'GWG', exog)
+print(random_effect_result.summary)
 
-# Hausman检验：比较固定效应模型和随机效应模型
-from linearmodels.panel import compare
-results = compare({'Fixed Effects': fixed_effect_result, 'Random Effects': random_effect_result})
-print(results)
+# Hausman检验：直接使用已拟合的固定效应和随机效应结果，不再重新估计
+hausman = hausman_test(fixed_effect_result, random_effect_result)
+print(f"Hausman检验: χ² = {hausman['统计量']:.4f}, 自由度 = {hausman['自由度']}, P值 = {hausman['P值']:.4f}")
 
+# Mundlak检验：回归形式的 Hausman 检验，按国家聚类，对异方差和序列相关稳健
+mundlak = mundlak_test(data.reset_index(), 'GWG', exog)
+print(f"Mundlak检验: χ² = {mundlak['统计量']:.4f}, 自由度 = {mundlak['自由度']}, P值 = {mundlak['P值']:.4f}")
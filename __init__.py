@@ -1,33 +1,17 @@
 import pandas as pd
 import numpy as np
 
+from 模拟数据 import simulate_panel
+
 # 设置随机种子，以确保结果可复现
 np.random.seed(42)
 
-# 模拟20个国家（编号1到20）和25年（2000到2024）
-countries = [f'Country_{i}' for i in range(1, 21)]
-years = list(range(2000, 2025))
-
-# 模拟数据
-n_countries = len(countries)
-n_years = len(years)
-
-# 创建面板数据框架
-data = pd.DataFrame({
-    'Country': np.random.choice(countries, n_countries * n_years, replace=True),
-    'Year': np.random.choice(years, n_countries * n_years, replace=True),
-    'FDI': np.random.uniform(0, 5, n_countries * n_years),  # FDI占GDP的比重
-    'GDP_per_capita': np.random.uniform(10000, 50000, n_countries * n_years),  # 人均GDP
-    'Total_average_wage': np.random.uniform(1000, 5000, n_countries * n_years),  # 总平均工资
-    'HDI': np.random.uniform(0.7, 1.0, n_countries * n_years),  # 人类发展指数
-    'Fertility': np.random.uniform(1.2, 3.5, n_countries * n_years),  # 生育率
-    'GWG': np.random.uniform(0, 0.5, n_countries * n_years),  # 性别工资差距
-    'FEM_EMP': np.random.uniform(0, 1, n_countries * n_years), # 女性就业比例
-    'HIST_TRADE': np.random.uniform(0, 1, n_countries * n_years)  # 历史贸易关系指数
-})
+# 模拟20个国家和25年（2000到2024）的平衡面板：国家、年份固定效应，HIST_TRADE 为 FDI 的有效工具变量，
+# FEM_EMP 为中介变量；truth 为数据生成过程中的真实系数，可与下面的估计结果对照
+data, truth = simulate_panel(n_countries=20, n_years=25, first_year=2000, seed=42)
 
 # 将 'Country' 和 'Year' 设置为索引，模拟面板数据结构
-data.set_index(['Country', 'Year'], inplace=True)
+data = data.set_index(['Country', 'Year'])
 
 # 查看前几行数据
 print(data.head())
@@ -64,22 +48,23 @@ total_effect = direct_effect + indirect_effect
 
 print(f"直接效应 (FDI 对 GWG 的影响): {direct_effect:.4f}")
 print(f"总效应 (Direct Effect + Indirect Effect): {total_effect:.4f}")
-from linearmodels.panel import PanelOLS
-
-# 第一阶段：回归FDI与工具变量HIST_TRADE
 
-# 输出第一阶段回归结果
-print(first_stage_result.summary)
+# Sobel 检验与按国家聚类的自助置信区间，检验间接效应是否显著
+from 中介效应 import mediation_analysis
+mediation, _ = mediation_analysis(data.reset_index(), 'FDI', 'FEM_EMP', 'GWG',
+                                  ['GDP_per_capita', 'Total_average_wage', 'HDI', 'Fertility'],
+                                  time_effects=False, n_boot=5000, seed=0)
+print("中介效应检验结果：")
+print(mediation.T)
+from 工具变量估计 import fit_absorbed_iv
 
-# 使用第一阶段的预测结果作为新的FDI
-data['predicted_FDI'] = first_stage_result.fitted_values
+# 两阶段最小二乘：以 HIST_TRADE 作为 FDI 的工具变量，吸收国家固定效应
+# 直接把第一阶段拟合值代入第二阶段回归得到的标准误是错误的，这里同时估计两个阶段
+iv_result = fit_absorbed_iv(data.reset_index(), 'GWG', ['GDP_per_capita', 'Total_average_wage', 'HDI', 'Fertility'],
+                            endog=['FDI'], instruments=['HIST_TRADE'], time_effects=False)
 
-# 第二阶段：回归性别工资差距（GWG）与预测的FDI
-second_stage = PanelOLS.from_formula('GWG ~ predicted_FDI + GDP_per_capita + Total_average_wage + HDI + Fertility + EntityEffects', data)
-second_stage_result = second_stage.fit()
-
-# 输出第二阶段回归结果
-print(second_stage_result.summary)
+# 输出第一阶段诊断、第二阶段回归结果以及弱工具变量与内生性检验
+print(iv_result.summary)
 
 from linearmodels.panel import PanelOLS
 
@@ -92,22 +77,28 @@ fixed_effect_result = fixed_effect_model.fit()
 # 输出回归结果
 print(fixed_effect_result.summary)
 
-from linearmodels.panel import RandomEffects
+# 随机效应回归模型（Swamy-Arora 方差分量，含常数项）
+from 固定效应估计 import fit_random_effects, hausman_test, mundlak_test
+
+exog = ['FDI', 'GDP_per_capita', 'Total_average_wage', 'HDI', 'Fertility']
+random_effect_result = fit_random_effects(data.reset_index(), 'GWG', exog)
+print(random_effect_result.summary)
 
-# 随机效应模型：注意这里不在公式中加入 "RandomEffects"
-random_effect_model = RandomEffects.from_formula('GWG ~ FDI + GDP_per_capita + Total_average_wage + HDI + Fertility', data)
-random_effect_result = random_effect_model.fit()
+# Hausman检验：直接使用已拟合的固定效应和随机效应结果，不再重新估计
+hausman = hausman_test(fixed_effect_result, random_effect_result)
+print(f"Hausman检验: χ² = {hausman['统计量']:.4f}, 自由度 = {hausman['自由度']}, P值 = {hausman['P值']:.4f}")
 
-# Hausman检验：比较固定效应模型和随机效应模型
-from linearmodels.panel import compare
-results = compare({'Fixed Effects': fixed_effect_result, 'Random Effects': random_effect_result})
-print(results)
+# Mundlak检验：回归形式的 Hausman 检验，按国家聚类，对异方差和序列相关稳健
+mundlak = mundlak_test(data.reset_index(), 'GWG', exog)
+print(f"Mundlak检验: χ² = {mundlak['统计量']:.4f}, 自由度 = {mundlak['自由度']}, P值 = {mundlak['P值']:.4f}")
 
-# 引入FDI的滞后变量
-data['FDI_lag'] = data.groupby('Country')['FDI'].shift(1)
+# 引入FDI的滞后变量：按实际年份对齐，上一年不在数据中时滞后为缺失，而不是取同一国家的上一条记录
+from 面板特征 import panel_features
+lag_data, _ = panel_features(data, ['FDI'], lags=[1])
+lag_data = lag_data.rename(columns={'FDI_lag1': 'FDI_lag'})
 
 # 固定效应回归，包含滞后变量
-fixed_effect_lag_model = PanelOLS.from_formula('GWG ~ FDI_lag + GDP_per_capita + Total_average_wage + HDI + Fertility + EntityEffects', data)
+fixed_effect_lag_model = PanelOLS.from_formula('GWG ~ FDI_lag + GDP_per_capita + Total_average_wage + HDI + Fertility + EntityEffects', lag_data)
 fixed_effect_lag_result = fixed_effect_lag_model.fit()
 
 # 输出结果
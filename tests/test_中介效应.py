@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from 中介效应 import mediation_analysis
+from 固定效应估计 import fit_absorbed_ols
+from 模拟数据 import simulate_panel
+
+
+def test_bootstrap_draws_independent_of_n_jobs():
+    # n_boot 不是分块大小的整数倍，最后一块较小
+    panel, _ = simulate_panel(n_countries=40, n_years=12, seed=1)
+    kwargs = dict(treatment='FDI', mediator='FEM_EMP', outcome='GWG',
+                  controls=['GDP_per_capita', 'Total_average_wage', 'HDI', 'Fertility'], n_boot=2500, seed=7)
+    table_1, draws_1 = mediation_analysis(panel, n_jobs=1, **kwargs)
+    table_4, draws_4 = mediation_analysis(panel, n_jobs=4, **kwargs)
+    assert len(draws_1) == 2500
+    np.testing.assert_array_equal(draws_1.to_numpy(), draws_4.to_numpy())
+    np.testing.assert_array_equal(table_1.to_numpy(), table_4.to_numpy())
+
+
+@pytest.mark.parametrize('entity_effects, time_effects', [(True, True), (True, False), (False, True)])
+def test_analytic_std_errors_match_clustered_fits(entity_effects, time_effects):
+    panel, _ = simulate_panel(n_countries=20, n_years=10, unbalanced=0.2, seed=3)
+    controls = ['GDP_per_capita', 'Total_average_wage', 'HDI', 'Fertility']
+    options = dict(entity_effects=entity_effects, time_effects=time_effects)
+    table, _ = mediation_analysis(panel, 'FDI', 'FEM_EMP', 'GWG', controls, n_boot=10, **options)
+    outcome = fit_absorbed_ols(panel, 'GWG', ['FEM_EMP', 'FDI'] + controls, cov_type='clustered', **options)
+    assert table.loc['直接效应', '估计值'] == pytest.approx(outcome.params['FDI'], rel=1e-10)
+    assert table.loc['直接效应', '标准误(解析)'] == pytest.approx(outcome.std_errors['FDI'], rel=1e-10)
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from 固定效应估计 import fit_absorbed_ols
+from 模拟数据 import simulate_panel
+
+EXOG = ['FDI', 'GDP_per_capita', 'HDI', 'Fertility']
+
+
+def _dummy_ols(panel, entity_effects, time_effects):
+    """显式虚拟变量 OLS：返回 (系数, 同方差标准误)。"""
+    parts = [panel[EXOG].to_numpy(), np.ones((len(panel), 1))]
+    if entity_effects:
+        parts.append(pd.get_dummies(panel['Country'], drop_first=True, dtype=float).to_numpy())
+    if time_effects:
+        parts.append(pd.get_dummies(panel['Year'], drop_first=True, dtype=float).to_numpy())
+    x = np.column_stack(parts)
+    y = panel['GWG'].to_numpy()
+    beta, *_ = np.linalg.lstsq(x, y, rcond=None)
+    resid = y - x @ beta
+    cov = np.linalg.inv(x.T @ x) * (resid @ resid / (len(y) - x.shape[1]))
+    return beta[:len(EXOG)], np.sqrt(np.diag(cov))[:len(EXOG)]
+
+
+@pytest.mark.parametrize('entity_effects, time_effects', [(True, False), (False, True), (True, True)])
+def test_absorbed_ols_matches_dummy_ols(entity_effects, time_effects):
+    panel, _ = simulate_panel(n_countries=15, n_years=12, unbalanced=0.2, seed=4)
+    fit = fit_absorbed_ols(panel, 'GWG', EXOG, entity_effects=entity_effects, time_effects=time_effects)
+    params, std_errors = _dummy_ols(panel, entity_effects, time_effects)
+    np.testing.assert_allclose(fit.params[EXOG], params, rtol=1e-8)
+    np.testing.assert_allclose(fit.std_errors[EXOG], std_errors, rtol=1e-8)
+
+
+@pytest.mark.parametrize('cluster', ['entity', 'time', 'both'])
+@pytest.mark.parametrize('entity_effects, time_effects', [(True, False), (False, True), (True, True)])
+def test_clustered_std_errors_match_linearmodels(entity_effects, time_effects, cluster):
+    linearmodels = pytest.importorskip('linearmodels.panel')
+    panel, _ = simulate_panel(n_countries=15, n_years=12, unbalanced=0.1, seed=1)
+    indexed = panel.set_index(['Country', 'Year'])
+    clusters = {'entity': dict(cluster_entity=True), 'time': dict(cluster_time=True),
+                'both': dict(cluster_entity=True, cluster_time=True)}[cluster]
+    expected = linearmodels.PanelOLS(indexed['GWG'], indexed[EXOG], entity_effects=entity_effects,
+                                     time_effects=time_effects).fit(cov_type='clustered', debiased=True,
+                                                                    group_debias=True, **clusters)
+    fit = fit_absorbed_ols(panel, 'GWG', EXOG, entity_effects=entity_effects, time_effects=time_effects,
+                           cov_type='clustered', cluster=cluster)
+    np.testing.assert_allclose(fit.std_errors[EXOG], expected.std_errors[EXOG], rtol=1e-8)
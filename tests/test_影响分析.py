@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from 固定效应估计 import fit_absorbed_ols
+from 影响分析 import jackknife
+from 模拟数据 import simulate_panel
+
+EXOG = ['FDI', 'GDP_per_capita', 'HDI', 'Fertility']
+
+
+@pytest.mark.parametrize('by', ['entity', 'time'])
+@pytest.mark.parametrize('entity_effects, time_effects', [(True, True), (True, False), (False, True)])
+def test_jackknife_matches_refits(by, entity_effects, time_effects):
+    panel, _ = simulate_panel(n_countries=10, n_years=8, unbalanced=0.15, seed=6)
+    result = jackknife(panel, 'GWG', EXOG, by=by, entity_effects=entity_effects, time_effects=time_effects)
+    column = 'Country' if by == 'entity' else 'Year'
+    for level, estimate in result.estimates.iterrows():
+        refit = fit_absorbed_ols(panel[panel[column] != level], 'GWG', EXOG, entity_effects=entity_effects,
+                                 time_effects=time_effects)
+        np.testing.assert_allclose(estimate[EXOG], refit.params[EXOG], rtol=1e-7, atol=1e-12)
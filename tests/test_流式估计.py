@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from 固定效应估计 import fit_absorbed_ols
+from 流式估计 import fit_streaming
+from 模拟数据 import simulate_panel
+
+EXOG = ['FDI', 'GDP_per_capita', 'HDI', 'Fertility']
+
+
+@pytest.mark.parametrize('cov_type, cluster', [('unadjusted', 'entity'), ('robust', 'entity'),
+                                               ('clustered', 'entity'), ('clustered', 'both'),
+                                               ('driscoll-kraay', 'entity')])
+@pytest.mark.parametrize('entity_effects, time_effects', [(True, True), (True, False), (False, True)])
+def test_streaming_matches_in_memory(tmp_path, cov_type, cluster, entity_effects, time_effects):
+    panel, _ = simulate_panel(n_countries=12, n_years=10, unbalanced=0.2, missing=0.05, seed=8)
+    path = tmp_path / 'panel.csv'
+    # 打乱行序，使每个国家分散在多个块中
+    panel.sample(frac=1, random_state=0).to_csv(path, index=False)
+    options = dict(entity_effects=entity_effects, time_effects=time_effects, cov_type=cov_type, cluster=cluster)
+    streamed = fit_streaming(path, 'GWG', EXOG, chunksize=17, **options)
+    expected = fit_absorbed_ols(panel, 'GWG', EXOG, **options)
+    assert streamed.nobs == expected.nobs
+    np.testing.assert_allclose(streamed.params[EXOG], expected.params[EXOG], rtol=1e-8)
+    np.testing.assert_allclose(streamed.std_errors[EXOG], expected.std_errors[EXOG], rtol=1e-7)
+
+
+@pytest.mark.parametrize('entity_effects, time_effects', [(True, True), (True, False)])
+def test_streaming_drops_collinear_columns(entity_effects, time_effects):
+    panel, _ = simulate_panel(n_countries=12, n_years=10, seed=2)
+    panel['FDI_2'] = 2 * panel['FDI'] + 1
+    panel['HDI_mean'] = panel.groupby('Country')['HDI'].transform('mean')
+    exog = ['FDI', 'FDI_2', 'GDP_per_capita', 'HDI_mean', 'HDI']
+    options = dict(entity_effects=entity_effects, time_effects=time_effects, cov_type='clustered')
+    streamed = fit_streaming(lambda: iter([panel.iloc[:50], panel.iloc[50:]]), 'GWG', exog, **options)
+    expected = fit_absorbed_ols(panel, 'GWG', exog, **options)
+    assert list(streamed.params.index) == list(expected.params.index) == ['FDI', 'GDP_per_capita', 'HDI']
+    assert sorted(streamed.dropped['变量']) == sorted(expected.dropped['变量']) == ['FDI_2', 'HDI_mean']
+    np.testing.assert_allclose(streamed.params, expected.params, rtol=1e-8)
+    np.testing.assert_allclose(streamed.std_errors, expected.std_errors, rtol=1e-7)
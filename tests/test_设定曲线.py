@@ -0,0 +1,22 @@
+import numpy as np
+
+from 固定效应估计 import fit_absorbed_ols
+from 模拟数据 import simulate_panel
+from 设定曲线 import specification_curve
+from 面板结构 import PanelFrame
+
+SAMPLES = {'2005年起': lambda d: d['Year'] >= 2005, '剔除Country_01': lambda d: d['Country'] != 'Country_01'}
+
+
+def test_callable_samples_accept_panel_frame():
+    panel, _ = simulate_panel(n_countries=12, n_years=10, unbalanced=0.1, seed=8)
+    frame_curve = specification_curve(panel, ['GWG'], ['FDI'], ['HDI'], samples=SAMPLES)
+    panel_curve = specification_curve(PanelFrame.from_frame(panel), ['GWG'], ['FDI'], ['HDI'], samples=SAMPLES)
+    columns = ['样本', '固定效应', '控制变量', '系数', '标准误', '观测数']
+    np.testing.assert_array_equal(panel_curve[columns].to_numpy(), frame_curve[columns].to_numpy())
+
+    row = panel_curve[(panel_curve['样本'] == '2005年起') & (panel_curve['固定效应'] == '国家和年份')
+                      & (panel_curve['控制变量'] == 'HDI')].iloc[0]
+    refit = fit_absorbed_ols(panel[panel['Year'] >= 2005], 'GWG', ['FDI', 'HDI'], cov_type='clustered', cluster='entity')
+    np.testing.assert_allclose([row['系数'], row['标准误']], [refit.params['FDI'], refit.std_errors['FDI']],
+                               rtol=1e-8)
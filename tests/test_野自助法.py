@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from 固定效应估计 import _nested_df, _prepare_sample, fit_absorbed_ols, within_transform
+from 工具变量估计 import _partial_out, fit_absorbed_iv
+from 模拟数据 import simulate_panel
+from 野自助法 import _IVStatistic, _Nuisance, _OLSStatistic
+
+CONTROLS = ['GDP_per_capita', 'HDI', 'Fertility']
+EFFECTS = [(True, False), (True, True), (False, True)]
+
+
+def _setup(panel, variables, entity_effects, time_effects, cluster):
+    """与 wild_cluster_bootstrap 相同的样本、组内变换、聚类和 CR1 校正。"""
+    sample, entity_codes, _, time_codes, _, values = _prepare_sample(panel, variables[0], variables[1:],
+                                                                      'Country', 'Year')
+    values = within_transform(values, entity_codes if entity_effects else None, time_codes if time_effects else None)
+    codes = entity_codes if cluster == 'entity' else time_codes
+    nested, crossed = (entity_effects, time_codes if time_effects else None) if cluster == 'entity' else \
+        (time_effects, entity_codes if entity_effects else None)
+    return sample, values, codes, int(codes.max()) + 1, nested, crossed
+
+
+def _frame(sample, columns):
+    frame = pd.DataFrame(columns)
+    frame['Country'], frame['Year'] = sample['Country'].to_numpy(), sample['Year'].to_numpy()
+    return frame
+
+
+@pytest.mark.parametrize('cluster', ['entity', 'time'])
+@pytest.mark.parametrize('entity_effects, time_effects', EFFECTS)
+def test_iv_bootstrap_statistic_matches_refits(entity_effects, time_effects, cluster):
+    panel, _ = simulate_panel(n_countries=12, n_years=15, endogeneity=0.5, seed=3)
+    options = dict(entity_effects=entity_effects, time_effects=time_effects, cov_type='clustered', cluster=cluster)
+    fit = fit_absorbed_iv(panel, 'GWG', CONTROLS, ['FDI'], ['HIST_TRADE'], **options)
+    sample, values, codes, n_clusters, nested, crossed = _setup(
+        panel, ['GWG'] + CONTROLS + ['FDI', 'HIST_TRADE'], entity_effects, time_effects, cluster)
+    w = values[:, 1:1 + len(CONTROLS)]
+    y, x, z = _partial_out(w, values[:, [0, -2, -1]]).T
+    df_resid = fit.df_resid + _nested_df('clustered', cluster, entity_effects, time_effects, fit.n_entities,
+                                         fit.n_times)
+    scale = n_clusters / (n_clusters - 1) * (fit.nobs - 1) / df_resid
+    stat = _IVStatistic(y, x, z[:, None], codes, n_clusters, scale, _Nuisance(codes, n_clusters, nested, crossed, w))
+
+    r = -0.01
+    u = y - r * x
+    pi = np.linalg.lstsq(np.column_stack([z, u]), x, rcond=None)[0][0]
+    v_tilde = x - pi * z
+    weights = 2.0 * np.random.default_rng(1).integers(0, 2, size=(n_clusters, 4)) - 1
+    expected = []
+    for v in weights.T:
+        # 自助样本代入完整的 2SLS 重新拟合：控制变量和固定效应都重新估计
+        x_star = pi * z + v[codes] * v_tilde
+        columns = {'y': r * x_star + v[codes] * u, 'x': x_star, 'z': z,
+                   **{f'w{j}': w[:, j] for j in range(w.shape[1])}}
+        refit = fit_absorbed_iv(_frame(sample, columns), 'y', [f'w{j}' for j in range(w.shape[1])], ['x'], ['z'],
+                                **options)
+        expected.append((refit.params['x'] - r) / refit.std_errors['x'])
+    np.testing.assert_allclose(stat.at(r)(weights), expected, rtol=1e-8)
+    np.testing.assert_allclose(stat.at(0.0)(np.ones((n_clusters, 1)))[0], fit.tstats['FDI'], rtol=1e-8)
+
+
+@pytest.mark.parametrize('cluster', ['entity', 'time'])
+@pytest.mark.parametrize('entity_effects, time_effects', EFFECTS)
+def test_ols_bootstrap_statistic_matches_refits(entity_effects, time_effects, cluster):
+    panel, _ = simulate_panel(n_countries=12, n_years=15, unbalanced=0.1, seed=3)
+    exog = ['FDI'] + CONTROLS
+    options = dict(entity_effects=entity_effects, time_effects=time_effects, cov_type='clustered', cluster=cluster)
+    fit = fit_absorbed_ols(panel, 'GWG', exog, **options)
+    sample, values, codes, n_clusters, nested, crossed = _setup(panel, ['GWG'] + exog, entity_effects,
+                                                                time_effects, cluster)
+    y, x = values[:, 0], values[:, 1:]
+    df_resid = fit.df_resid + _nested_df('clustered', cluster, entity_effects, time_effects, fit.n_entities,
+                                         fit.n_times)
+    scale = n_clusters / (n_clusters - 1) * (fit.nobs - 1) / df_resid
+    stat = _OLSStatistic(y, x, 0, codes, n_clusters, scale, _Nuisance(codes, n_clusters, nested, crossed))
+
+    r = -0.01
+    rest = x[:, 1:]
+    fitted = r * x[:, 0] + rest @ np.linalg.lstsq(rest, y - r * x[:, 0], rcond=None)[0]
+    weights = 2.0 * np.random.default_rng(1).integers(0, 2, size=(n_clusters, 4)) - 1
+    expected = []
+    for v in weights.T:
+        columns = {'y': fitted + v[codes] * (y - fitted), **{f'x{j}': x[:, j] for j in range(x.shape[1])}}
+        refit = fit_absorbed_ols(_frame(sample, columns), 'y', [f'x{j}' for j in range(x.shape[1])], **options)
+        expected.append((refit.params['x0'] - r) / refit.std_errors['x0'])
+    np.testing.assert_allclose(stat.at(r)(weights), expected, rtol=1e-7)
+    np.testing.assert_allclose(stat.at(0.0)(np.ones((n_clusters, 1)))[0], fit.tstats['FDI'], rtol=1e-7)
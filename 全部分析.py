@@ -0,0 +1,267 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+import pandas as pd
+
+from 中介效应 import mediation_analysis
+from 共享面板 import SharedPanel, attach_panel, dataset_frame, union_panel
+from 共线性诊断 import eliminate_high_vif, vif_table
+from 固定效应估计 import fit_absorbed_ols, fit_fe_family, hausman_test, mundlak_test, std_error_table
+from 工具变量估计 import fit_absorbed_iv
+from 影响分析 import jackknife
+from 性能记录 import stage
+from 数据加载 import _hide_main_module, raise_for_failures, read_sources
+from 滚动估计 import rolling_fit
+from 设定曲线 import specification_curve
+from 阶段图 import StageGraph
+from 野自助法 import wild_cluster_bootstrap
+from 面板合并 import panel_coverage
+
+DEFAULT_CONFIG = Path(__file__).with_name('分析配置.json')
+FE_MODELS = {'pooled': '无固定效应', 'entity': '国家固定效应', 'time': '时间固定效应', 'both': '双固定效应',
+             'random': '随机效应'}
+SUMMARY_COLUMNS = ['分析', '类型', '数据集', '观测数', '秒数', '状态', '错误']
+
+
+def _coefficients(result):
+    """估计结果的系数表：系数、标准误、t值、P值和置信区间，与 summary 中的表相同。"""
+    return pd.DataFrame({
+        '系数': result.params,
+        '标准误': result.std_errors,
+        't值': result.tstats,
+        'P值': result.pvalues,
+    }).join(result.conf_int())
+
+
+# 各类分析：run_xxx(data, **设定) 返回 (观测数, {表名: DataFrame})，设定即配置文件中该分析除 name、kind、dataset 外的键
+
+def run_ols(data, **options):
+    result = fit_absorbed_ols(data, **options)
+    return result.nobs, {'系数': _coefficients(result), '标准误对照': std_error_table(result)}
+
+
+def run_iv(data, **options):
+    result = fit_absorbed_iv(data, **options)
+    return result.nobs, {'系数': _coefficients(result), '第一阶段': result.first_stage, '检验': result.diagnostics}
+
+
+def run_mediation(data, **options):
+    table, _ = mediation_analysis(data, **options)
+    return table.attrs['观测数'], {'中介效应': table}
+
+
+def run_fe_selection(data, dependent, exog, standardize=True, vif_threshold=10, cov_type='robust', cluster='entity'):
+    """固定效应（正式）.py 的流程：标准化、迭代剔除高 VIF 变量、估计模型族、F 检验与 Hausman/Mundlak 检验。"""
+    indexed = data.set_index(['Country', 'Year'])
+    X = indexed[list(exog)]
+    if standardize:
+        # 与 StandardScaler 相同：减均值后除以总体标准差
+        X = (X - X.mean()) / X.std(ddof=0)
+    tables = {'VIF': vif_table(X)}
+    if (tables['VIF']['VIF'] > vif_threshold).any():
+        kept, tables['VIF剔除'] = eliminate_high_vif(X, threshold=vif_threshold)
+        X = X[kept]
+    fe_data = X.join(indexed[dependent]).reset_index()
+    exog = list(X.columns)
+    results, f_tests = fit_fe_family(fe_data, dependent, exog, cov_type=cov_type, cluster=cluster)
+    tables['系数'] = pd.concat({FE_MODELS[key]: _coefficients(result) for key, result in results.items()},
+                             names=['模型', '变量'])
+    tables['F检验'] = f_tests
+    tables['个体效应检验'] = pd.DataFrame({'Hausman': hausman_test(results['entity'], results['random']),
+                                      'Mundlak': mundlak_test(fe_data, dependent, exog)}).T
+    return results['both'].nobs, tables
+
+
+def run_spec_curve(data, samples=None, **options):
+    """samples 为 {样本名: null 或 {"from_year": 起始年, "to_year": 结束年}}，其余设定传给 specification_curve。"""
+    masks = None
+    if samples is not None:
+        masks = {name: None if bounds is None else
+                 data['Year'].between(bounds.get('from_year', -float('inf')), bounds.get('to_year', float('inf')))
+                 for name, bounds in samples.items()}
+    curve = specification_curve(data, samples=masks, **options)
+    return None, {'设定曲线': curve.sort_values('系数')}
+
+
+def run_jackknife(data, **options):
+    result = jackknife(data, **options)
+    table = pd.DataFrame({'全样本系数': result.params, '标准误': result.full.std_errors[result.params.index],
+                          '刀切标准误': result.std_errors})
+    return result.full.nobs, {'刀切汇总': table, '剔除估计': result.estimates}
+
+
+def run_rolling(data, **options):
+    path = rolling_fit(data, **options)
+    return None, {'系数路径': path}
+
+
+def run_wild_bootstrap(data, **options):
+    table = wild_cluster_bootstrap(data, **options)
+    return table.attrs['观测数'], {'野聚类自助': table}
+
+
+ANALYSES = {
+    'ols': run_ols,
+    'iv': run_iv,
+    'mediation': run_mediation,
+    'fe_selection': run_fe_selection,
+    'spec_curve': run_spec_curve,
+    'jackknife': run_jackknife,
+    'rolling': run_rolling,
+    'wild_bootstrap': run_wild_bootstrap,
+}
+
+
+def load_config(path, data_dir=None):
+    """
+    读取 JSON 配置并检查各分析引用的数据集和来源。配置的结构见 分析配置.json：
+      - data_dir：工作簿所在目录，sources 中的相对路径相对于它（参数 data_dir 可覆盖）
+      - sources：{来源名: 文件}，全部分析用到的工作簿，每个只读取一次
+      - datasets：{数据集名: {variables: {变量名: 来源名}, how, fill, dropna, lags}}，见 dataset_frame
+      - analyses：[{name, kind, dataset, 其余为该类分析的设定}]，kind 取 ANALYSES 的键
+      - output：结果工作簿路径
+    """
+    path = Path(path)
+    with open(path, encoding='utf-8') as fh:
+        config = json.load(fh)
+    base = Path(data_dir if data_dir is not None else config.get('data_dir', path.parent))
+    config['sources'] = {name: str(base / file) for name, file in config['sources'].items()}
+
+    names = [analysis['name'] for analysis in config['analyses']]
+    problems = [f"分析名重复: {name}" for name in sorted({n for n in names if names.count(n) > 1})]
+    for analysis in config['analyses']:
+        if analysis.get('kind') not in ANALYSES:
+            problems.append(f"{analysis['name']}: 未知的分析类型 {analysis.get('kind')!r}")
+        if analysis.get('dataset') not in config['datasets']:
+            problems.append(f"{analysis['name']}: 未知的数据集 {analysis.get('dataset')!r}")
+    for name, dataset in config['datasets'].items():
+        missing = [source for source in dataset['variables'].values() if source not in config['sources']]
+        if missing:
+            problems.append(f"数据集 {name}: sources 中没有 {missing}")
+    if problems:
+        raise ValueError(f"配置文件 {path} 有误:\n  " + '\n  '.join(problems))
+    return config
+
+
+def _read_union(sources):
+    frames, failures = read_sources(sources)
+    raise_for_failures(failures)
+    return union_panel(frames)
+
+
+def _run_analysis(analysis, dataset):
+    """在工作进程中运行一个分析，返回 (观测数, 表, 秒数, 错误)；出错不影响其它分析。"""
+    start = time.perf_counter()
+    options = {k: v for k, v in analysis.items() if k not in ('name', 'kind', 'dataset')}
+    try:
+        with stage(analysis['name']):
+            data = dataset_frame(**dataset)
+            nobs, tables = ANALYSES[analysis['kind']](data, **options)
+    except Exception as exc:
+        return None, {}, time.perf_counter() - start, f"{type(exc).__name__}: {exc}"
+    return nobs, tables, time.perf_counter() - start, None
+
+
+def run_all(config, workers=None, use_cache=True):
+    """
+    按配置运行全部分析，返回结果包 {'概览': 概览表, '面板覆盖': 覆盖表, (分析名, 表名): DataFrame, ...}。
+
+      1. 全部来源的工作簿只读取一次，外连接成联合面板并记录每行出现在哪些来源中；
+         这一步经 StageGraph 缓存，源文件和代码未变化时直接读取上次的结果
+      2. 联合面板发布到共享内存（SharedPanel），工作进程挂接后各自取出所需的行和列，不复制整张面板
+      3. 各分析在进程池中并发运行，workers 默认为分析数与 CPU 数中的较小者；workers=1 时在本进程中依次运行
+    每个分析的样本与原先单独脚本中按各自来源合并、补缺的结果相同。
+    """
+    analyses = config['analyses']
+    workers = min(len(analyses), os.cpu_count() or 1) if workers is None else workers
+
+    with stage('构建联合面板') as s:
+        if use_cache:
+            graph = StageGraph()
+            graph.add('联合面板', _read_union, params={'sources': config['sources']}, files=config['sources'].values())
+            panel, presence = graph.run()['联合面板']
+        else:
+            panel, presence = _read_union(config['sources'])
+        s.set_shape(panel)
+
+    outcomes = {}
+    with stage('发布共享内存'):
+        shared = SharedPanel(panel, presence, config['sources'])
+    with shared, stage('并发分析'):
+        jobs = [(analysis, config['datasets'][analysis['dataset']]) for analysis in analyses]
+        if workers <= 1:
+            attach_panel(shared)
+            for analysis, dataset in jobs:
+                outcomes[analysis['name']] = _run_analysis(analysis, dataset)
+        else:
+            # 作为脚本运行时子进程要从主模块取得任务函数；被其它脚本导入调用时隐藏主模块，避免 spawn 子进程重新执行该脚本
+            guard = nullcontext() if __name__ == '__main__' else _hide_main_module()
+            with guard, ProcessPoolExecutor(max_workers=workers, initializer=attach_panel,
+                                            initargs=(shared.layout,)) as pool:
+                futures = {analysis['name']: pool.submit(_run_analysis, analysis, dataset)
+                           for analysis, dataset in jobs}
+            outcomes = {name: future.result() for name, future in futures.items()}
+
+    bundle = {}
+    summary = []
+    for analysis in analyses:
+        nobs, tables, seconds, error = outcomes[analysis['name']]
+        summary.append((analysis['name'], analysis['kind'], analysis['dataset'], nobs, seconds,
+                        '出错' if error else '完成', error))
+        bundle.update({(analysis['name'], table_name): table for table_name, table in tables.items()})
+    bundle = {
+        '概览': pd.DataFrame(summary, columns=SUMMARY_COLUMNS).astype({'观测数': 'Int64'}),
+        '面板覆盖': panel_coverage(panel, config['sources']),
+        **bundle,
+    }
+    return bundle
+
+
+def write_bundle(bundle, path):
+    """把结果包写成一个 Excel 工作簿：概览、面板覆盖在前，其后每个 (分析, 表) 一个工作表。"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    used = set()
+    with pd.ExcelWriter(path) as writer:
+        for key, table in bundle.items():
+            name = key if isinstance(key, str) else '-'.join(key)
+            # 工作表名最长 31 个字符且不能含 []:*?/\
+            name = ''.join('_' if ch in '[]:*?/\\' else ch for ch in name)[:31]
+            sheet, n = name, 1
+            while sheet in used:
+                n += 1
+                sheet = f"{name[:31 - len(str(n)) - 1]}~{n}"
+            used.add(sheet)
+            table.to_excel(writer, sheet_name=sheet, index=key not in ('概览',))
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='读取一次数据，并发运行基准回归、内生性、机制、稳健性和固定效应选择分析')
+    parser.add_argument('config', nargs='?', default=DEFAULT_CONFIG, help='JSON 配置文件')
+    parser.add_argument('--data-dir', help='工作簿所在目录，覆盖配置中的 data_dir')
+    parser.add_argument('--output', help='结果工作簿路径，覆盖配置中的 output')
+    parser.add_argument('--workers', type=int, help='并发分析的进程数，1 表示在本进程中依次运行')
+    parser.add_argument('--no-cache', action='store_true', help='不使用联合面板的缓存，重新读取全部工作簿')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    config = load_config(args.config, data_dir=args.data_dir)
+    bundle = run_all(config, workers=args.workers, use_cache=not args.no_cache)
+    output = write_bundle(bundle, args.output or config['output'])
+
+    summary = bundle['概览']
+    print(summary.drop(columns='错误').to_string(index=False, float_format=lambda v: f'{v:.3f}'))
+    for row in summary[summary['状态'] == '出错'].itertuples():
+        print(f"\n{row.分析} 出错: {row.错误}")
+    print(f"\n共 {len(summary)} 个分析，用时 {time.perf_counter() - start:.2f} 秒，结果已写入 {output}")
+    return 0 if (summary['状态'] == '完成').all() else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
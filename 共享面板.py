@@ -0,0 +1,140 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from 缺失值处理 import fill_panel_gaps
+from 面板合并 import KEYS, join_panel
+from 面板特征 import panel_features
+
+# 各数组在共享内存段中的起始偏移按此字节数对齐
+_ALIGN = 64
+
+
+def union_panel(frames):
+    """
+    把 {来源名: read_sources 返回的长格式表} 外连接成联合面板，同时记录每一行在哪些来源中出现。
+    返回 (面板, 出现矩阵)：出现矩阵为 来源数 × 行数 的布尔数组，顺序同 frames。
+
+    各分析按自己用到的来源从联合面板中取行即可得到与单独合并相同的样本：
+    外连接取这些来源出现的行的并集，内连接取交集（见 dataset_frame）。
+    """
+    flags = {var_name: f'_出现_{var_name}' for var_name in frames}
+    panel, _ = join_panel([frame.assign(**{flags[var_name]: 1.0}) for var_name, frame in frames.items()], how='outer')
+    presence = np.vstack([panel.pop(flag).notna().to_numpy() for flag in flags.values()])
+    return panel, presence
+
+
+class SharedPanel:
+    """
+    发布到共享内存中的联合面板。全部数值列、年份、国家编码和出现矩阵放在同一个共享内存段里，
+    工作进程按 layout 挂接后直接在这段内存上建立 NumPy 视图，不复制整张面板，也不经过 pickle。
+
+        with SharedPanel(panel, presence, sources) as shared:
+            pool = ProcessPoolExecutor(initializer=attach_panel, initargs=(shared.layout,))
+
+    layout 只含段名、各数组的 dtype/形状/偏移，以及国家名、变量名、来源名，可以廉价地传给子进程。
+    退出 with 块时关闭并释放共享内存段。
+    """
+
+    def __init__(self, panel, presence, sources):
+        columns = [c for c in panel.columns if c not in KEYS]
+        country_codes, countries = pd.factorize(panel['Country'], sort=True)
+        arrays = {
+            'values': np.vstack([panel[c].to_numpy(dtype='float64') for c in columns]) if columns
+            else np.empty((0, len(panel))),
+            'years': panel['Year'].to_numpy(),
+            'countries': country_codes.astype('int32'),
+            'presence': np.asarray(presence, dtype=bool),
+        }
+        specs, offset = {}, 0
+        for name, array in arrays.items():
+            specs[name] = (array.dtype.str, array.shape, offset)
+            offset += -(-array.nbytes // _ALIGN) * _ALIGN
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.layout = {
+            'name': self._shm.name,
+            'arrays': specs,
+            'columns': columns,
+            'sources': list(sources),
+            'country_names': list(countries),
+            'country_dtype': panel['Country'].dtype,
+        }
+        self.arrays = _views(self._shm.buf, self.layout)
+        for name, array in arrays.items():
+            self.arrays[name][...] = array
+
+    def close(self):
+        """释放共享内存段；此后已挂接的工作进程不应再访问它。"""
+        if self._shm is not None:
+            self.arrays = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+# 工作进程中挂接的共享面板：(共享内存段, {数组名: 视图}, layout)
+_attached = None
+
+
+def attach_panel(layout):
+    """
+    在工作进程中按 layout 挂接共享面板（作为进程池的 initializer），之后 dataset_frame 从中取数。
+    传入 SharedPanel 本身（如在主进程中直接运行）时不经过共享内存段，直接使用其数组。
+    """
+    global _attached
+    if isinstance(layout, SharedPanel):
+        _attached = (None, layout.arrays, layout.layout)
+        return
+    # 进程池的工作进程与创建者共用同一个资源跟踪器，挂接时的登记不会导致段被提前释放；由创建者负责释放
+    shm = shared_memory.SharedMemory(name=layout['name'])
+    _attached = (shm, _views(shm.buf, layout), layout)
+
+
+def _views(buffer, layout):
+    return {name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset)
+            for name, (dtype, shape, offset) in layout['arrays'].items()}
+
+
+def dataset_frame(variables, how='outer', fill=True, dropna=False, lags=None):
+    """
+    从已挂接的共享面板中取出一个分析所用的数据集，结果与对这些来源单独调用 build_panel 相同。
+      - variables：{分析中的变量名: 联合面板中的来源名}，列按此顺序、以分析中的变量名命名
+      - how：'outer' 保留任一来源出现的行，'inner' 只保留全部来源都出现的行
+      - fill、dropna 同 build_panel，只作用于这些变量
+      - lags：{变量名: 滞后阶数列表}，补缺后用 panel_features 按实际年份构造滞后变量（如 FDI_lag1）
+    只复制选中的行和列，整张联合面板留在共享内存中。
+    """
+    if _attached is None:
+        raise RuntimeError("尚未挂接共享面板，请先调用 attach_panel")
+    if how not in ('outer', 'inner'):
+        raise ValueError(f"how 只能为 'outer' 或 'inner'，收到: {how!r}")
+    _, arrays, layout = _attached
+    unknown = [source for source in variables.values() if source not in layout['sources']]
+    if unknown:
+        raise KeyError(f"联合面板中没有这些来源: {unknown}")
+
+    present = arrays['presence'][[layout['sources'].index(source) for source in variables.values()]]
+    rows = np.flatnonzero(present.any(axis=0) if how == 'outer' else present.all(axis=0))
+    countries = np.asarray(layout['country_names'], dtype=object)[arrays['countries'][rows]]
+    frame = pd.DataFrame({
+        'Year': arrays['years'][rows],
+        'Country': pd.Series(countries, dtype=layout['country_dtype']),
+        **{name: arrays['values'][layout['columns'].index(source), rows] for name, source in variables.items()},
+    })
+
+    names = list(variables)
+    if fill:
+        frame, _ = fill_panel_gaps(frame, names)
+    if dropna:
+        frame = frame.dropna(subset=names).reset_index(drop=True)
+    for name, orders in (lags or {}).items():
+        frame, _ = panel_features(frame, [name], lags=orders)
+    return frame
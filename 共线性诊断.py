@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import scipy.linalg
+
+
+def check_collinearity(x, names, raw=None, tol=1e-8):
+    """
+    拟合前对（已去均值的）设计矩阵做一次 QR 分解，找出无法识别的解释变量。
+
+    返回 (保留的列位置列表, 剔除说明表)：
+      - 去均值后范数相对原始范数小于 tol 的列，与被吸收的固定效应共线（如不随时间变化的国家特征）
+      - 其余列按给定顺序做 QR 分解，|R_jj| 相对列范数小于 tol 的列可由排在它前面的列线性表示，
+        剔除它并在说明中列出与之共线的变量
+    剔除顺序是确定的：总是保留排在前面的变量，剔除排在后面的变量。
+    raw 为去均值前的设计矩阵，不提供时不检查与固定效应的共线性。
+    """
+    x = np.asarray(x, dtype='float64')
+    names = list(names)
+    norms = np.linalg.norm(x, axis=0)
+    dropped = []
+
+    candidates = list(range(x.shape[1]))
+    if raw is not None:
+        raw_norms = np.linalg.norm(np.asarray(raw, dtype='float64'), axis=0)
+        absorbed = [j for j in candidates if norms[j] <= tol * max(raw_norms[j], 1.0)]
+        for j in absorbed:
+            dropped.append({'变量': names[j], '原因': '与吸收的固定效应共线'})
+        candidates = [j for j in candidates if j not in absorbed]
+    else:
+        zero = [j for j in candidates if norms[j] == 0]
+        for j in zero:
+            dropped.append({'变量': names[j], '原因': '取值全为零'})
+        candidates = [j for j in candidates if j not in zero]
+
+    keep = []
+    if candidates:
+        # 列先单位化，使 R 的对角元可以直接与 tol 比较
+        scaled = x[:, candidates] / norms[candidates]
+        r = scipy.linalg.qr(scaled, mode='r')[0]
+        for pos, j in enumerate(candidates):
+            if abs(r[pos, pos]) > tol:
+                keep.append(j)
+                continue
+            # 用已保留的列对该列做最小二乘，系数不为零的即为与之共线的变量
+            kept_pos = [candidates.index(k) for k in keep]
+            coef = scipy.linalg.lstsq(scaled[:, kept_pos], scaled[:, pos])[0] if kept_pos else []
+            partners = [names[k] for k, c in zip(keep, coef) if abs(c) > tol ** 0.5]
+            dropped.append({'变量': names[j], '原因': f"与 {', '.join(partners)} 线性相关" if partners else '线性相关'})
+
+    dropped = pd.DataFrame(dropped, columns=['变量', '原因'])
+    return keep, dropped
+
+
+def _absorbed_values(X, absorb):
+    """取出 X 的数值矩阵；absorb 为 X 索引中的层名（如 ('Country', 'Year')）时先做组内变换。"""
+    values = X.to_numpy(dtype='float64')
+    if not absorb:
+        return values
+    # 组内变换在估计模块中实现，这里按需导入以避免两个模块互相依赖
+    from 固定效应估计 import within_transform
+    codes = [pd.factorize(X.index.get_level_values(level))[0] for level in absorb]
+    return within_transform(values, *codes) if len(codes) == 2 else within_transform(values, codes[0])
+
+
+def vif_table(X, absorb=None):
+    """
+    一次求逆得到全部解释变量的方差膨胀因子：VIF_j 等于相关系数矩阵逆矩阵的第 j 个对角元，
+    与逐个辅助回归（含常数项）的 1 / (1 - R_j²) 相同。
+    X 为不含常数项的解释变量 DataFrame；absorb 给出索引层名时，在组内变换后的数据上计算。
+    """
+    corr = np.corrcoef(_absorbed_values(X, absorb), rowvar=False)
+    vif = np.diag(np.linalg.inv(np.atleast_2d(corr)))
+    return pd.DataFrame({'变量': list(X.columns), 'VIF': vif})
+
+
+def eliminate_high_vif(X, threshold=10, absorb=None):
+    """
+    迭代剔除多重共线性：每次剔除 VIF 最大且超过 threshold 的变量，直到全部 VIF 不超过阈值。
+
+    相关系数矩阵只求逆一次，之后每剔除一列用分块求逆公式更新逆矩阵
+    （B' = B_{-j,-j} - B_{-j,j} B_{j,-j} / B_{jj}），不再重新计算。
+    返回 (保留变量列表, 剔除记录表)，剔除记录表的列为 步骤、剔除变量、VIF。
+    """
+    names = list(X.columns)
+    inv = np.linalg.inv(np.atleast_2d(np.corrcoef(_absorbed_values(X, absorb), rowvar=False)))
+    history = []
+    while len(names) > 1:
+        vif = np.diag(inv)
+        worst = int(np.argmax(vif))
+        if vif[worst] <= threshold:
+            break
+        history.append({'步骤': len(history) + 1, '剔除变量': names[worst], 'VIF': vif[worst]})
+        rest = np.arange(len(names)) != worst
+        inv = inv[np.ix_(rest, rest)] - np.outer(inv[rest, worst], inv[worst, rest]) / inv[worst, worst]
+        names.pop(worst)
+    return names, pd.DataFrame(history, columns=['步骤', '剔除变量', 'VIF'])
@@ -1,18 +1,9 @@
-from linearmodels.panel import PanelOLS
+from 工具变量估计 import fit_absorbed_iv
 
-# 第一阶段：回归FDI与工具变量HIST_TRADE
-first_stage = PanelOLS.from_formula('FDI ~ HIST_TRADE + GDP_per_capita + Total_average_wage + HDI + Fertility + EntityEffects', data)
-first_stage_result = first_stage.fit()
+# 两阶段最小二乘：以 HIST_TRADE 作为 FDI 的工具变量，吸收国家固定效应
+# 直接把第一阶段拟合值代入第二阶段回归得到的标准误是错误的，这里同时估计两个阶段
+iv_result = fit_absorbed_iv(data.reset_index(), 'GWG', ['GDP_per_capita', 'Total_average_wage', 'HDI', 'Fertility'],
+                            endog=['FDI'], instruments=['HIST_TRADE'], time_effects=False)
 
-# 输出第一阶段回归结果
-print(first_stage_result.summary)
-
-# 使用第一阶段的预测结果作为新的FDI
-data['predicted_FDI'] = first_stage_result.fitted_values
-
-# 第二阶段：回归性别工资差距（GWG）与预测的FDI
-second_stage = PanelOLS.from_formula('GWG ~ predicted_FDI + GDP_per_capita + Total_average_wage + HDI + Fertility + EntityEffects', data)
-second_stage_result = second_stage.fit()
-
-# 输出第二阶段回归结果
-print(second_stage_result.summary)
+# 输出第一阶段诊断、第二阶段回归结果以及弱工具变量与内生性检验
+print(iv_result.summary)
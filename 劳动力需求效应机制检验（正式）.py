@@ -1,66 +1,83 @@
 import pandas as pd
-import statsmodels.formula.api as smf
-
-def read_and_melt(file_path, var_name):
-    """
-    读取Excel文件：
-      - 假设第一行为各国家名称，第一列为年份（作为索引）。
-      - 重置索引后，将宽格式转换成长格式，生成包含 'Year', 'Country', var_name 三列的数据。
-    """
-    # 读取文件时：header=0, index_col=0使第一行为列名、第一列为索引
-    df = pd.read_excel(file_path, header=0, index_col=0)
-    df.index.name = 'Year'
-    # 重置索引，将 Year 变成普通列
-    df = df.reset_index()
-    # 去除各列的空格
-    df.columns = df.columns.str.strip()
-    df['Year'] = df['Year'].astype(str).str.strip()
-    # 宽转长：id_vars 为 Year，其余列作为国家数据
-    df_long = df.melt(id_vars='Year', var_name='Country', value_name=var_name)
-    # 清洗 Country 字段
-    df_long['Country'] = df_long['Country'].astype(str).str.strip()
-    # 将 Year 转换为数值型
-    df_long['Year'] = pd.to_numeric(df_long['Year'], errors='coerce')
-    return df_long
-
-# 1. 读取各文件（请根据实际文件路径修改）
-df_gwg  = read_and_melt(r"D:\GWG.xlsx", 'GWG')
-df_fdi  = read_and_melt(r"D:\FDI_Percentage_of_GDP__2000_2022__Fixed_.xlsx", 'FDI')
-df_gdp  = read_and_melt(r"D:\GDP.PCAP.CD.xlsx", 'GDP_PC')
-df_inc  = read_and_melt(r"D:\INC.xlsx", 'TAW')      # 假定 INC 表示 Total Average Wage
-df_hdi  = read_and_melt(r"D:\HDI_Data.xlsx", 'HDI')
-df_fert = read_and_melt(r"D:\Fertility.xlsx", 'FERT')
-df_fem  = read_and_melt(r"D:\FEM_EMP.xlsx", 'FEM_EMP')  # 中介变量：女性就业份额
-
-# 2. 合并所有数据（以 Year 与 Country 为键，使用 outer 合并方便查缺）
-df_panel = df_gwg.merge(df_fdi, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.merge(df_gdp, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.merge(df_inc, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.merge(df_hdi, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.merge(df_fert, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.merge(df_fem, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.sort_values(['Year', 'Country'])
-
-print("合并后的面板数据预览:")
-print(df_panel.head(10))
-print("各变量缺失统计:")
-print(df_panel[['GWG','FDI','GDP_PC','TAW','HDI','FERT','FEM_EMP']].isnull().sum())
-
-# 3. 缺失值处理：按 Country 分组对每个数值变量进行线性插值，再前向填充与后向填充
-numeric_vars = ['GWG', 'FDI', 'GDP_PC', 'TAW', 'HDI', 'FERT', 'FEM_EMP']
-df_panel_filled = df_panel.copy()
-
-for var in numeric_vars:
-    # 使用 transform 确保输出索引与原数据对齐
-    df_panel_filled[var] = df_panel_filled.groupby('Country')[var]\
-        .transform(lambda group: group.interpolate(method='linear'))
-    df_panel_filled[var] = df_panel_filled.groupby('Country')[var]\
-        .transform(lambda group: group.ffill().bfill())
-
-# 删除关键变量仍存在缺失值的行
-df_panel_filled = df_panel_filled.dropna(subset=numeric_vars)
-
-print("缺失值处理后的数据预览:")
+
+from 中介效应 import mediation_analysis
+from 固定效应估计 import fit_absorbed_ols
+from 数据加载 import raise_for_failures, read_sources
+from 缺失值处理 import fill_panel_gaps
+from 阶段图 import StageGraph
+from 面板合并 import join_panel
+
+
+# 1. 各变量对应的文件（请根据实际文件路径修改）
+sources = {
+    'GWG': r"D:\GWG.xlsx",
+    'FDI': r"D:\FDI_Percentage_of_GDP__2000_2022__Fixed_.xlsx",
+    'GDP_PC': r"D:\GDP.PCAP.CD.xlsx",
+    'TAW': r"D:\INC.xlsx",      # 假定 INC 表示 Total Average Wage
+    'HDI': r"D:\HDI_Data.xlsx",
+    'FERT': r"D:\Fertility.xlsx",
+    'FEM_EMP': r"D:\FEM_EMP.xlsx",  # 中介变量：女性就业份额
+}
+numeric_vars = list(sources)
+controls = ['GDP_PC', 'TAW', 'HDI', 'FERT']
+
+
+# 分析按阶段组成有向无环图：读取 → 合并 → 插值 → 第一阶段 / 第二阶段 / 中介效应 → 汇总表。
+# 每个阶段的结果按其函数、参数、输入文件和上游结果缓存到磁盘，修改某个设定后重新运行只会重算该阶段及其下游；
+# 第一阶段、第二阶段和中介效应三个阶段互不依赖，并发执行
+def read_workbooks(sources):
+    frames, failures = read_sources(sources)
+    raise_for_failures(failures)
+    return frames
+
+
+def join_frames(frames):
+    # 以 Year 与 Country 为键外连接
+    return join_panel(list(frames.values()), how='outer')[0]
+
+
+def fill_and_drop(panel, columns):
+    # 按 Country 分组线性插值、前向与后向填充，再删除关键变量仍存在缺失值的行
+    panel, _ = fill_panel_gaps(panel, columns)
+    return panel.dropna(subset=columns).reset_index(drop=True)
+
+
+def indirect_effect(panel, treatment, mediator, outcome, controls, n_boot, seed):
+    return mediation_analysis(panel, treatment, mediator, outcome, controls, n_boot=n_boot, seed=seed)[0]
+
+
+def mechanism_table(model_med, model_out, mediation):
+    # 机制检验的关键系数：a 路径（FDI → FEM_EMP）、b 路径（FEM_EMP → GWG）、直接效应与间接效应
+    rows = [
+        ('FDI → FEM_EMP', model_med.params['FDI'], model_med.std_errors['FDI'], model_med.pvalues['FDI']),
+        ('FEM_EMP → GWG', model_out.params['FEM_EMP'], model_out.std_errors['FEM_EMP'], model_out.pvalues['FEM_EMP']),
+        ('FDI → GWG（直接效应）', model_out.params['FDI'], model_out.std_errors['FDI'], model_out.pvalues['FDI']),
+    ]
+    return pd.DataFrame(rows, columns=['路径', '系数', '标准误', 'P值']).set_index('路径')
+
+
+graph = StageGraph()
+graph.add('读取', read_workbooks, params={'sources': sources}, files=sources.values())
+graph.add('合并', join_frames, inputs=['读取'])
+graph.add('插值', fill_and_drop, inputs=['合并'], params={'columns': numeric_vars})
+# (1) 第一阶段：FEM_EMP ~ FDI + GDP_PC + TAW + HDI + FERT + 国家、年份固定效应（组内变换吸收）
+graph.add('第一阶段', fit_absorbed_ols, inputs=['插值'], params={'dependent': 'FEM_EMP', 'exog': ['FDI'] + controls})
+# (2) 第二阶段：GWG ~ FEM_EMP + FDI + GDP_PC + TAW + HDI + FERT + 国家、年份固定效应（组内变换吸收）
+graph.add('第二阶段', fit_absorbed_ols, inputs=['插值'],
+          params={'dependent': 'GWG', 'exog': ['FEM_EMP', 'FDI'] + controls})
+# (3) 中介效应的显著性：Sobel 检验与按国家聚类的自助置信区间
+# 间接效应 = FDI→FEM_EMP 系数 × FEM_EMP→GWG 系数；自助抽样在一次组内变换后的叉积块上批量求解
+graph.add('中介效应', indirect_effect, inputs=['插值'],
+          params={'treatment': 'FDI', 'mediator': 'FEM_EMP', 'outcome': 'GWG', 'controls': controls,
+                  'n_boot': 5000, 'seed': 0})
+graph.add('汇总表', mechanism_table, inputs=['第一阶段', '第二阶段', '中介效应'])
+
+results = graph.run()
+print("各阶段运行情况（缓存 = 直接读取上次的结果）:")
+print(graph.log.to_string(index=False, float_format=lambda v: f'{v:.3f}'))
+
+df_panel_filled = results['插值']
+print("\n缺失值处理后的数据预览:")
 print(df_panel_filled.head(10))
 print("处理后缺失统计:")
 print(df_panel_filled[numeric_vars].isnull().sum())
@@ -68,15 +85,17 @@ print("Unique Countries:", df_panel_filled['Country'].unique())
 print("Unique Years:", df_panel_filled['Year'].unique())
 
 # 4. 机制检验
-
-# (1) 第一阶段：检验 FDI 对中介变量 FEM_EMP 的影响
-formula_med = 'FEM_EMP ~ FDI + GDP_PC + TAW + HDI + FERT + C(Country) + C(Year)'
-model_med = smf.ols(formula=formula_med, data=df_panel_filled).fit()
 print("\n【机制检验 - 第一阶段】FEM_EMP 回归结果 (FDI → FEM_EMP):")
-print(model_med.summary())
+print(results['第一阶段'].summary)
 
-# (2) 第二阶段：检验中介变量 FEM_EMP 对 GWG 的影响（同时控制 FDI 及其它变量）
-formula_out = 'GWG ~ FEM_EMP + FDI + GDP_PC + TAW + HDI + FERT + C(Country) + C(Year)'
-model_out = smf.ols(formula=formula_out, data=df_panel_filled).fit()
 print("\n【机制检验 - 第二阶段】GWG 回归结果 (FEM_EMP → GWG):")
-print(model_out.summary())
+print(results['第二阶段'].summary)
+
+mediation = results['中介效应']
+print("\n【机制检验 - 中介效应】间接效应、直接效应与总效应:")
+print(mediation.T)
+print(f"聚类数（国家）: {mediation.attrs['聚类数']}，观测数: {mediation.attrs['观测数']}，"
+      f"自助次数: {mediation.attrs['自助次数']}")
+
+print("\n【机制检验 - 汇总】")
+print(results['汇总表'].to_string(float_format=lambda v: f'{v:.4f}'))
@@ -0,0 +1,594 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+
+from 共线性诊断 import check_collinearity
+from 面板结构 import PanelFrame
+
+
+def group_demean(values, codes, n_groups):
+    """按组去均值：values 为 (n, k) 数组，codes 为 0..n_groups-1 的组编码。"""
+    counts = np.bincount(codes, minlength=n_groups)
+    out = np.empty_like(values)
+    for j in range(values.shape[1]):
+        means = np.bincount(codes, weights=values[:, j], minlength=n_groups) / np.maximum(counts, 1)
+        out[:, j] = values[:, j] - means[codes]
+    return out
+
+
+def within_transform(values, entity_codes=None, time_codes=None, tol=1e-10, max_iter=10000, balanced=None):
+    """
+    吸收国家和/或年份固定效应的组内变换。
+
+    只有一个维度时直接按组去均值；两个维度同时吸收时：
+      - 平衡面板一步完成（x - 国家均值 - 年份均值 + 总均值）
+      - 非平衡面板用交替投影（交替按国家、按年份去均值）迭代到收敛
+    values 为 (n, k) 数组，编码为 0 起始的整数数组，传 None 表示不吸收该维度。
+    balanced 为已知的平衡面板标志（如 PanelFrame.balanced），None 时由编码判断。
+    """
+    values = np.asarray(values, dtype='float64')
+    if entity_codes is None and time_codes is None:
+        return values.copy()
+    if time_codes is None:
+        return group_demean(values, entity_codes, entity_codes.max() + 1)
+    if entity_codes is None:
+        return group_demean(values, time_codes, time_codes.max() + 1)
+
+    n_entities = entity_codes.max() + 1
+    n_times = time_codes.max() + 1
+    if balanced is None:
+        balanced = len(values) == n_entities * n_times and \
+            np.unique(entity_codes.astype('int64') * n_times + time_codes).size == len(values)
+    if balanced:
+        # 平衡面板：依次按国家、按年份去均值即为精确解
+        return group_demean(group_demean(values, entity_codes, n_entities), time_codes, n_times)
+
+    out = values.copy()
+    scale = np.maximum(np.abs(values).max(axis=0), 1.0)
+    for _ in range(max_iter):
+        previous = out
+        out = group_demean(group_demean(out, entity_codes, n_entities), time_codes, n_times)
+        if np.max(np.abs(out - previous) / scale) < tol:
+            break
+    return out
+
+
+class AbsorbedOLSResults:
+    """
+    吸收固定效应的 OLS 估计结果，只保存结构参数（不含国家、年份虚拟变量）。
+    属性命名与 linearmodels 的 PanelOLS 结果一致：params, std_errors, tstats, pvalues, resids, df_resid, summary。
+
+    结果同时保存（已去均值的）设计矩阵、(X'X)^{-1} 以及国家、年份编码，
+    covariance() / with_cov() 可在不重新拟合的情况下换用其它协方差类型，算过的协方差会被缓存。
+    """
+
+    def __init__(self, params, cov, resids, nobs, df_resid, df_absorbed, rsquared_within, dependent,
+                 effects, n_entities, n_times, cov_type, dropped=None, design=None, bread=None,
+                 entity_codes=None, time_codes=None):
+        self.params = params
+        self.cov = cov
+        self.resids = resids
+        self.nobs = nobs
+        self.df_resid = df_resid
+        self.df_absorbed = df_absorbed
+        self.rsquared_within = rsquared_within
+        self.dependent = dependent
+        self.effects = effects
+        self.n_entities = n_entities
+        self.n_times = n_times
+        self.cov_type = cov_type
+        # 拟合前因共线性剔除的变量及原因
+        self.dropped = dropped if dropped is not None else pd.DataFrame(columns=['变量', '原因'])
+        self._design = design
+        self._bread = bread
+        self._entity_codes = entity_codes
+        self._time_codes = time_codes
+        self._cov_cache = {}
+
+    def covariance(self, cov_type='robust', cluster='entity', bandwidth=None):
+        """
+        由保存的残差和设计矩阵计算指定类型的系数协方差（不重新拟合），按参数缓存。
+        cov_type 取值见 COV_TYPES；cluster 为 'entity'、'time' 或 'both'（双向聚类），只对 'clustered' 有效；
+        bandwidth 为 Driscoll-Kraay 的 Bartlett 核带宽，None 时取 floor(4 (T/100)^(2/9))。
+        """
+        _check_cov_type(cov_type, cluster)
+        key = _cov_key(cov_type, cluster, bandwidth)
+        if key not in self._cov_cache:
+            if self._design is None:
+                raise ValueError("结果未保存设计矩阵，无法换用其它协方差类型")
+            groups = _cov_groups(cov_type, cluster, self._entity_codes, self._time_codes)
+            df_resid = self.df_resid + _nested_df(cov_type, cluster, '国家' in self.effects, '年份' in self.effects,
+                                                  self.n_entities, self.n_times)
+            cov = _covariance(self._design, self.resids.to_numpy(), self._bread, df_resid, cov_type,
+                              groups, bandwidth)
+            self._cov_cache[key] = pd.DataFrame(cov, index=self.params.index, columns=self.params.index)
+        return self._cov_cache[key]
+
+    def with_cov(self, cov_type='robust', cluster='entity', bandwidth=None):
+        """返回换用另一种协方差的结果副本，系数、残差、设计矩阵和协方差缓存与原结果共用。"""
+        result = copy.copy(self)
+        result._use_cov(cov_type, cluster, bandwidth)
+        return result
+
+    def _use_cov(self, cov_type, cluster='entity', bandwidth=None):
+        self.cov = self.covariance(cov_type, cluster, bandwidth)
+        self.cov_type = _cov_label(cov_type, cluster, bandwidth)
+
+    @property
+    def std_errors(self):
+        return pd.Series(np.sqrt(np.diag(self.cov)), index=self.params.index, name='标准误')
+
+    @property
+    def tstats(self):
+        return (self.params / self.std_errors).rename('t值')
+
+    @property
+    def pvalues(self):
+        return pd.Series(2 * stats.t.sf(np.abs(self.tstats), self.df_resid), index=self.params.index, name='P值')
+
+    def conf_int(self, level=0.95):
+        q = stats.t.ppf(0.5 + level / 2, self.df_resid)
+        return pd.DataFrame({'下限': self.params - q * self.std_errors, '上限': self.params + q * self.std_errors})
+
+    @property
+    def summary(self):
+        table = pd.DataFrame({
+            '系数': self.params,
+            '标准误': self.std_errors,
+            't值': self.tstats,
+            'P值': self.pvalues,
+        }).join(self.conf_int())
+        effects = '、'.join(self.effects) if self.effects else '无'
+        lines = [
+            f"因变量: {self.dependent}",
+            f"吸收的固定效应: {effects}",
+            f"观测数: {self.nobs}    国家数: {self.n_entities}    年份数: {self.n_times}",
+            f"残差自由度: {self.df_resid}    吸收的自由度: {self.df_absorbed}",
+            f"{'组内R²' if self.effects else 'R²'}: {self.rsquared_within:.4f}    协方差类型: {self.cov_type}",
+        ]
+        if not self.dropped.empty:
+            lines.append("因共线性剔除: " + '; '.join(f"{v}（{r}）" for v, r in self.dropped.itertuples(index=False)))
+        lines += [
+            '',
+            table.to_string(float_format=lambda v: f'{v:.4f}'),
+        ]
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return self.summary
+
+
+class RandomEffectsResults(AbsorbedOLSResults):
+    """
+    随机效应（Swamy-Arora）估计结果，在 AbsorbedOLSResults 的基础上增加：
+      - variance_components：个体效应方差 σ²_u、特异误差方差 σ²_e 及 ρ = σ²_u / (σ²_u + σ²_e)
+      - theta：各国家的准去均值系数 θ_i = 1 - sqrt(σ²_e / (T_i σ²_u + σ²_e))
+    """
+
+    def __init__(self, variance_components, theta, **kwargs):
+        super().__init__(**kwargs)
+        self.variance_components = variance_components
+        self.theta = theta
+
+    @property
+    def summary(self):
+        lines = super().summary.split('\n')
+        vc = self.variance_components
+        lines.insert(2, f"随机效应: σ²_u = {vc['sigma2_u']:.4f}    σ²_e = {vc['sigma2_e']:.4f}    "
+                        f"ρ = {vc['rho']:.4f}    θ 中位数 = {self.theta.median():.4f}")
+        return '\n'.join(lines)
+
+
+COV_TYPES = ('unadjusted', 'robust', 'clustered', 'driscoll-kraay')
+CLUSTER_TYPES = {'entity': '国家', 'time': '年份', 'both': '国家和年份'}
+
+
+def _check_cov_type(cov_type, cluster='entity'):
+    if cov_type not in COV_TYPES:
+        raise ValueError(f"cov_type 只能为 {COV_TYPES} 之一，收到: {cov_type!r}")
+    if cov_type == 'clustered' and cluster not in CLUSTER_TYPES:
+        raise ValueError(f"cluster 只能为 {tuple(CLUSTER_TYPES)} 之一，收到: {cluster!r}")
+
+
+def _cov_key(cov_type, cluster='entity', bandwidth=None):
+    """协方差缓存的键：只保留对该类型有意义的参数。"""
+    return (cov_type, cluster if cov_type == 'clustered' else None,
+            bandwidth if cov_type == 'driscoll-kraay' else None)
+
+
+def _cov_label(cov_type, cluster='entity', bandwidth=None):
+    """摘要中显示的协方差类型。"""
+    if cov_type == 'clustered':
+        return f"clustered（按{CLUSTER_TYPES[cluster]}聚类）"
+    if cov_type == 'driscoll-kraay':
+        return f"driscoll-kraay（带宽 {'自动' if bandwidth is None else bandwidth}）"
+    return cov_type
+
+
+def _cov_groups(cov_type, cluster, entity_codes, time_codes):
+    """协方差所需的分组编码：聚类为国家/年份编码（双向聚类为二者的元组），Driscoll-Kraay 为年份编码。"""
+    if cov_type == 'driscoll-kraay':
+        return time_codes
+    if cov_type == 'clustered':
+        return {'entity': entity_codes, 'time': time_codes, 'both': (entity_codes, time_codes)}[cluster]
+    return None
+
+
+def _nested_df(cov_type, cluster, entity_effects, time_effects, n_entities, n_times):
+    """
+    聚类稳健协方差的小样本校正中不扣除的固定效应个数，约定与 linearmodels 相同：
+    只吸收一类固定效应且它嵌套在聚类中（按国家吸收、按国家聚类；按年份吸收、按年份或双向聚类）时，
+    这些固定效应不计入 (n-1)/残差自由度 的残差自由度，返回其水平数；同时吸收两类固定效应时全部扣除，返回 0。
+    嵌套的固定效应在每个聚类内部求和为零，不消耗聚类层面的自由度（Stata 的 xtreg, fe vce(cluster) 同样不扣除）。
+    """
+    if cov_type != 'clustered' or entity_effects == time_effects:
+        return 0
+    if entity_effects:
+        return n_entities if cluster == 'entity' else 0
+    return n_times if cluster in ('time', 'both') else 0
+
+
+def _group_sum(values, codes):
+    """按 0 起始的整数编码对 (n, k) 数组逐列求组内和，返回 (组数, k)。"""
+    n_groups = codes.max() + 1
+    return np.column_stack([np.bincount(codes, weights=col, minlength=n_groups) for col in values.T])
+
+
+def _score_meat(scores, df_resid, cov_type, groups=None, bandwidth=None, nobs=None):
+    """
+    由逐观测得分 x_i e_i 计算夹心估计的中间矩阵（含小样本校正）：
+      - 'robust'：S'S · n/残差自由度（HC1）
+      - 'clustered'：按组求和后 Σ s_g s_g' · G/(G-1)·(n-1)/残差自由度；groups 为两组编码的元组时
+        按 Cameron-Gelbach-Miller 双向聚类，两个单向聚类相加再减去按交叉组聚类的部分，各项使用各自的 G。
+        这里的残差自由度由调用方按 _nested_df 加回嵌套在聚类中的固定效应个数
+      - 'driscoll-kraay'：groups 为按时间先后编码的年份，按年份求和后用 Bartlett 核加权的自协方差，
+        乘以 n/残差自由度；对截面相关和序列相关都稳健
+    与 linearmodels 在 debiased=True、group_debias=True 时的结果一致（聚类时自由度的约定见 _nested_df）。
+    scores 已按组汇总（每组一行，groups 为 0..G-1）时，需用 nobs 传入原始观测数。
+    """
+    nobs = len(scores) if nobs is None else nobs
+    if cov_type == 'robust':
+        return scores.T @ scores * (nobs / df_resid)
+    if cov_type == 'clustered':
+        if isinstance(groups, tuple):
+            first, second = groups
+            cross = np.unique(first.astype('int64') * (second.max() + 1) + second, return_inverse=True)[1]
+            terms = [(first, 1), (second, 1), (cross.ravel(), -1)]
+        else:
+            terms = [(groups, 1)]
+        meat = 0
+        for codes, sign in terms:
+            sums = _group_sum(scores, codes)
+            meat = meat + sign * len(sums) / (len(sums) - 1) * (sums.T @ sums)
+        return meat * (nobs - 1) / df_resid
+
+    sums = _group_sum(scores, groups)
+    n_periods = len(sums)
+    if bandwidth is None:
+        bandwidth = np.floor(4 * (n_periods / 100) ** (2 / 9))
+    meat = sums.T @ sums
+    for lag in range(1, min(int(bandwidth), n_periods - 1) + 1):
+        gamma = sums[lag:].T @ sums[:-lag]
+        meat += (1 - lag / (bandwidth + 1)) * (gamma + gamma.T)
+    return meat * (nobs / df_resid)
+
+
+def _covariance(x, resids, bread, df_resid, cov_type, groups=None, bandwidth=None):
+    """
+    由（已吸收固定效应的）设计矩阵、残差和 bread = (X'X)^{-1} 计算系数协方差。
+    'unadjusted' 为 σ²(X'X)^{-1}，σ² 以残差自由度计算；其余类型为 bread · 中间矩阵 · bread，
+    中间矩阵见 _score_meat，groups 由 _cov_groups 给出。
+    """
+    if cov_type == 'unadjusted':
+        return bread * (resids @ resids / df_resid)
+    cov = bread @ _score_meat(x * resids[:, None], df_resid, cov_type, groups, bandwidth) @ bread
+    return (cov + cov.T) / 2
+
+
+def std_error_table(result, specs=(('robust',), ('clustered', 'entity'), ('clustered', 'both'), ('driscoll-kraay',))):
+    """
+    同一次拟合在多种协方差下的标准误对照表：第一列为系数，其后每列为一种协方差下的标准误。
+    specs 中每一项为传给 result.covariance() 的参数元组 (cov_type[, cluster[, bandwidth]])，不重新拟合。
+    """
+    table = {'系数': result.params}
+    for spec in specs:
+        table[_cov_label(*spec)] = np.sqrt(np.diag(result.covariance(*spec)))
+    return pd.DataFrame(table, index=result.params.index)
+
+
+def _prepare_sample(data, dependent, exog, entity, time):
+    """
+    删除缺失行并对 entity、time 编码，返回 (样本, 国家编码, 国家取值, 年份编码, 年份取值, 数值矩阵)。
+    年份按取值排序编码，Driscoll-Kraay 协方差依赖这一顺序。
+    data 为 PanelFrame 时直接使用其中预先算好的编码，不再对国家名和年份做哈希。
+    """
+    if isinstance(data, PanelFrame):
+        sample = data.dropna([dependent] + exog)
+        return (sample, sample.entity_codes, sample.entities, sample.time_codes, sample.time_levels,
+                sample.values([dependent] + exog))
+    sample = data[[entity, time, dependent] + exog].dropna()
+    entity_codes, entity_levels = pd.factorize(sample[entity])
+    time_codes, time_levels = pd.factorize(sample[time], sort=True)
+    values = sample[[dependent] + exog].to_numpy(dtype='float64')
+    return sample, entity_codes, entity_levels, time_codes, time_levels, values
+
+
+def _fit_transformed(demeaned, names, index, df_absorbed, dependent, effects, n_entities, n_times, cov_type,
+                     raw=None, entity_codes=None, time_codes=None, cluster='entity', bandwidth=None,
+                     results_class=AbsorbedOLSResults, **extra):
+    """
+    在已吸收固定效应的 [y, X] 上做 OLS 并计算协方差。
+    拟合前先做一次共线性检查，剔除与固定效应或其它解释变量共线的列后只拟合一次；
+    raw 为去均值前的 [y, X]，用于识别与固定效应共线的列；
+    entity_codes、time_codes 保存在结果中，供聚类和 Driscoll-Kraay 协方差使用。
+    results_class 为结果类，extra 中的参数原样传给它。
+    """
+    y = demeaned[:, 0]
+    keep, dropped = check_collinearity(demeaned[:, 1:], names, None if raw is None else raw[:, 1:])
+    x = demeaned[:, 1:][:, keep]
+    names = [names[j] for j in keep]
+    xtx_inv = np.linalg.inv(x.T @ x)
+    beta = xtx_inv @ (x.T @ y)
+    resids = y - x @ beta
+
+    nobs = len(y)
+    # 无固定效应时 y 未去均值，R² 按总离差计算
+    total = y - y.mean() if not effects else y
+    result = results_class(
+        params=pd.Series(beta, index=names, name='系数'),
+        cov=None,
+        resids=pd.Series(resids, index=index, name='残差'),
+        nobs=nobs,
+        df_resid=nobs - x.shape[1] - df_absorbed,
+        df_absorbed=df_absorbed,
+        rsquared_within=1 - resids @ resids / (total @ total),
+        dependent=dependent,
+        effects=effects,
+        n_entities=n_entities,
+        n_times=n_times,
+        cov_type=cov_type,
+        dropped=dropped,
+        design=x,
+        bread=xtx_inv,
+        entity_codes=entity_codes,
+        time_codes=time_codes,
+        **extra,
+    )
+    result._use_cov(cov_type, cluster, bandwidth)
+    return result
+
+
+def _with_const(values):
+    """在 [y, X] 的 X 前插入常数列，用于不吸收任何固定效应的混合 OLS。"""
+    return np.column_stack([values[:, 0], np.ones(len(values)), values[:, 1:]])
+
+
+def fit_absorbed_ols(data, dependent, exog, entity='Country', time='Year',
+                     entity_effects=True, time_effects=True, cov_type='unadjusted', cluster='entity', bandwidth=None):
+    """
+    吸收国家、年份固定效应的 OLS，点估计与 `y ~ x + C(Country) + C(Year)` 的虚拟变量回归相同。
+
+    data 为长格式 DataFrame（含 entity、time 列）或 PanelFrame，dependent 为因变量名，exog 为解释变量名列表
+    （不含常数项，常数项被固定效应吸收；两类固定效应都不吸收时自动加入常数项 const）。
+    任一所用变量缺失的行会被删除。
+    cov_type 可为 'unadjusted'（同方差）、'robust'（HC1，与 statsmodels 的 HC1 一致）、
+    'clustered'（cluster 为 'entity'、'time' 或 'both'）或 'driscoll-kraay'（bandwidth 为核带宽）；
+    拟合后可用结果的 with_cov() 换用其它协方差而无需重新拟合。
+    残差自由度 = 观测数 - 解释变量个数 - 吸收的固定效应个数（双向时为 国家数 + 年份数 - 1）。
+    """
+    _check_cov_type(cov_type, cluster)
+
+    exog = list(exog)
+    sample, entity_codes, entity_levels, time_codes, time_levels, values = \
+        _prepare_sample(data, dependent, exog, entity, time)
+
+    names = exog
+    raw = None
+    if entity_effects or time_effects:
+        demeaned = within_transform(values,
+                                    entity_codes if entity_effects else None,
+                                    time_codes if time_effects else None,
+                                    balanced=getattr(sample, 'balanced', None))
+        raw = values
+    else:
+        demeaned = _with_const(values)
+        names = ['const'] + exog
+
+    df_absorbed = (len(entity_levels) if entity_effects else 0) + (len(time_levels) if time_effects else 0)
+    if entity_effects and time_effects:
+        df_absorbed -= 1
+
+    effects = [name for name, on in (('国家', entity_effects), ('年份', time_effects)) if on]
+    return _fit_transformed(demeaned, names, sample.index, df_absorbed, dependent, effects,
+                            len(entity_levels), len(time_levels), cov_type, raw=raw, entity_codes=entity_codes,
+                            time_codes=time_codes, cluster=cluster, bandwidth=bandwidth)
+
+
+def _fit_random(values, entity_codes, entity_levels, time_codes, sigma2_e, index, exog, dependent, n_times,
+                cov_type, cluster='entity', bandwidth=None):
+    """
+    在已知特异误差方差 σ²_e（来自国家固定效应模型）的基础上完成 Swamy-Arora 随机效应估计：
+    用国家均值的组间回归得到 σ²_u，按 θ_i 对 [y, 1, X] 做准去均值后 OLS。
+    """
+    counts = np.bincount(entity_codes)
+    means = np.column_stack([np.bincount(entity_codes, weights=col) for col in values.T]) / counts[:, None]
+    between = _with_const(means)
+    coef = np.linalg.lstsq(between[:, 1:], between[:, 0], rcond=None)[0]
+    u = between[:, 0] - between[:, 1:] @ coef
+    n_entities = len(counts)
+    t_bar = n_entities / (1 / counts).sum()
+    sigma2_u = max(0.0, u @ u / (n_entities - between.shape[1] + 1) - sigma2_e / t_bar)
+    theta = 1 - np.sqrt(sigma2_e / (counts * sigma2_u + sigma2_e))
+
+    quasi = _with_const(values) - theta[entity_codes][:, None] * between[entity_codes]
+    components = pd.Series({'sigma2_u': sigma2_u, 'sigma2_e': sigma2_e, 'rho': sigma2_u / (sigma2_u + sigma2_e)})
+    return _fit_transformed(quasi, ['const'] + exog, index, df_absorbed=0, dependent=dependent, effects=[],
+                            n_entities=n_entities, n_times=n_times, cov_type=cov_type, entity_codes=entity_codes,
+                            time_codes=time_codes, cluster=cluster, bandwidth=bandwidth,
+                            results_class=RandomEffectsResults, variance_components=components,
+                            theta=pd.Series(theta, index=entity_levels, name='theta'))
+
+
+def fit_random_effects(data, dependent, exog, entity='Country', time='Year', cov_type='unadjusted',
+                       cluster='entity', bandwidth=None):
+    """
+    随机效应模型（Swamy-Arora 方差分量），结果与 linearmodels 的 RandomEffects 一致。
+    σ²_e 取自国家固定效应模型的残差，σ²_u 取自国家均值的组间回归（含常数项），
+    θ_i 按各国观测数 T_i 计算，非平衡面板同样适用。协方差参数同 fit_absorbed_ols。
+    """
+    _check_cov_type(cov_type, cluster)
+
+    exog = list(exog)
+    sample, entity_codes, entity_levels, time_codes, time_levels, values = \
+        _prepare_sample(data, dependent, exog, entity, time)
+    within = _fit_transformed(group_demean(values, entity_codes, len(entity_levels)), exog, sample.index,
+                              df_absorbed=len(entity_levels), dependent=dependent, effects=['国家'],
+                              n_entities=len(entity_levels), n_times=len(time_levels), cov_type='unadjusted',
+                              raw=values)
+    sigma2_e = within.resids @ within.resids / within.df_resid
+    return _fit_random(values, entity_codes, entity_levels, time_codes, sigma2_e, sample.index, exog, dependent,
+                       len(time_levels), cov_type, cluster, bandwidth)
+
+
+def fit_fe_family(data, dependent, exog, entity='Country', time='Year', cov_type='unadjusted',
+                  cluster='entity', bandwidth=None):
+    """
+    一次性估计同一设定下的四个模型：无固定效应（含常数项）、国家固定效应、年份固定效应、双向固定效应，
+    以及国家随机效应模型，并给出嵌套模型间的 F 检验。
+
+    样本筛选、国家/年份编码和按组去均值只做一次：国家去均值与年份去均值各算一遍，
+    双向模型在国家去均值的结果上继续吸收年份效应，随机效应模型的 σ²_e 直接取自国家固定效应模型的残差，
+    这些模型共用上述中间结果。
+    返回 (结果字典, F检验表)：
+      - 结果字典的键为 'pooled', 'entity', 'time', 'both', 'random'
+      - F检验表以检验名称为索引，列为 F统计量、分子自由度、分母自由度、P值
+    协方差参数同 fit_absorbed_ols。
+    """
+    _check_cov_type(cov_type, cluster)
+
+    exog = list(exog)
+    sample, entity_codes, entity_levels, time_codes, time_levels, values = \
+        _prepare_sample(data, dependent, exog, entity, time)
+    n_entities = len(entity_levels)
+    n_times = len(time_levels)
+
+    entity_demeaned = group_demean(values, entity_codes, n_entities)
+    time_demeaned = group_demean(values, time_codes, n_times)
+    both_demeaned = within_transform(entity_demeaned, entity_codes, time_codes)
+
+    common = dict(index=sample.index, dependent=dependent, n_entities=n_entities, n_times=n_times,
+                  cov_type=cov_type, entity_codes=entity_codes, time_codes=time_codes, cluster=cluster,
+                  bandwidth=bandwidth)
+    results = {
+        'pooled': _fit_transformed(_with_const(values), ['const'] + exog, df_absorbed=0, effects=[], **common),
+        'entity': _fit_transformed(entity_demeaned, exog, df_absorbed=n_entities, effects=['国家'],
+                                   raw=values, **common),
+        'time': _fit_transformed(time_demeaned, exog, df_absorbed=n_times, effects=['年份'], raw=values, **common),
+        'both': _fit_transformed(both_demeaned, exog, df_absorbed=n_entities + n_times - 1,
+                                 effects=['国家', '年份'], raw=values, **common),
+    }
+    entity_fit = results['entity']
+    results['random'] = _fit_random(values, entity_codes, entity_levels, time_codes,
+                                    entity_fit.resids @ entity_fit.resids / entity_fit.df_resid,
+                                    sample.index, exog, dependent, n_times, cov_type, cluster, bandwidth)
+
+    tests = [
+        ('国家固定效应F检验', 'pooled', 'entity'),
+        ('时间固定效应F检验', 'pooled', 'time'),
+        ('双向对国家固定效应F检验', 'entity', 'both'),
+        ('双向对时间固定效应F检验', 'time', 'both'),
+    ]
+    rows = []
+    for name, restricted, unrestricted in tests:
+        rows.append({'检验类型': name, **nested_f_test(results[restricted], results[unrestricted])})
+    return results, pd.DataFrame(rows).set_index('检验类型')
+
+
+def nested_f_test(restricted, unrestricted):
+    """
+    嵌套模型的 F 检验：F = ((SSR_r - SSR_u) / (df_r - df_u)) / (SSR_u / df_u)。
+    返回包含 F统计量、分子自由度、分母自由度、P值 的字典；自由度差不为正时 F 与 P 为 NaN。
+    """
+    ssr_restricted = float(restricted.resids @ restricted.resids)
+    ssr_unrestricted = float(unrestricted.resids @ unrestricted.resids)
+    df_diff = restricted.df_resid - unrestricted.df_resid
+    df_unrestricted = unrestricted.df_resid
+    if df_diff <= 0:
+        f_stat = p_value = np.nan
+    else:
+        f_stat = ((ssr_restricted - ssr_unrestricted) / df_diff) / (ssr_unrestricted / df_unrestricted)
+        p_value = stats.f.sf(f_stat, df_diff, df_unrestricted)
+    return {'F统计量': f_stat, '分子自由度': df_diff, '分母自由度': df_unrestricted, 'P值': p_value}
+
+
+def hausman_test(fe, re, tol=1e-8):
+    """
+    Hausman 检验：H = (b_FE - b_RE)' [V_FE - V_RE]^+ (b_FE - b_RE)，原假设为个体效应与解释变量不相关（随机效应一致）。
+
+    直接使用已拟合结果的 params 与协方差（本模块的结果或 linearmodels 的 PanelOLS / RandomEffects 结果均可），
+    只比较两个模型共有的系数（不含常数项），不重新估计。
+    经典 Hausman 检验要求随机效应在原假设下有效，因此本模块的结果无论拟合时用哪种协方差，
+    这里都从缓存的残差和设计矩阵取 unadjusted 协方差；linearmodels 的结果直接使用其 cov。
+    两个模型各自估计误差方差时，差矩阵在有限样本中常常不是半正定的：
+    re 为本模块的随机效应结果时，按固定效应的 σ²_e 重新缩放其协方差，使两者使用同一误差方差（即 Stata 的 sigmaless）；
+    其余情况对差矩阵做特征分解，只在正特征值方向上求广义逆，自由度为这些方向的个数，统计量总是非负；
+    特征分解前按 sqrt(diag V_FE) 标准化（相关系数形式），tol 为相对于最大特征值的容差，结果与变量的量纲无关。
+    存在异方差或序列相关时改用 mundlak_test。
+    返回包含 统计量、自由度、P值 的字典。
+    """
+    common = [c for c in fe.params.index if c in re.params.index and c != 'const']
+    diff = (fe.params[common] - re.params[common]).to_numpy(dtype='float64')
+    fe_cov = fe.covariance('unadjusted') if isinstance(fe, AbsorbedOLSResults) else fe.cov
+    re_cov = re.covariance('unadjusted') if isinstance(re, AbsorbedOLSResults) else re.cov
+    re_cov = np.asarray(re_cov.loc[common, common], dtype='float64')
+    if isinstance(re, RandomEffectsResults):
+        re_cov = re_cov * re.variance_components['sigma2_e'] / (re.resids @ re.resids / re.df_resid)
+    fe_cov = np.asarray(fe_cov.loc[common, common], dtype='float64')
+    cov = fe_cov - re_cov
+    # 先按固定效应标准误标准化，再用相对容差判断退化方向：统计量不随变量的量纲变化，
+    # 量级悬殊的变量（如人均 GDP 与 HDI）也不会因未标准化的特征值相差过大而被误删
+    scale = np.sqrt(np.diag(fe_cov))
+    scale = np.where(scale > 0, scale, 1.0)
+    cov = cov / np.outer(scale, scale)
+    eigval, eigvec = np.linalg.eigh((cov + cov.T) / 2)
+    positive = eigval > tol * max(np.abs(eigval).max(initial=0), np.finfo(float).tiny)
+    projected = eigvec[:, positive].T @ (diff / scale)
+    stat = float(projected @ (projected / eigval[positive]))
+    df = int(positive.sum())
+    return {'统计量': stat, '自由度': df, 'P值': stats.chi2.sf(stat, df) if df else np.nan}
+
+
+def mundlak_test(data, dependent, exog, entity='Country', time='Year', time_effects=False):
+    """
+    回归形式的 Hausman 检验（Mundlak）：在混合回归中加入各解释变量的国家均值，
+        y = α + Xβ + X̄_i γ + e，
+    用按国家聚类的稳健协方差做 γ = 0 的 Wald 检验；拒绝原假设说明个体效应与解释变量相关，应使用固定效应。
+    对异方差和序列相关稳健，只需一次 OLS。time_effects=True 时同时吸收年份效应。
+    不随时间变化的解释变量与其国家均值共线，会在拟合前剔除。
+    返回包含 统计量（Wald χ²）、自由度、P值 的字典。
+    """
+    exog = list(exog)
+    sample, entity_codes, entity_levels, time_codes, time_levels, values = \
+        _prepare_sample(data, dependent, exog, entity, time)
+    means = values[:, 1:] - group_demean(values[:, 1:], entity_codes, len(entity_levels))
+    augmented = np.column_stack([values, means])
+    mean_names = [f'{c}_国家均值' for c in exog]
+    if time_effects:
+        demeaned = group_demean(augmented, time_codes, len(time_levels))
+        names = exog + mean_names
+        df_absorbed = len(time_levels)
+    else:
+        demeaned = _with_const(augmented)
+        names = ['const'] + exog + mean_names
+        df_absorbed = 0
+
+    result = _fit_transformed(demeaned, names, sample.index, df_absorbed=df_absorbed, dependent=dependent,
+                              effects=['年份'] if time_effects else [], n_entities=len(entity_levels),
+                              n_times=len(time_levels), cov_type='clustered', entity_codes=entity_codes,
+                              time_codes=time_codes)
+    tested = [c for c in mean_names if c in result.params.index]
+    gamma = result.params[tested].to_numpy()
+    stat = float(gamma @ np.linalg.solve(result.cov.loc[tested, tested].to_numpy(), gamma))
+    return {'统计量': stat, '自由度': len(tested), 'P值': stats.chi2.sf(stat, len(tested))}
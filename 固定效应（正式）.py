@@ -1,78 +1,29 @@
 import pandas as pd
-import scipy.stats as stats
-import statsmodels.api as sm
-from linearmodels.panel import PanelOLS
 from sklearn.preprocessing import StandardScaler
-from statsmodels.stats.outliers_influence import variance_inflation_factor
 
+from 共线性诊断 import eliminate_high_vif, vif_table
+from 固定效应估计 import fit_fe_family, hausman_test, mundlak_test, std_error_table
+from 性能记录 import stage
+from 野自助法 import wild_cluster_bootstrap
+from 面板缓存 import load_panel
+
+
+# 1. 导入数据 - 第一行为国家，第一列为时间，读取后直接得到长格式数值列
+sources = {
+    'FDI_inflow': r"D:\FDI_inflow_of_GDP_(%)(1).xlsx",
+    'GDP_per_Capita': r"D:\GDP_per_Capita(1).xlsx",
+    'Total_Avg_Wage': r"D:\Total Average Wage(1).xlsx",
+    'Fertility_Rate': r"D:\Fertility_Rate(1).xlsx",
+    'FEM_UNEMP': r"D:\FEM_UNEMP(1).xlsx",
+    'HDI': r"D:\HDI(1).xlsx",
+    'HIST_TRADE': r"D:\HIST_TRADE(3).xlsx",
+    'GWG': r"D:\GWG.xlsx",
+}
 
-# 1. 导入数据 - 修改数据读取方式，考虑到第一行为国家，第一列为时间
-def read_data_with_structure(file_path):
-    # 读取Excel文件，不指定header和index_col
-    df = pd.read_excel(file_path, header=None)
-    # 获取国家列表（第一行，从第二列开始）
-    countries = df.iloc[0, 1:].tolist()
-    # 获取年份列表（第一列，从第二行开始）
-    years = df.iloc[1:, 0].tolist()
-
-    # 创建新的DataFrame来存储重组后的数据
-    data_list = []
-
-    # 遍历每个国家和年份，提取对应的数据
-    for i, country in enumerate(countries):
-        for j, year in enumerate(years):
-            # i+1和j+1是因为我们跳过了第一行和第一列
-            value = df.iloc[j + 1, i + 1]
-            data_list.append({'Country': country, 'Year': year, 'Value': value})
-
-    # 创建新的DataFrame
-    new_df = pd.DataFrame(data_list)
-
-    # 返回重组后的DataFrame
-    return new_df
-
-
-# 读取并重组所有数据文件
-fdi_df = read_data_with_structure(r"D:\FDI_inflow_of_GDP_(%)(1).xlsx")
-fdi_df.rename(columns={'Value': 'FDI_inflow'}, inplace=True)
-fdi_df['FDI_inflow'] = pd.to_numeric(fdi_df['FDI_inflow'], errors='coerce')
-
-gdp_df = read_data_with_structure(r"D:\GDP_per_Capita(1).xlsx")
-gdp_df.rename(columns={'Value': 'GDP_per_Capita'}, inplace=True)
-gdp_df['GDP_per_Capita'] = pd.to_numeric(gdp_df['GDP_per_Capita'], errors='coerce')
-
-wage_df = read_data_with_structure(r"D:\Total Average Wage(1).xlsx")
-wage_df.rename(columns={'Value': 'Total_Avg_Wage'}, inplace=True)
-wage_df['Total_Avg_Wage'] = pd.to_numeric(wage_df['Total_Avg_Wage'], errors='coerce')
-
-fertility_df = read_data_with_structure(r"D:\Fertility_Rate(1).xlsx")
-fertility_df.rename(columns={'Value': 'Fertility_Rate'}, inplace=True)
-fertility_df['Fertility_Rate'] = pd.to_numeric(fertility_df['Fertility_Rate'], errors='coerce')
-
-fem_emp_df = read_data_with_structure(r"D:\FEM_UNEMP(1).xlsx")
-fem_emp_df.rename(columns={'Value': 'FEM_UNEMP'}, inplace=True)
-fem_emp_df['FEM_UNEMP'] = pd.to_numeric(fem_emp_df['FEM_UNEMP'], errors='coerce')
-
-hdi_df = read_data_with_structure(r"D:\HDI(1).xlsx")
-hdi_df.rename(columns={'Value': 'HDI'}, inplace=True)
-hdi_df['HDI'] = pd.to_numeric(hdi_df['HDI'], errors='coerce')
-
-hist_trade_df = read_data_with_structure(r"D:\HIST_TRADE(3).xlsx")
-hist_trade_df.rename(columns={'Value': 'HIST_TRADE'}, inplace=True)
-hist_trade_df['HIST_TRADE'] = pd.to_numeric(hist_trade_df['HIST_TRADE'], errors='coerce')
-
-gwg_df = read_data_with_structure(r"D:\GWG.xlsx")
-gwg_df.rename(columns={'Value': 'GWG'}, inplace=True)
-gwg_df['GWG'] = pd.to_numeric(gwg_df['GWG'], errors='coerce')
-
-# 2. 合并数据
-data = fdi_df.merge(gdp_df, on=['Country', 'Year'], how='inner')
-data = data.merge(wage_df, on=['Country', 'Year'], how='inner')
-data = data.merge(fertility_df, on=['Country', 'Year'], how='inner')
-data = data.merge(fem_emp_df, on=['Country', 'Year'], how='inner')
-data = data.merge(hdi_df, on=['Country', 'Year'], how='inner')
-data = data.merge(hist_trade_df, on=['Country', 'Year'], how='inner')
-data = data.merge(gwg_df, on=['Country', 'Year'], how='inner')
+# 2. 合并数据（内连接，不插值）；源文件未变化时直接读取磁盘缓存
+# 设置环境变量 GWG_TRACE=阶段记录.json 运行时，各阶段的耗时和内存会写入该文件并在结束时汇总
+with stage('读取面板') as s:
+    data = s.set_shape(load_panel(sources, how='inner', fill=False))
 
 # 检查数据是否有缺失值
 print("数据缺失值检查:")
@@ -101,155 +52,106 @@ data.set_index(['Country', 'Year'], inplace=True)
 X_orig = data[['FDI_inflow', 'GDP_per_Capita', 'Total_Avg_Wage', 'HDI', 'Fertility_Rate', 'FEM_UNEMP', 'HIST_TRADE']]
 
 # 标准化数据以减少多重共线性问题
-scaler = StandardScaler()
-X_scaled_array = scaler.fit_transform(X_orig)
-X_scaled = pd.DataFrame(X_scaled_array, columns=X_orig.columns, index=X_orig.index)
-
-# 检查多重共线性
-X_with_const = sm.add_constant(X_scaled)
-vif_data = pd.DataFrame()
-vif_data["变量"] = X_with_const.columns
-vif_data["VIF"] = [variance_inflation_factor(X_with_const.values, i) for i in range(X_with_const.shape[1])]
+with stage('标准化') as s:
+    scaler = StandardScaler()
+    X_scaled_array = scaler.fit_transform(X_orig)
+    X_scaled = s.set_shape(pd.DataFrame(X_scaled_array, columns=X_orig.columns, index=X_orig.index))
+
+# 检查多重共线性（一次求逆得到全部VIF，等价于逐个含常数项的辅助回归）
+with stage('VIF诊断') as s:
+    vif_data = vif_table(X_scaled)
+    vif_absorbed = vif_table(X_scaled, absorb=('Country', 'Year'))
+    s.set_shape(X_scaled)
 print("\n多重共线性检验 (VIF) - 标准化后:")
 print(vif_data)
+print("\n多重共线性检验 (VIF) - 吸收国家、年份固定效应后:")
+print(vif_absorbed)
 
-# 处理高VIF值变量
+# 处理高VIF值变量：迭代剔除VIF最高的变量，每次剔除后更新其余变量的VIF，直到全部不超过10
 high_vif = vif_data[vif_data["VIF"] > 10]
 if not high_vif.empty:
     print("\n警告：以下变量存在严重多重共线性问题:")
     print(high_vif)
 
-    # 移除VIF值最高的变量（除了常数项）
-    worst_var = high_vif[high_vif["变量"] != "const"].sort_values("VIF", ascending=False)
-    if not worst_var.empty:
-        var_to_remove = worst_var.iloc[0]["变量"]
-        print(f"\n自动移除多重共线性最严重的变量: {var_to_remove}")
-        X_scaled = X_scaled.drop(columns=[var_to_remove])
-        print(f"剩余变量: {X_scaled.columns.tolist()}")
-
-# 添加常数项
-X_scaled = sm.add_constant(X_scaled)
-y = data['GWG']
+    with stage('剔除高VIF变量'):
+        kept_vars, vif_history = eliminate_high_vif(X_scaled, threshold=10)
+    for var_to_remove, vif_value in zip(vif_history['剔除变量'], vif_history['VIF']):
+        print(f"\n自动移除多重共线性最严重的变量: {var_to_remove} (VIF={vif_value:.2f})")
+    X_scaled = X_scaled[kept_vars]
+    print(f"剩余变量: {X_scaled.columns.tolist()}")
+
+# 5-8. 一次性估计无固定效应（含常数项）、国家固定效应、时间固定效应、双固定效应四个模型及随机效应模型，
+# 这些模型共用同一份样本、国家/年份编码和组内去均值结果
+fe_data = X_scaled.join(data['GWG']).reset_index()
+with stage('固定效应模型族') as s:
+    fe_results, f_tests = fit_fe_family(fe_data, 'GWG', X_scaled.columns.tolist(), cov_type='robust')
+    s.set_shape(fe_results['both'])
+pooled_results = fe_results['pooled']
+entity_results = fe_results['entity']
+time_results = fe_results['time']
+both_results = fe_results['both']
+random_results = fe_results['random']
+
+for title, result in [("无固定效应模型", pooled_results), ("仅国家固定效应模型", entity_results),
+                      ("仅时间固定效应模型", time_results), ("双固定效应模型", both_results),
+                      ("随机效应模型", random_results)]:
+    print(f"\n{title}:")
+    print(result.summary)
+
+# 9-10. 检验国家固定效应、时间固定效应是否应该引入 (F检验，均以无固定效应模型为受约束模型)
+print("\n嵌套模型F检验:")
+print(f_tests)
+
+f_stat_entity, p_val_entity = f_tests.loc['国家固定效应F检验', ['F统计量', 'P值']]
+f_stat_time, p_val_time = f_tests.loc['时间固定效应F检验', ['F统计量', 'P值']]
 
-# 5. 首先运行无固定效应模型作为基准
-print("\n无固定效应模型:")
-try:
-    pooled_model = PanelOLS(y, X_scaled, entity_effects=False, time_effects=False)
-    pooled_results = pooled_model.fit(cov_type='robust')
-    print(pooled_results.summary)
-except Exception as e:
-    print(f"无固定效应模型估计失败: {str(e)}")
-    print("尝试使用check_rank=False...")
-    pooled_model = PanelOLS(y, X_scaled, entity_effects=False, time_effects=False)
-    pooled_results = pooled_model.fit(cov_type='robust', check_rank=False)
-    print(pooled_results.summary)
-
-# 6. 运行仅包含国家固定效应的模型
-print("\n仅国家固定效应模型:")
-try:
-    entity_model = PanelOLS(y, X_scaled, entity_effects=True, time_effects=False)
-    entity_results = entity_model.fit(cov_type='robust')
-    print(entity_results.summary)
-except Exception as e:
-    print(f"国家固定效应模型估计失败: {str(e)}")
-    print("尝试使用check_rank=False...")
-    entity_model = PanelOLS(y, X_scaled, entity_effects=True, time_effects=False)
-    entity_results = entity_model.fit(cov_type='robust', check_rank=False)
-    print(entity_results.summary)
-
-# 7. 运行仅包含时间固定效应的模型
-print("\n仅时间固定效应模型:")
-try:
-    time_model = PanelOLS(y, X_scaled, entity_effects=False, time_effects=True)
-    time_results = time_model.fit(cov_type='robust')
-    print(time_results.summary)
-except Exception as e:
-    print(f"时间固定效应模型估计失败: {str(e)}")
-    print("尝试使用check_rank=False...")
-    time_model = PanelOLS(y, X_scaled, entity_effects=False, time_effects=True)
-    time_results = time_model.fit(cov_type='robust', check_rank=False)
-    print(time_results.summary)
-
-# 8. 运行双固定效应模型
-print("\n双固定效应模型:")
-try:
-    both_model = PanelOLS(y, X_scaled, entity_effects=True, time_effects=True)
-    both_results = both_model.fit(cov_type='robust')
-    print(both_results.summary)
-except Exception as e:
-    print(f"双固定效应模型估计失败: {str(e)}")
-    print("尝试使用check_rank=False...")
-    both_model = PanelOLS(y, X_scaled, entity_effects=True, time_effects=True)
-    both_results = both_model.fit(cov_type='robust', check_rank=False)
-    print(both_results.summary)
-
-# 9. 检验国家固定效应是否应该引入 (F检验)
 print("\n检验国家固定效应是否应该引入:")
-f_stat_entity = None
-p_val_entity = None
-try:
-    # 计算F统计量
-    ssr_restricted = (pooled_results.resids ** 2).sum()
-    ssr_unrestricted = (entity_results.resids ** 2).sum()
-    df_restricted = pooled_results.df_resid
-    df_unrestricted = entity_results.df_resid
-    df_diff = df_restricted - df_unrestricted
-
-    if df_diff > 0:
-        f_stat_entity = ((ssr_restricted - ssr_unrestricted) / df_diff) / (ssr_unrestricted / df_unrestricted)
-        p_val_entity = 1 - stats.f.cdf(f_stat_entity, df_diff, df_unrestricted)
-        print(f"F统计量: {f_stat_entity:.4f}, P值: {p_val_entity:.4f}")
-
-        if p_val_entity < 0.05:
-            print("结论: 国家固定效应显著，应该引入国家固定效应")
-            entity_significant = True
-        else:
-            print("结论: 国家固定效应不显著，可以不引入国家固定效应")
-            entity_significant = False
-    else:
-        print("无法计算F统计量：自由度差异不足")
-        entity_significant = False
-except Exception as e:
-    print(f"F检验计算失败: {str(e)}")
-    entity_significant = False
+entity_significant = bool(p_val_entity < 0.05)
+if pd.isna(f_stat_entity):
+    print("无法计算F统计量：自由度差异不足")
+elif entity_significant:
+    print(f"F统计量: {f_stat_entity:.4f}, P值: {p_val_entity:.4f}")
+    print("结论: 国家固定效应显著，应该引入国家固定效应")
+else:
+    print(f"F统计量: {f_stat_entity:.4f}, P值: {p_val_entity:.4f}")
+    print("结论: 国家固定效应不显著，可以不引入国家固定效应")
 
-# 10. 检验时间固定效应是否应该引入 (F检验)
 print("\n检验时间固定效应是否应该引入:")
-f_stat_time = None
-p_val_time = None
-try:
-    # 计算F统计量
-    ssr_restricted = (pooled_results.resids ** 2).sum()
-    ssr_unrestricted = (time_results.resids ** 2).sum()
-    df_restricted = pooled_results.df_resid
-    df_unrestricted = time_results.df_resid
-    df_diff = df_restricted - df_unrestricted
-
-    if df_diff > 0:
-        f_stat_time = ((ssr_restricted - ssr_unrestricted) / df_diff) / (ssr_unrestricted / df_unrestricted)
-        p_val_time = 1 - stats.f.cdf(f_stat_time, df_diff, df_unrestricted)
-        print(f"F统计量: {f_stat_time:.4f}, P值: {p_val_time:.4f}")
-
-        if p_val_time < 0.05:
-            print("结论: 时间固定效应显著，应该引入时间固定效应")
-            time_significant = True
-        else:
-            print("结论: 时间固定效应不显著，可以不引入时间固定效应")
-            time_significant = False
-    else:
-        print("无法计算F统计量：自由度差异不足")
-        time_significant = False
-except Exception as e:
-    print(f"F检验计算失败: {str(e)}")
-    time_significant = False
+time_significant = bool(p_val_time < 0.05)
+if pd.isna(f_stat_time):
+    print("无法计算F统计量：自由度差异不足")
+elif time_significant:
+    print(f"F统计量: {f_stat_time:.4f}, P值: {p_val_time:.4f}")
+    print("结论: 时间固定效应显著，应该引入时间固定效应")
+else:
+    print(f"F统计量: {f_stat_time:.4f}, P值: {p_val_time:.4f}")
+    print("结论: 时间固定效应不显著，可以不引入时间固定效应")
+
+# 10b. 国家固定效应还是随机效应：Hausman 检验直接比较已拟合的两个模型（取其同方差协方差，不重新拟合）；
+# 存在异方差时经典 Hausman 检验的前提（随机效应有效）不成立，因此以按国家聚类的 Mundlak 检验作为判断依据
+print("\n检验个体效应与解释变量是否相关（固定效应 vs 随机效应）:")
+with stage('Hausman与Mundlak检验'):
+    hausman = hausman_test(entity_results, random_results)
+    mundlak = mundlak_test(fe_data, 'GWG', X_scaled.columns.tolist())
+print(f"Hausman检验（参考）: χ² = {hausman['统计量']:.4f}, 自由度 = {hausman['自由度']}, P值 = {hausman['P值']:.4f}")
+print(f"Mundlak检验（聚类稳健）: χ² = {mundlak['统计量']:.4f}, 自由度 = {mundlak['自由度']}, P值 = {mundlak['P值']:.4f}")
+random_consistent = bool(mundlak['P值'] >= 0.05)
+if random_consistent:
+    print("结论: 不能拒绝个体效应与解释变量不相关，随机效应模型是一致的")
+else:
+    print("结论: 个体效应与解释变量相关，应使用固定效应模型")
 
-# 11. 基于F检验结果选择最终模型
-print("\n基于F检验结果选择最终模型:")
+# 11. 基于F检验和Mundlak检验结果选择最终模型
+print("\n基于F检验和Mundlak检验结果选择最终模型:")
 try:
     if entity_significant and time_significant:
         print("国家和时间固定效应均显著，选择双固定效应模型")
         final_model = both_results
         model_type = "双固定效应模型"
+    elif entity_significant and random_consistent:
+        print("仅国家个体效应显著，且个体效应与解释变量不相关，选择随机效应模型")
+        final_model = random_results
+        model_type = "随机效应模型"
     elif entity_significant:
         print("仅国家固定效应显著，选择国家固定效应模型")
         final_model = entity_results
@@ -272,6 +174,23 @@ except Exception as e:
 print(f"\n最终选择的模型: {model_type}")
 print(final_model.summary)
 
+# 最终模型在不同协方差下的标准误（由已保存的残差和设计矩阵计算，无需重新拟合）
+print("\n最终模型在不同协方差下的标准误:")
+with stage('多种协方差标准误'):
+    se_table = std_error_table(final_model)
+print(se_table.to_string(float_format=lambda v: f'{v:.4f}'))
+
+# 只有约 20 个国家，聚类标准误的 t 检验并不可靠：对最终模型（随机效应模型除外）的各系数做野聚类限制性自助检验，
+# 按国家聚类、Webb 权重 99,999 次，置信区间由反解自助检验得到
+if final_model is not random_results:
+    with stage('野聚类自助检验'):
+        wild = wild_cluster_bootstrap(fe_data, 'GWG', X_scaled.columns.tolist(),
+                                      entity_effects='国家' in final_model.effects,
+                                      time_effects='年份' in final_model.effects,
+                                      weights='webb', n_boot=99999)
+    print(f"\n最终模型的野聚类自助检验（{wild.attrs['聚类数']} 个聚类，{wild.attrs['自助次数']} 次）:")
+    print(wild.to_string(float_format=lambda v: f'{v:.4f}'))
+
 # 13. 保存结果到Excel
 results_summary = pd.DataFrame({
     '无固定效应': pooled_results.params,
@@ -282,6 +201,8 @@ results_summary = pd.DataFrame({
     '时间固定效应_P值': time_results.pvalues,
     '双固定效应': both_results.params,
     '双固定效应_P值': both_results.pvalues,
+    '随机效应': random_results.params,
+    '随机效应_P值': random_results.pvalues,
     '最终模型': final_model.params,
     '最终模型_P值': final_model.pvalues
 })
@@ -296,13 +217,14 @@ f_test_data = {
 f_test_results = pd.DataFrame(f_test_data)
 
 # 保存结果
-results_summary.to_excel(r'D:\PythonProject\203\203正式\固定效应回归结果.xlsx')
-f_test_results.to_excel(r'D:\PythonProject\203\203正式\固定效应F检验结果.xlsx')
+with stage('保存Excel'):
+    results_summary.to_excel(r'D:\PythonProject\203\203正式\固定效应回归结果.xlsx')
+    f_test_results.to_excel(r'D:\PythonProject\203\203正式\固定效应F检验结果.xlsx')
 print("\n回归结果已保存到Excel文件")
 
 # 14. 输出最终建议
 print("\n最终建议:")
-print(f"1. 根据F检验结果，应选择{model_type}进行分析。")
+print(f"1. 根据F检验和Mundlak检验结果，应选择{model_type}进行分析。")
 
 if entity_significant:
     print("2. 国家固定效应显著，表明不同国家间存在系统性差异，这些差异会影响因变量。")
@@ -1,58 +1,26 @@
 import pandas as pd
-import statsmodels.formula.api as smf
 
-def read_and_melt(file_path, var_name):
-    """
-    读取Excel文件，假设第一行为国家名称，第一列为年份（作为索引），
-    然后将宽格式转换成长格式（包含Year, Country, var_name）
-    """
-    # 使用 header=0 和 index_col=0 读取文件
-    df = pd.read_excel(file_path, header=0, index_col=0)
-    df.index.name = 'Year'
-    # 重置索引，将 Year 变为普通列
-    df = df.reset_index()
-    # 去除列名和数据中的空格
-    df.columns = df.columns.str.strip()
-    df['Year'] = df['Year'].astype(str).str.strip()
-    # 转换成长格式
-    df_long = df.melt(id_vars='Year', var_name='Country', value_name=var_name)
-    df_long['Country'] = df_long['Country'].astype(str).str.strip()
-    # 将 Year 转换为数值型
-    df_long['Year'] = pd.to_numeric(df_long['Year'], errors='coerce')
-    return df_long
+from 固定效应估计 import fit_absorbed_ols
+from 影响分析 import jackknife
+from 滚动估计 import rolling_fit
+from 流式估计 import fit_streaming
+from 面板缓存 import cached_panel_path, load_panel
 
-# 读取各个文件（请根据实际路径修改）
-df_gwg  = read_and_melt(r"D:\GWG.xlsx", 'GWG')
-df_fdi  = read_and_melt(r"D:\FDI_Percentage_of_GDP__2000_2022__Fixed_.xlsx", 'FDI')
-df_gdp  = read_and_melt(r"D:\GDP.PCAP.CD.xlsx", 'GDP_PC')
-df_inc  = read_and_melt(r"D:\INC.xlsx", 'TAW')   # 假设 INC 表示 Total Average Wage
-df_hdi  = read_and_melt(r"D:\HDI_Data.xlsx", 'HDI')
-df_fert = read_and_melt(r"D:\Fertility.xlsx", 'FERT')
 
-# 依次合并各数据集（以 Year 和 Country 为键）
-df_panel = df_gwg.merge(df_fdi, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.merge(df_gdp, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.merge(df_inc, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.merge(df_hdi, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.merge(df_fert, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.sort_values(['Year', 'Country'])
-
-print("合并后的面板数据预览:")
-print(df_panel.head(10))
-
-# 检查缺失情况
-print("缺失统计:")
-print(df_panel[['GWG', 'FDI', 'GDP_PC', 'TAW', 'HDI', 'FERT']].isnull().sum())
-
-# 缺失值处理：按 Country 分组对每个数值变量进行线性插值，然后前向填充和后向填充
-numeric_vars = ['GWG', 'FDI', 'GDP_PC', 'TAW', 'HDI', 'FERT']
-df_panel_filled = df_panel.copy()
-
-for var in numeric_vars:
-    # 使用 transform 保证输出与原始 DataFrame 索引对齐
-    df_panel_filled[var] = df_panel_filled.groupby('Country')[var].transform(lambda group: group.interpolate(method='linear'))
-    df_panel_filled[var] = df_panel_filled.groupby('Country')[var].transform(lambda group: group.ffill().bfill())
+# 各变量对应的文件（请根据实际路径修改）
+sources = {
+    'GWG': r"D:\GWG.xlsx",
+    'FDI': r"D:\FDI_Percentage_of_GDP__2000_2022__Fixed_.xlsx",
+    'GDP_PC': r"D:\GDP.PCAP.CD.xlsx",
+    'TAW': r"D:\INC.xlsx",   # 假设 INC 表示 Total Average Wage
+    'HDI': r"D:\HDI_Data.xlsx",
+    'FERT': r"D:\Fertility.xlsx",
+}
+numeric_vars = list(sources)
 
+# 读取、合并（以 Year 和 Country 为键外连接），再按 Country 分组线性插值并前向、后向填充；
+# 源文件未变化时直接读取磁盘缓存
+df_panel_filled = load_panel(sources, how='outer', fill=True)
 
 print("缺失值处理后的数据预览:")
 print(df_panel_filled.head(10))
@@ -64,14 +32,32 @@ print("Unique Countries:", df_panel_filled['Country'].unique())
 print("Unique Years:", df_panel_filled['Year'].unique())
 
 # 构建基准回归模型：GWG ~ FDI + GDP_PC + TAW + HDI + FERT + 固定效应（Country 和 Year）
-formula = 'GWG ~ FDI + GDP_PC + TAW + HDI + FERT + C(Country) + C(Year)'
-model = smf.ols(formula=formula, data=df_panel_filled).fit()
+# 国家、年份固定效应通过组内变换吸收，不再生成虚拟变量列；点估计与 C(Country) + C(Year) 回归相同
+model = fit_absorbed_ols(df_panel_filled, 'GWG', ['FDI', 'GDP_PC', 'TAW', 'HDI', 'FERT'])
 
 print("\n基准回归模型结果摘要:")
-print(model.summary())
-
-
-
-
-
-
+print(model.summary)
+
+# 同一模型的流式估计：按块读取磁盘上的面板缓存，内存只随变量数和国家数增长、与行数无关，
+# 供企业层面的大样本使用；这里按国家聚类，并与内存中的估计对照
+streamed = fit_streaming(cached_panel_path(sources, how='outer', fill=True), 'GWG',
+                         ['FDI', 'GDP_PC', 'TAW', 'HDI', 'FERT'], cov_type='clustered')
+print("\n流式估计（按国家聚类）:")
+print(streamed.summary)
+print("与内存估计的最大系数差:", float((streamed.params - model.params).abs().max()))
+
+# 刀切稳健性：逐一剔除国家、逐一剔除年份，检验 FDI 系数是否由单个国家或年份驱动；
+# 全样本只拟合一次，每个剔除估计由减去该组叉积块得到，DFBETA 以按国家聚类的标准误标准化
+for by in ('entity', 'time'):
+    jk = jackknife(df_panel_filled, 'GWG', ['FDI', 'GDP_PC', 'TAW', 'HDI', 'FERT'], by=by)
+    print()
+    print(jk.summary)
+    print("\n对 FDI 系数影响最大的 10 个组:")
+    print(jk.ranking('FDI', top=10).to_string(float_format=lambda v: f'{v:.4f}'))
+
+# FDI 系数随时间的变化：10 年滚动窗口与从样本第一年开始的扩展窗口，国家和年份固定效应，按国家聚类；
+# 窗口移动时只增减一年的充分统计量，不逐窗口重新拟合
+for expanding, label in ((False, '10 年滚动窗口'), (True, '扩展窗口（至少 10 年）')):
+    path = rolling_fit(df_panel_filled, 'GWG', ['FDI', 'GDP_PC', 'TAW', 'HDI', 'FERT'], window=10, expanding=expanding)
+    print(f"\nFDI 系数路径（{label}）:")
+    print(path[path['变量'] == 'FDI'].drop(columns='变量').to_string(index=False, float_format=lambda v: f'{v:.4f}'))
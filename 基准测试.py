@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from 固定效应估计 import fit_absorbed_ols
+from 工具变量估计 import fit_absorbed_iv
+from 影响分析 import jackknife
+from 数据加载 import _long_frame, _read_wide
+from 模拟数据 import CONTROLS, simulate_panel, write_wide
+from 缺失值处理 import fill_panel_gaps
+from 面板合并 import join_panel
+from 面板特征 import panel_features
+
+# 面板规模 (国家数 N, 年份数 T, 指标数 k)
+DEFAULT_SIZES = ((50, 20, 6), (500, 40, 6), (2000, 60, 8))
+# 历史记录默认放在脚本旁边（不纳入版本库），可通过参数或环境变量 GWG_BENCH_HISTORY 改到其它位置
+DEFAULT_HISTORY = Path(os.environ.get('GWG_BENCH_HISTORY', Path(__file__).with_name('.benchmarks') / 'history.jsonl'))
+# 指标按此顺序取前 k 个：拟合需要 GWG、FDI 和工具变量 HIST_TRADE
+INDICATORS = ['GWG', 'FDI', 'HIST_TRADE', 'FEM_EMP', *CONTROLS]
+FORMATS = ('xlsx', 'parquet')
+RESULT_COLUMNS = ['国家数', '年份数', '指标数', '格式', '阶段', '行数', '列数', '最短秒数', '中位秒数', '峰值内存MB']
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, formats=FORMATS, repeat=3, memory=True, seed=0):
+    """
+    在模拟数据生成的宽格式文件上，按规模逐一测量数据处理和估计的各个阶段：
+      - parse：读取宽格式文件（xlsx 经 openpyxl，parquet 经 pyarrow），每种格式各测一次
+      - reshape：宽格式展开为长格式
+      - join：按 Year、Country 对齐全部指标（join_panel）
+      - fill：按国家插值并前向、后向填充（fill_panel_gaps）
+      - lags：全部指标的 1–3 阶滞后（panel_features）
+      - fe_fit：吸收国家、年份固定效应的 OLS（fit_absorbed_ols，同方差协方差）
+      - cov_clustered / cov_driscoll_kraay：在已拟合结果上计算按国家聚类和 Driscoll-Kraay 协方差
+      - iv_fit：以 HIST_TRADE 为 FDI 工具变量的 2SLS（fit_absorbed_iv）
+      - jackknife_entity / jackknife_time：逐一剔除国家、年份的刀切估计（jackknife），
+        jackknife_time_refit 为逐年剔除后各自调用 fit_absorbed_ols 的对照；刀切估计若退化为构造虚拟变量，
+        在国家数较多的规模下会明显慢于这一对照
+      - panelols_fit：linearmodels 的 PanelOLS 双向固定效应（仅在已安装时测量），作为对照
+    每个阶段重复 repeat 次记录耗时；memory=True 时再用 tracemalloc 单独运行一次，记录该阶段新分配内存的峰值
+    （tracemalloc 会拖慢纯 Python 代码，因此不与计时混在一起）。
+
+    sizes 为 (N, T, k) 的列表，k 为指标数（3 到 8）；数据有 5% 的行缺失（年份缺口）和 5% 的取值缺失。
+    返回每个 (规模, 阶段) 一行的 DataFrame，列见 RESULT_COLUMNS；与文件格式无关的阶段，格式为 '-'。
+    parse、reshape 的行数为数值单元格总数、列数为指标数，拟合阶段为观测数和系数个数。
+    """
+    rows = []
+    for n_countries, n_years, k in sizes:
+        if not 3 <= k <= len(INDICATORS):
+            raise ValueError(f"指标数 k 须在 3 到 {len(INDICATORS)} 之间，收到: {k}")
+        variables = INDICATORS[:k]
+        panel, _ = simulate_panel(n_countries, n_years, unbalanced=0.05, missing=0.05, seed=seed)
+        size = (n_countries, n_years, k)
+
+        def record(fmt, stage, fn, shape=None):
+            result, seconds, peak = _measure(fn, repeat, memory)
+            n_rows, n_cols = shape(result) if shape else np.shape(result)[:2]
+            rows.append(size + (fmt, stage, n_rows, n_cols, min(seconds), float(np.median(seconds)), peak))
+            return result
+
+        with tempfile.TemporaryDirectory() as workdir:
+            arrays = None
+            for fmt in formats:
+                if fmt == 'xlsx' and n_countries > 16383:
+                    continue
+                sources = write_wide(panel, Path(workdir) / fmt, variables, file_format=fmt)
+                arrays = record(fmt, 'parse', lambda: {v: _read_wide(p) for v, p in sources.items()},
+                                lambda res: (sum(a[2].size for a in res.values()), len(res)))
+
+        frames = record('-', 'reshape', lambda: [_long_frame(*arrays[v], v) for v in variables],
+                        lambda res: (sum(len(f) for f in res), len(res)))
+        joined = record('-', 'join', lambda: join_panel(frames, how='outer')[0])
+        filled = record('-', 'fill', lambda: fill_panel_gaps(joined, variables)[0])
+        record('-', 'lags', lambda: panel_features(filled, variables, lags=[1, 2, 3])[0])
+
+        exog = [v for v in variables if v not in ('GWG', 'HIST_TRADE')]
+        fit = record('-', 'fe_fit', lambda: fit_absorbed_ols(filled, 'GWG', exog),
+                     lambda res: (res.nobs, len(res.params)))
+        for stage, args in (('cov_clustered', ('clustered', 'entity')), ('cov_driscoll_kraay', ('driscoll-kraay',))):
+            # 清空协方差缓存，确保每次都重新计算
+            record('-', stage, lambda: (fit._cov_cache.clear(), fit.covariance(*args))[1])
+        record('-', 'iv_fit',
+               lambda: fit_absorbed_iv(filled, 'GWG', [v for v in exog if v != 'FDI'], endog=['FDI'],
+                                       instruments=['HIST_TRADE']),
+               lambda res: (res.nobs, len(res.params)))
+
+        for by in ('entity', 'time'):
+            record('-', f'jackknife_{by}', lambda: jackknife(filled, 'GWG', exog, by=by).estimates)
+        years = filled['Year'].unique()
+        record('-', 'jackknife_time_refit',
+               lambda: [fit_absorbed_ols(filled[filled['Year'] != year], 'GWG', exog) for year in years],
+               lambda res: (len(res), len(exog)))
+
+        try:
+            from linearmodels.panel import PanelOLS
+        except ImportError:
+            continue
+        indexed = filled.set_index(['Country', 'Year'])
+        record('-', 'panelols_fit',
+               lambda: PanelOLS(indexed['GWG'], indexed[exog], entity_effects=True, time_effects=True,
+                                check_rank=False, drop_absorbed=True).fit(),
+               lambda res: (res.nobs, len(res.params)))
+
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+
+def _measure(fn, repeat, memory):
+    """运行 fn repeat 次，返回 (最后一次的结果, 各次耗时, 峰值内存 MB)；memory=False 时峰值为缺失。"""
+    seconds = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - start)
+    peak = np.nan
+    if memory:
+        del result
+        tracemalloc.start()
+        try:
+            result = fn()
+            peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        finally:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def _run_metadata():
+    """本次运行的环境信息：提交、时间、平台和主要依赖的版本，随每条记录写入历史。"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    cwd=Path(__file__).parent, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    now = datetime.now()
+    return {
+        '运行ID': now.strftime('%Y%m%dT%H%M%S'),
+        '时间': now.isoformat(timespec='seconds'),
+        '提交': commit,
+        '有未提交修改': dirty,
+        '平台': platform.platform(),
+        'CPU数': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+def save_history(results, path=DEFAULT_HISTORY):
+    """把 run_benchmarks 的结果连同运行环境追加到 JSON Lines 历史文件，每个阶段一行；返回本次的运行ID。"""
+    meta = _run_metadata()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as fh:
+        for record in results.to_dict(orient='records'):
+            record = {key: (None if isinstance(value, float) and np.isnan(value) else value)
+                      for key, value in record.items()}
+            fh.write(json.dumps({**meta, **record}, ensure_ascii=False, default=_json_default) + '\n')
+    return meta['运行ID']
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+def load_history(path=DEFAULT_HISTORY):
+    """读取历史文件为 DataFrame，每行一个 (运行, 规模, 阶段)。"""
+    return pd.read_json(path, lines=True, dtype={'提交': str, '运行ID': str})
+
+
+def compare_runs(history, baseline=None, current=None):
+    """
+    对比两次运行各阶段的中位耗时和峰值内存。
+    baseline、current 可为运行ID或提交号（取该提交最近的一次运行）；current 默认为最近一次运行，
+    baseline 默认为 current 之前的最近一次运行。比值大于 1 表示变慢（或占用更多内存）。
+    """
+    runs = history.drop_duplicates('运行ID', keep='last').sort_values('时间')
+
+    def resolve(ref):
+        match = runs[(runs['运行ID'] == ref) | (runs['提交'] == ref)]
+        if match.empty:
+            raise ValueError(f"历史中没有运行ID或提交为 {ref!r} 的记录")
+        return match['运行ID'].iloc[-1]
+
+    current = runs['运行ID'].iloc[-1] if current is None else resolve(current)
+    if baseline is None:
+        earlier = runs[runs['时间'] < runs.loc[runs['运行ID'] == current, '时间'].iloc[0]]
+        if earlier.empty:
+            raise ValueError("历史中只有一次运行，无法对比")
+        baseline = earlier['运行ID'].iloc[-1]
+    else:
+        baseline = resolve(baseline)
+
+    keys = ['国家数', '年份数', '指标数', '格式', '阶段']
+    pick = lambda run: history[history['运行ID'] == run].set_index(keys)[['中位秒数', '峰值内存MB']]
+    table = pick(baseline).join(pick(current), lsuffix='_基准', rsuffix='_当前', how='inner')
+    table['耗时比'] = table['中位秒数_当前'] / table['中位秒数_基准']
+    table['内存比'] = table['峰值内存MB_当前'] / table['峰值内存MB_基准']
+    table.attrs.update({'基准运行': baseline, '当前运行': current})
+    return table
+
+
+def _parse_size(text):
+    try:
+        n_countries, n_years, k = (int(part) for part in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"规模格式应为 NxTxk，如 500x40x6，收到: {text}")
+    return n_countries, n_years, k
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='各处理阶段在不同面板规模下的耗时与内存基准测试')
+    parser.add_argument('--sizes', nargs='+', type=_parse_size, default=DEFAULT_SIZES, help='面板规模，如 500x40x6')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=FORMATS)
+    parser.add_argument('--repeat', type=int, default=3, help='每个阶段的计时重复次数')
+    parser.add_argument('--no-memory', action='store_true', help='不测量内存峰值')
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='历史记录文件（JSON Lines）')
+    parser.add_argument('--no-save', action='store_true', help='不写入历史记录')
+    parser.add_argument('--compare', nargs='?', const='', default=None, metavar='基准',
+                        help='与历史中的某次运行（运行ID或提交号，省略时为上一次运行）对比')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.formats, args.repeat, memory=not args.no_memory)
+    print(results.to_string(index=False, float_format=lambda v: f'{v:.4f}'))
+    if not args.no_save:
+        run_id = save_history(results, args.history)
+        print(f"\n已写入 {args.history}（运行ID {run_id}）")
+    if args.compare is not None:
+        table = compare_runs(load_history(args.history), baseline=args.compare or None)
+        print(f"\n对比 {table.attrs['基准运行']} → {table.attrs['当前运行']}")
+        print(table.to_string(float_format=lambda v: f'{v:.3f}'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+
+from 共线性诊断 import check_collinearity
+from 固定效应估计 import (AbsorbedOLSResults, _check_cov_type, _cov_groups, _covariance, _nested_df, _prepare_sample,
+                     _score_meat, _with_const, within_transform)
+
+
+class AbsorbedIVResults(AbsorbedOLSResults):
+    """
+    吸收固定效应的 2SLS 估计结果，在 AbsorbedOLSResults 的基础上增加：
+      - endog, instruments：内生变量与（排除的）工具变量
+      - first_stage：各内生变量第一阶段的偏 R² 及排除工具变量的 F 检验
+      - diagnostics：识别、弱工具变量与内生性检验
+    with_cov() 换用其它协方差时只重新计算第二阶段系数的协方差，第一阶段与检验结果仍使用拟合时的协方差类型。
+    """
+
+    def __init__(self, endog, instruments, first_stage, diagnostics, **kwargs):
+        super().__init__(**kwargs)
+        self.endog = endog
+        self.instruments = instruments
+        self.first_stage = first_stage
+        self.diagnostics = diagnostics
+
+    @property
+    def summary(self):
+        fmt = lambda v: f'{v:.4f}'
+        lines = [
+            super().summary,
+            '',
+            f"内生变量: {', '.join(self.endog)}    工具变量: {', '.join(self.instruments)}",
+            '',
+            '第一阶段（排除工具变量的联合显著性）:',
+            self.first_stage.to_string(float_format=fmt),
+            '',
+            '识别与内生性检验:',
+            self.diagnostics.to_string(float_format=fmt),
+        ]
+        return '\n'.join(lines)
+
+
+def _partial_out(w, d):
+    """把 d 的各列对 w 做回归取残差（FWL），w 没有列时原样返回。"""
+    if w.shape[1] == 0:
+        return d
+    return d - w @ np.linalg.solve(w.T @ w, w.T @ d)
+
+
+def _wald(params, cov):
+    """H0: params = 0 的 Wald 统计量，协方差奇异时用伪逆。"""
+    return float(params @ np.linalg.pinv(cov) @ params)
+
+
+def _sym_sqrt(a):
+    """对称半正定矩阵的平方根。"""
+    w, v = np.linalg.eigh(a)
+    return (v * np.sqrt(np.clip(w, 0, None))) @ v.T
+
+
+def _first_stage_cov(z, v, bread, df_resid, cov_type, groups=None, bandwidth=None):
+    """
+    全部第一阶段系数 vec(Π)（按列堆叠，Π 为 工具变量数×内生变量数）的联合协方差，
+    包含不同内生变量方程之间的协方差，供 Kleibergen-Paap 统计量使用。
+    """
+    n, n_endog = v.shape
+    if cov_type == 'unadjusted':
+        return np.kron(v.T @ v / df_resid, bread)
+    scores = (v[:, :, None] * z[:, None, :]).reshape(n, -1)
+    outer = np.kron(np.eye(n_endog), bread)
+    return outer @ _score_meat(scores, df_resid, cov_type, groups, bandwidth) @ outer
+
+
+def _kleibergen_paap(z, y, pi, cov_pi):
+    """
+    Kleibergen-Paap rk Wald 统计量，检验第一阶段系数矩阵 Π 的秩为 K-1（模型不可识别）。
+    Θ = (Z'Z)^{1/2} Π (Y'Y)^{-1/2}，对 Θ 做奇异值分解，取最小奇异值对应的方向构造统计量，
+    自由度为 L-K+1。只有一个内生变量时等于排除工具变量的（稳健）Wald 统计量。
+    """
+    n_inst, n_endog = pi.shape
+    q = n_endog - 1
+    f = _sym_sqrt(z.T @ z)
+    g_inv = np.linalg.inv(_sym_sqrt(y.T @ y))
+    theta = f @ pi @ g_inv
+    transform = np.kron(g_inv.T, f)
+    cov_theta = transform @ cov_pi @ transform.T
+
+    u, _, vt = np.linalg.svd(theta)
+    v = vt.T
+    u22 = u[q:, q:]
+    v22 = v[q:, q:]
+    a_perp = u[:, q:] @ np.linalg.inv(u22) @ _sym_sqrt(u22 @ u22.T)
+    b_perp = _sym_sqrt(v22 @ v22.T) @ np.linalg.inv(v22.T) @ v[:, q:].T
+    t = np.kron(b_perp, a_perp.T)
+    lam = t @ theta.ravel(order='F')
+    return _wald(lam, t @ cov_theta @ t.T), n_inst - n_endog + 1
+
+
+def fit_absorbed_iv(data, dependent, exog, endog, instruments, entity='Country', time='Year',
+                    entity_effects=True, time_effects=True, cov_type='unadjusted', cluster='entity', bandwidth=None):
+    """
+    吸收国家、年份固定效应的 2SLS，点估计与
+    `dependent ~ exog + C(Country) + C(Year) + [endog ~ instruments]` 的虚拟变量 IV 回归相同。
+
+    固定效应先用组内变换吸收，再把外生控制变量从因变量、内生变量和工具变量中剔除（FWL），
+    之后两阶段估计和全部检验都在这些投影后的矩阵上完成，计算量不随国家数增加而变大：
+      - 第一阶段：各内生变量的偏 R² 与排除工具变量的 F 检验
+      - Kleibergen-Paap rk Wald：不可识别检验（χ²，自由度 L-K+1）；除以工具变量个数 L 即
+        Kleibergen-Paap Wald F，用于判断弱工具变量（经验上小于 10 视为弱工具变量）
+      - Anderson-Rubin：内生变量系数为 0 的检验，对弱工具变量稳健
+      - Durbin-Wu-Hausman：在结构方程中加入第一阶段残差，检验其系数是否为 0（原假设为内生变量实际外生）
+    cov_type、cluster、bandwidth 同 fit_absorbed_ols，所有检验使用同一种协方差。
+    系数顺序为外生变量在前、内生变量在后；两类固定效应都不吸收时自动加入常数项 const。
+    """
+    _check_cov_type(cov_type, cluster)
+
+    exog, endog, instruments = list(exog), list(endog), list(instruments)
+    names = exog + endog + instruments
+    if len(set(names)) != len(names) or dependent in names:
+        raise ValueError(f"因变量、外生变量、内生变量和工具变量不能重复: {[dependent] + names}")
+    sample, entity_codes, entity_levels, time_codes, time_levels, values = \
+        _prepare_sample(data, dependent, names, entity, time)
+
+    raw = None
+    if entity_effects or time_effects:
+        demeaned = within_transform(values,
+                                    entity_codes if entity_effects else None,
+                                    time_codes if time_effects else None)
+        raw = values
+    else:
+        demeaned = _with_const(values)
+        exog = ['const'] + exog
+        names = ['const'] + names
+
+    df_absorbed = (len(entity_levels) if entity_effects else 0) + (len(time_levels) if time_effects else 0)
+    if entity_effects and time_effects:
+        df_absorbed -= 1
+
+    keep, dropped = check_collinearity(demeaned[:, 1:], names, None if raw is None else raw[:, 1:])
+    kept = [names[j] for j in keep]
+    exog = [c for c in exog if c in kept]
+    endog = [c for c in endog if c in kept]
+    instruments = [c for c in instruments if c in kept]
+    if not endog:
+        raise ValueError("没有可识别的内生变量")
+    if len(instruments) < len(endog):
+        raise ValueError(f"工具变量个数 ({len(instruments)}) 少于内生变量个数 ({len(endog)})，模型不可识别")
+
+    column = {name: j + 1 for j, name in enumerate(names)}
+    take = lambda cols: demeaned[:, [column[c] for c in cols]]
+    y = demeaned[:, 0]
+    w, x_endog, z = take(exog), take(endog), take(instruments)
+    groups = _cov_groups(cov_type, cluster, entity_codes, time_codes)
+    # 检验所用协方差的残差自由度同样加回嵌套在聚类中的固定效应（见 _nested_df）
+    nested = _nested_df(cov_type, cluster, entity_effects, time_effects, len(entity_levels), len(time_levels))
+    nobs = len(y)
+    n_exog, n_endog, n_inst = len(exog), len(endog), len(instruments)
+
+    # 剔除外生变量后的 y、内生变量与工具变量，之后的计算都只涉及这几个小矩阵
+    partialled = _partial_out(w, np.column_stack([y, x_endog, z]))
+    y_p = partialled[:, 0]
+    x_p = partialled[:, 1:1 + n_endog]
+    z_p = partialled[:, 1 + n_endog:]
+    bread_z = np.linalg.inv(z_p.T @ z_p)
+
+    # 第一阶段：Π = (Z'Z)^{-1} Z'X，残差 V 与含外生变量的完整第一阶段回归相同
+    df_first = nobs - n_exog - n_inst - df_absorbed
+    pi = bread_z @ (z_p.T @ x_p)
+    v = x_p - z_p @ pi
+    cov_pi = _first_stage_cov(z_p, v, bread_z, df_first + nested, cov_type, groups, bandwidth)
+    first_stage = []
+    for k, name in enumerate(endog):
+        block = slice(k * n_inst, (k + 1) * n_inst)
+        f_stat = _wald(pi[:, k], cov_pi[block, block]) / n_inst
+        first_stage.append({
+            '内生变量': name,
+            '偏R²': 1 - v[:, k] @ v[:, k] / (x_p[:, k] @ x_p[:, k]),
+            'F统计量': f_stat,
+            '分子自由度': n_inst,
+            '分母自由度': df_first,
+            'P值': stats.f.sf(f_stat, n_inst, df_first),
+        })
+    first_stage = pd.DataFrame(first_stage).set_index('内生变量')
+
+    # 第二阶段：X̂ = [W, X - V]，β = (X̂'X̂)^{-1} X̂'y，残差用实际的内生变量计算
+    x = np.column_stack([w, x_endog])
+    x_hat = np.column_stack([w, x_endog - v])
+    bread = np.linalg.inv(x_hat.T @ x_hat)
+    beta = bread @ (x_hat.T @ y)
+    resids = y - x @ beta
+    df_resid = nobs - n_exog - n_endog - df_absorbed
+
+    kp_stat, kp_df = _kleibergen_paap(z_p, x_p, pi, cov_pi)
+
+    # Anderson-Rubin：H0 下结构误差为 y 本身，检验 y 对工具变量回归的系数
+    gamma = bread_z @ (z_p.T @ y_p)
+    ar_cov = _covariance(z_p, y_p - z_p @ gamma, bread_z, df_first + nested, cov_type, groups, bandwidth)
+    ar_stat = _wald(gamma, ar_cov) / n_inst
+
+    # Durbin-Wu-Hausman：y 对 [X, V] 回归，检验第一阶段残差 V 的系数
+    augmented = np.column_stack([x_p, v])
+    bread_aug = np.linalg.inv(augmented.T @ augmented)
+    delta = bread_aug @ (augmented.T @ y_p)
+    df_aug = nobs - n_exog - 2 * n_endog - df_absorbed
+    cov_aug = _covariance(augmented, y_p - augmented @ delta, bread_aug, df_aug + nested, cov_type, groups,
+                          bandwidth)
+    dwh_stat = _wald(delta[n_endog:], cov_aug[n_endog:, n_endog:]) / n_endog
+
+    diagnostics = pd.DataFrame([
+        {'检验': 'Kleibergen-Paap rk Wald', '统计量': kp_stat, '分子自由度': kp_df, '分母自由度': np.nan,
+         'P值': stats.chi2.sf(kp_stat, kp_df), '原假设': '模型不可识别'},
+        {'检验': 'Kleibergen-Paap Wald F', '统计量': kp_stat / n_inst, '分子自由度': n_inst,
+         '分母自由度': df_first, 'P值': np.nan, '原假设': '弱工具变量（F < 10）'},
+        {'检验': 'Anderson-Rubin F', '统计量': ar_stat, '分子自由度': n_inst, '分母自由度': df_first,
+         'P值': stats.f.sf(ar_stat, n_inst, df_first), '原假设': '内生变量系数为 0'},
+        {'检验': 'Durbin-Wu-Hausman F', '统计量': dwh_stat, '分子自由度': n_endog, '分母自由度': df_aug,
+         'P值': stats.f.sf(dwh_stat, n_endog, df_aug), '原假设': '内生变量实际外生'},
+    ]).set_index('检验')
+
+    params_names = exog + endog
+    effects = [name for name, on in (('国家', entity_effects), ('年份', time_effects)) if on]
+    total = y - y.mean() if not effects else y
+    result = AbsorbedIVResults(
+        endog=endog,
+        instruments=instruments,
+        first_stage=first_stage,
+        diagnostics=diagnostics,
+        params=pd.Series(beta, index=params_names, name='系数'),
+        cov=None,
+        resids=pd.Series(resids, index=sample.index, name='残差'),
+        nobs=nobs,
+        df_resid=df_resid,
+        df_absorbed=df_absorbed,
+        rsquared_within=1 - resids @ resids / (total @ total),
+        dependent=dependent,
+        effects=effects,
+        n_entities=len(entity_levels),
+        n_times=len(time_levels),
+        cov_type=cov_type,
+        dropped=dropped,
+        design=x_hat,
+        bread=bread,
+        entity_codes=entity_codes,
+        time_codes=time_codes,
+    )
+    result._use_cov(cov_type, cluster, bandwidth)
+    return result
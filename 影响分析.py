@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+
+from 固定效应估计 import _prepare_sample, fit_absorbed_ols
+
+DROP_TYPES = {'entity': '国家', 'time': '年份'}
+
+
+class JackknifeResults:
+    """
+    逐一剔除国家（或年份）的刀切估计结果：
+      - full：全样本的 AbsorbedOLSResults
+      - estimates：剔除各组后的系数，行为被剔除的国家/年份，列为解释变量
+      - nobs：剔除各组后的观测数
+    dfbeta 为 (全样本系数 - 剔除后系数) / 全样本标准误，衡量单个组对系数的影响；
+    std_errors 为刀切标准误 sqrt((G-1)/G Σ (β_(g) - β̄)²)。
+    """
+
+    def __init__(self, full, estimates, nobs, by):
+        self.full = full
+        self.params = full.params[estimates.columns]
+        self.estimates = estimates
+        self.nobs = nobs
+        self.by = by
+
+    @property
+    def std_errors(self):
+        n_groups = self.estimates.notna().sum()
+        deviations = self.estimates - self.estimates.mean()
+        return np.sqrt((n_groups - 1) / n_groups * (deviations ** 2).sum()).rename('刀切标准误')
+
+    @property
+    def dfbeta(self):
+        return (self.params - self.estimates) / self.full.std_errors[self.estimates.columns]
+
+    def ranking(self, variable, top=None):
+        """按 |DFBETA| 从大到小排列各组对 variable 系数的影响，top 为只保留的前几名。"""
+        table = pd.DataFrame({
+            '剔除后系数': self.estimates[variable],
+            '系数变化': self.estimates[variable] - self.params[variable],
+            'DFBETA': self.dfbeta[variable],
+            '剔除后观测数': self.nobs,
+        })
+        table = table.iloc[np.argsort(-table['DFBETA'].abs().to_numpy(), kind='stable')]
+        return table if top is None else table.head(top)
+
+    @property
+    def summary(self):
+        label = DROP_TYPES[self.by]
+        dfbeta = self.dfbeta.abs()
+        table = pd.DataFrame({
+            '全样本系数': self.params,
+            '标准误': self.full.std_errors[self.params.index],
+            '刀切标准误': self.std_errors,
+            '剔除后最小值': self.estimates.min(),
+            '剔除后最大值': self.estimates.max(),
+            '最大|DFBETA|': dfbeta.max(),
+            f'影响最大的{label}': dfbeta.idxmax(),
+        })
+        lines = [
+            f"逐一剔除{label}的刀切估计（共 {len(self.estimates)} 个{label}）",
+            f"因变量: {self.full.dependent}    吸收的固定效应: {'、'.join(self.full.effects) or '无'}",
+            f"DFBETA 以全样本标准误（{self.full.cov_type}）标准化",
+            '',
+            table.to_string(float_format=lambda v: f'{v:.4f}'),
+        ]
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return self.summary
+
+
+def jackknife(data, dependent, exog, by='entity', entity='Country', time='Year', entity_effects=True,
+              time_effects=True, cov_type='clustered', cluster='entity'):
+    """
+    逐一剔除国家（by='entity'）或年份（by='time'）的刀切估计，只拟合一次，由充分统计量的增减得到每个剔除估计。
+
+    有国家效应时按国家吸收（只有年份效应时按年份吸收，都没有时整个样本为一组，即常数项），
+    双向固定效应中的年份效应用 Frisch-Waugh-Lovell 消去，不构造任何虚拟变量列。
+    设 z = [y, X]，对吸收维度的每组 i 记 A_i = Σ z z'、S_i = Σ z、C_i（观测数）、P_is（第 s 年的观测数），
+    组内变换后的叉积为 W = Σ_i (A_i - S_i S_i' / C_i)，年份效应的叉积
+    D'MD = diag(n_s) - P' diag(1/C) P、D'Mz = Σ_{t=s} z - P' diag(1/C) S，
+    消去后 W̃ = W - (D'Mz)' (D'MD)^{-1} D'Mz，系数由 W̃ 的 k×k 子矩阵解出（同 滚动估计.py）。
+      - 剔除的维度就是吸收的维度时，每组的贡献独立，从总和中减去该组的块即可，每组 O(k² + T²)
+      - 否则（如按国家吸收时剔除年份）从各组的 S_i、C_i、P_i 中减去被剔除行的部分后重算上述总和，
+        每组 O(N(k + T)²)，N 为吸收维度的组数
+    系数与对剔除后的样本重新调用 fit_absorbed_ols 完全相同；剔除后不再出现的年份水平自动从 D'MD 中去掉。
+
+    cov_type、cluster 用于全样本拟合，其标准误用来把系数变化标准化为 DFBETA。
+    返回 JackknifeResults。
+    """
+    if by not in DROP_TYPES:
+        raise ValueError(f"by 只能为 'entity' 或 'time'，收到: {by!r}")
+    full = fit_absorbed_ols(data, dependent, exog, entity, time, entity_effects, time_effects, cov_type, cluster)
+    exog = [name for name in full.params.index if name != 'const']
+    _, entity_codes, entity_levels, time_codes, time_levels, values = \
+        _prepare_sample(data, dependent, exog, entity, time)
+
+    drop_codes, drop_levels = (entity_codes, entity_levels) if by == 'entity' else (time_codes, time_levels)
+    n_drop = len(drop_levels)
+    if entity_effects:
+        absorb_codes, downdate = entity_codes, by == 'entity'
+    elif time_effects:
+        absorb_codes, downdate = time_codes, by == 'time'
+    else:
+        absorb_codes, downdate = np.zeros(len(values), dtype='intp'), False
+    stats = _WithinStats(values, absorb_codes, time_codes if entity_effects and time_effects else None)
+
+    order = np.argsort(drop_codes, kind='stable')
+    bounds = np.r_[0, np.cumsum(np.bincount(drop_codes, minlength=n_drop))]
+    estimates = np.full((n_drop, len(exog)), np.nan)
+    for g in range(n_drop):
+        parts = stats.without_group(g) if downdate else stats.without_rows(order[bounds[g]:bounds[g + 1]])
+        try:
+            estimates[g] = _solve_within(*parts)
+        except np.linalg.LinAlgError:
+            pass
+
+    label = DROP_TYPES[by]
+    index = pd.Index(drop_levels, name=f'剔除的{label}')
+    return JackknifeResults(full, pd.DataFrame(estimates, index=index, columns=exog),
+                            pd.Series(len(values) - np.diff(bounds), index=index, name='观测数'), by)
+
+
+def _bincount_rows(values, codes, n_groups):
+    """按编码对 (n, p) 数组逐列求组内和，返回 (n_groups, p)，未出现的组为 0。"""
+    return np.column_stack([np.bincount(codes, weights=col, minlength=n_groups) for col in values.T]) \
+        if values.shape[1] else np.zeros((n_groups, 0))
+
+
+class _WithinStats:
+    """
+    吸收维度各组的充分统计量：A（各组 z'z 之和）、S_i、C_i，以及年份效应所需的 P_is、各年份的 z 之和
+    与各 (组, 年份) 格的 z 之和。without_group / without_rows 返回去掉一组或一批行后的 (W, D'Mz, D'MD, 各年份观测数)。
+    """
+
+    def __init__(self, z, absorb_codes, dummy_codes):
+        n, p = z.shape
+        self.z, self.absorb_codes, self.dummy_codes = z, absorb_codes, dummy_codes
+        self.n_absorb = int(absorb_codes.max()) + 1
+        self.gram = z.T @ z
+        self.sums = _bincount_rows(z, absorb_codes, self.n_absorb)
+        self.counts = np.bincount(absorb_codes, minlength=self.n_absorb).astype('float64')
+        # 按组的 z z' 块，仅在逐组减去时需要
+        self.outer = _bincount_rows(np.einsum('ni,nj->nij', z, z).reshape(n, p * p), absorb_codes,
+                                    self.n_absorb).reshape(self.n_absorb, p, p)
+        self.within = self.gram - (self.sums.T / self.counts) @ self.sums
+        if dummy_codes is None:
+            return
+        self.n_dummy = int(dummy_codes.max()) + 1
+        cells = absorb_codes.astype('int64') * self.n_dummy + dummy_codes
+        self.cells = np.bincount(cells, minlength=self.n_absorb * self.n_dummy).reshape(
+            self.n_absorb, self.n_dummy).astype('float64')
+        self.cell_sums = _bincount_rows(z, cells, self.n_absorb * self.n_dummy).reshape(self.n_absorb, self.n_dummy, p)
+        self.dummy_sums = self.cell_sums.sum(axis=0)
+        self.cross = self.dummy_sums - (self.cells.T / self.counts) @ self.sums
+        self.dmd = np.diag(self.cells.sum(axis=0)) - (self.cells.T / self.counts) @ self.cells
+
+    def without_group(self, i):
+        """去掉吸收维度的第 i 组：各组的贡献相互独立，从总和中减去该组的块。"""
+        s, c = self.sums[i], self.counts[i]
+        within = self.within - (self.outer[i] - np.outer(s, s) / c)
+        if self.dummy_codes is None:
+            return within, None, None, None
+        cells = self.cells[i]
+        cross = self.cross - (self.cell_sums[i] - np.outer(cells, s) / c)
+        dmd = self.dmd - (np.diag(cells) - np.outer(cells, cells) / c)
+        return within, cross, dmd, self.cells.sum(axis=0) - cells
+
+    def without_rows(self, rows):
+        """去掉任意一批行：先更新各组的 S_i、C_i、P_is，再重算组内叉积和年份效应的各项。"""
+        z, codes = self.z[rows], self.absorb_codes[rows]
+        sums = self.sums - _bincount_rows(z, codes, self.n_absorb)
+        counts = self.counts - np.bincount(codes, minlength=self.n_absorb)
+        keep = counts > 0
+        sums, counts = sums[keep], counts[keep]
+        within = self.gram - z.T @ z - (sums.T / counts) @ sums
+        if self.dummy_codes is None:
+            return within, None, None, None
+        dummies = self.dummy_codes[rows]
+        removed = np.bincount(codes.astype('int64') * self.n_dummy + dummies,
+                              minlength=self.n_absorb * self.n_dummy).reshape(self.n_absorb, self.n_dummy)
+        cells = (self.cells - removed)[keep]
+        cross = self.dummy_sums - _bincount_rows(z, dummies, self.n_dummy) - (cells.T / counts) @ sums
+        dmd = np.diag(cells.sum(axis=0)) - (cells.T / counts) @ cells
+        return within, cross, dmd, cells.sum(axis=0)
+
+
+def _solve_within(within, cross, dmd, levels):
+    """由组内叉积（第 0 行列为 y）消去年份效应后解出系数；被吸收的组效应已含常数项，去掉一个年份水平作为基准。"""
+    if cross is not None:
+        active = np.flatnonzero(levels > 0)[1:]
+        cross = cross[active]
+        within = within - cross.T @ np.linalg.solve(dmd[np.ix_(active, active)], cross)
+    return np.linalg.solve(within[1:, 1:], within[1:, 0])
@@ -0,0 +1,302 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# 设置环境变量 GWG_TRACE 为记录文件路径（.json 或 .csv）即开启记录，进程退出时写出记录并打印汇总
+TRACE_ENV = 'GWG_TRACE'
+
+_enabled = False
+_records = []
+# 阶段栈按线程分开，并发运行的阶段（如阶段图中同时计算的节点）各自嵌套
+_local = threading.local()
+# 当前有未结束阶段的线程：{线程标识: 该线程的阶段栈}；读写峰值内存计数时持有 _lock
+_busy = {}
+_lock = threading.Lock()
+_origin = None
+_trace_path = None
+
+
+def enable(trace_path=None):
+    """
+    开启阶段记录。trace_path 不为 None 时，在进程退出时把记录写到该文件（按扩展名写 JSON 或 CSV），
+    并打印 summary()。未开启时 stage 只做一次布尔判断，几乎没有开销。
+    """
+    global _enabled, _origin, _trace_path
+    if _trace_path is None and trace_path is not None:
+        atexit.register(_write_at_exit)
+    _enabled = True
+    _origin = _origin if _origin is not None else time.perf_counter()
+    _trace_path = trace_path if trace_path is not None else _trace_path
+
+
+def disable():
+    """关闭阶段记录，已有的记录保留。"""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """清空已有的记录。"""
+    global _origin
+    _records.clear()
+    _origin = time.perf_counter() if _enabled else None
+
+
+def stage(name, rows=None, cols=None):
+    """
+    记录一个命名阶段的墙钟时间、CPU 时间（含已结束子进程）、峰值常驻内存和输出的行列数。
+    既可作上下文管理器，也可作装饰器：
+
+        with stage('读取面板') as s:
+            data = load_panel(sources)
+            s.set_shape(data)
+
+        @stage('模型拟合')
+        def fit(...): ...
+
+    装饰器自动记录返回值的形状。阶段可以嵌套，记录中保留层级和完整路径（如 '读取面板/合并面板'）。
+    峰值内存为该阶段内进程常驻内存的最高值：Linux 下进入每个阶段时重置内核的峰值计数
+    （/proc/self/clear_refs），内层阶段的峰值并入外层；其它系统只能读到进程启动以来的峰值
+    （Windows 需要 psutil，否则为缺失）。峰值计数是整个进程共用的，阶段运行期间只要其它线程
+    也有阶段在运行，就不再重置计数，这些阶段的峰值记为缺失。
+    进程的 CPU 时间同样无法在同时运行的阶段之间分摊：与其它线程的阶段重叠过的阶段改记本线程的 CPU 时间
+    （time.thread_time），不含子进程和该阶段内 BLAS 等库另开的线程，可能偏低。
+    """
+    return _Stage(name, rows, cols)
+
+
+class _Stage:
+    """一个阶段的计时状态，由 stage() 创建。"""
+
+    __slots__ = ('name', 'rows', 'cols', '_active', '_start', '_cpu', '_peak', '_shared')
+
+    def __init__(self, name, rows=None, cols=None):
+        self.name = name
+        self.rows = rows
+        self.cols = cols
+        self._active = False
+
+    def set_shape(self, obj):
+        """按 obj 记录行列数：DataFrame/数组取 shape，估计结果取 (观测数, 系数个数)，元组取第一个元素。"""
+        shape = _shape_of(obj)
+        if shape is not None:
+            self.rows, self.cols = shape
+        return obj
+
+    def __enter__(self):
+        self._active = _enabled
+        if not self._active:
+            return self
+        stack = _stack()
+        with _lock:
+            peak = _read_peak()
+            if stack:
+                stack[-1]._peak = max(stack[-1]._peak, peak)
+            stack.append(self)
+            _busy[threading.get_ident()] = stack
+            # 其它线程也有阶段在运行：它们与本阶段的峰值都无法归属，且不能重置共用的计数
+            self._shared = len(_busy) > 1
+            if self._shared:
+                for other in _busy.values():
+                    for s in other:
+                        s._shared = True
+            self._peak = 0 if not self._shared and _reset_peak() else peak
+        self._cpu = (_cpu_time(), time.thread_time())
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._active:
+            return False
+        end = time.perf_counter()
+        process_cpu, thread_cpu = _cpu_time() - self._cpu[0], time.thread_time() - self._cpu[1]
+        stack = _stack()
+        path = '/'.join(s.name for s in stack)
+        with _lock:
+            stack.pop()
+            if not stack:
+                _busy.pop(threading.get_ident(), None)
+            self._peak = float('nan') if self._shared else max(self._peak, _read_peak())
+            cpu = thread_cpu if self._shared else process_cpu
+            if stack:
+                stack[-1]._peak = max(stack[-1]._peak, self._peak)
+        _records.append({
+            '阶段': path,
+            '层级': len(stack),
+            '开始秒': self._start - _origin,
+            '墙钟秒': end - self._start,
+            'CPU秒': cpu,
+            '峰值RSS_MB': self._peak / 1024 ** 2 if self._peak == self._peak else float('nan'),
+            '行数': self.rows,
+            '列数': self.cols,
+            '出错': exc_type is not None,
+        })
+        return False
+
+    def __call__(self, fn):
+        name = self.name
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Stage(name) as s:
+                return s.set_shape(fn(*args, **kwargs))
+        return wrapper
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _after_fork():
+    # fork 出的子进程只保留调用 fork 的线程，其它线程的阶段不再运行
+    global _lock
+    _lock = threading.Lock()
+    stack = getattr(_local, 'stack', None)
+    _busy.clear()
+    if stack:
+        _busy[threading.get_ident()] = stack
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _shape_of(obj):
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]
+    shape = getattr(obj, 'shape', None)
+    if shape is not None and len(shape):
+        return int(shape[0]), int(shape[1]) if len(shape) > 1 else 1
+    if hasattr(obj, 'nobs') and hasattr(obj, 'params'):
+        return int(obj.nobs), len(obj.params)
+    return None
+
+
+def _cpu_time():
+    # os.times 含已被回收的子进程（如进程池读取工作簿）的 CPU 时间；Windows 下子进程部分为 0
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+_PROC_STATUS = Path('/proc/self/status')
+_can_reset = _PROC_STATUS.exists()
+
+
+def _read_peak():
+    """进程的峰值常驻内存（字节），无法获取时为 nan。"""
+    if _PROC_STATUS.exists():
+        for line in _PROC_STATUS.read_text().splitlines():
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return float('nan')
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss)
+    # ru_maxrss 在 macOS 上以字节计，在其它系统上以 KB 计
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _reset_peak():
+    """把内核记录的峰值常驻内存重置为当前值（仅 Linux），成功时返回 True。"""
+    global _can_reset
+    if not _can_reset:
+        return False
+    try:
+        with open('/proc/self/clear_refs', 'w') as fh:
+            fh.write('5')
+        return True
+    except OSError:
+        _can_reset = False
+        return False
+
+
+def trace():
+    """全部阶段记录，每次进入阶段一行，按结束先后排列。"""
+    records = pd.DataFrame(_records, columns=['阶段', '层级', '开始秒', '墙钟秒', 'CPU秒', '峰值RSS_MB', '行数', '列数',
+                                              '出错'])
+    return records.astype({'行数': 'Int64', '列数': 'Int64'})
+
+
+def summary(records=None):
+    """
+    一屏汇总：按阶段路径合并多次调用，按首次出现的先后排列，内层阶段缩进；
+    占比为耗时占顶层阶段所覆盖墙钟时间的比例。多个线程并发运行顶层阶段时，重叠的时间只计一次，
+    各阶段的占比之和因而可能超过 100%。
+    """
+    records = trace() if records is None else records
+    if records.empty:
+        return "没有阶段记录"
+    records = records.sort_values('开始秒', kind='stable')
+    table = records.groupby('阶段', sort=False).agg(
+        调用次数=('墙钟秒', 'size'), 墙钟秒=('墙钟秒', 'sum'), CPU秒=('CPU秒', 'sum'),
+        峰值RSS_MB=('峰值RSS_MB', 'max'), 行数=('行数', 'last'), 列数=('列数', 'last'), 层级=('层级', 'first'))
+    top = records[records['层级'] == 0]
+    total = _covered(top['开始秒'].to_numpy(), (top['开始秒'] + top['墙钟秒']).to_numpy())
+    table['占比'] = table['墙钟秒'] / total if total > 0 else float('nan')
+    table.index = ['  ' * depth + path.rsplit('/', 1)[-1] for path, depth in zip(table.index, table['层级'])]
+    table = table[['调用次数', '墙钟秒', 'CPU秒', '占比', '峰值RSS_MB', '行数', '列数']]
+    # 未记录形状的阶段显示为 '-'
+    for column in ('行数', '列数'):
+        table[column] = [('-' if pd.isna(v) else str(v)) for v in table[column]]
+    lines = [
+        f"阶段耗时汇总（顶层阶段覆盖 {total:.3f} 秒）",
+        table.to_string(formatters={'占比': '{:.1%}'.format, '墙钟秒': '{:.3f}'.format, 'CPU秒': '{:.3f}'.format,
+                                    '峰值RSS_MB': '{:.1f}'.format}),
+    ]
+    return '\n'.join(lines)
+
+
+def _covered(starts, ends):
+    """区间 [starts, ends) 的并集长度：按开始时间排序后合并重叠的区间。"""
+    total, reach = 0.0, float('-inf')
+    for start, end in sorted(zip(starts, ends)):
+        if end > reach:
+            total += end - max(start, reach)
+            reach = end
+    return total
+
+
+def write_trace(path):
+    """把全部记录写到 path：扩展名为 .csv 时写 CSV，否则写 JSON（记录列表）。"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    records = trace()
+    if path.suffix.lower() == '.csv':
+        records.to_csv(path, index=False, encoding='utf-8-sig')
+    else:
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump(json.loads(records.to_json(orient='records', force_ascii=False)), fh, ensure_ascii=False,
+                      indent=1)
+    return path
+
+
+def _write_at_exit():
+    if _trace_path is not None and _records:
+        write_trace(_trace_path)
+        print(f"\n{summary()}\n阶段记录已写入 {_trace_path}")
+
+
+if os.environ.get(TRACE_ENV):
+    enable(os.environ[TRACE_ENV])
@@ -0,0 +1,139 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+
+def wide_to_long(raw, var_name):
+    """
+    将未设表头读入的宽格式表（第一行为国家名称，第一列为年份）整体重排为长格式，
+    返回包含 'Year', 'Country', var_name 三列的 DataFrame。
+
+    不再逐格调用 df.iloc，而是一次切出表头行、年份列和数值块，
+    再用 np.repeat / np.tile / ravel 批量展开，行顺序与 DataFrame.melt 一致（按国家、再按年份）。
+    """
+    return _long_frame(*_wide_arrays(raw), var_name)
+
+
+def _wide_arrays(raw):
+    """把宽格式表切分为 (国家名称数组, 年份数组, 年份×国家的 float64 数值块)。"""
+    # 表头行（从第二列开始）为国家，索引列（从第二行开始）为年份
+    countries = pd.Series(raw.iloc[0, 1:].to_numpy()).astype(str).str.strip().to_numpy(dtype=str)
+    years = pd.to_numeric(pd.Series(raw.iloc[1:, 0].to_numpy()).astype(str).str.strip(),
+                          errors='coerce').to_numpy(dtype='float64')
+    block = raw.iloc[1:, 1:].to_numpy()
+    # 含文本单元格（如 '..'）时才退回逐元素的 to_numeric
+    try:
+        block = block.astype('float64')
+    except (TypeError, ValueError):
+        block = pd.to_numeric(pd.Series(block.ravel()), errors='coerce').to_numpy(dtype='float64') \
+            .reshape(block.shape)
+    return countries, years, block
+
+
+def _long_frame(countries, years, block, var_name):
+    """由 _wide_arrays 的结果展开长格式表，行顺序与 DataFrame.melt 一致（按国家、再按年份）。"""
+    n_years, n_countries = block.shape
+    df_long = pd.DataFrame({
+        'Year': np.tile(years, n_countries),
+        'Country': np.repeat(countries.astype(object), n_years),
+        # 数值块按列展开（order='F'），即逐个国家依次取出全部年份
+        var_name: block.ravel(order='F'),
+    })
+    # 去掉年份无法解析的行（如表格末尾的注释行）
+    df_long = df_long[df_long['Year'].notna()].reset_index(drop=True)
+    # 年份单元格常被 Excel 存成浮点数（2000.0），全为整数时还原为整数
+    if (df_long['Year'] % 1 == 0).all():
+        df_long['Year'] = df_long['Year'].astype('int64')
+    return df_long
+
+
+def read_and_melt(file_path, var_name):
+    """
+    读取Excel文件（或 write_wide 写出的 Parquet 文件），假设第一行为国家名称，第一列为年份，
+    然后将宽格式转换成长格式（包含Year, Country, var_name）
+    """
+    return _long_frame(*_read_wide(file_path), var_name)
+
+
+def _read_wide(file_path):
+    """
+    按扩展名读取宽格式表，返回 _wide_arrays 的结果。
+    .parquet 文件的列名为国家名称、第一列为年份（模拟数据.write_wide 的输出）；其余按 Excel 读取，
+    不指定 header 和 index_col，表头与年份列统一在 _wide_arrays 中切分。
+    """
+    if str(file_path).lower().endswith('.parquet'):
+        table = pd.read_parquet(file_path)
+        countries = pd.Series(table.columns[1:]).astype(str).str.strip().to_numpy(dtype=str)
+        years = pd.to_numeric(table.iloc[:, 0], errors='coerce').to_numpy(dtype='float64')
+        return countries, years, table.iloc[:, 1:].to_numpy(dtype='float64')
+    return _wide_arrays(pd.read_excel(file_path, header=None))
+
+
+def read_sources(sources, n_jobs=None):
+    """
+    读取 {变量名: 文件路径} 中的全部工作簿，各工作簿的 openpyxl 解析在进程池中并行进行。
+      - n_jobs：进程数，None 时取 min(工作簿数, CPU 核数)；为 1 或只有一个工作簿时在当前进程中依次读取
+    子进程只返回紧凑的数组（国家名称、年份和 float64 数值块），不传回 DataFrame，
+    长格式表在主进程中展开，结果与逐个调用 read_and_melt 相同。
+
+    返回 (frames, failures)：
+      - frames：{变量名: 长格式 DataFrame}，顺序与 sources 一致，只包含读取成功的工作簿
+      - failures：读取失败的工作簿，列为 变量、路径、错误；全部成功时为空表
+    """
+    sources = dict(sources)
+    if n_jobs is None:
+        n_jobs = min(len(sources), os.cpu_count() or 1)
+
+    if n_jobs <= 1 or len(sources) <= 1:
+        results = {var_name: _read_arrays(path) for var_name, path in sources.items()}
+    else:
+        with _hide_main_module(), ProcessPoolExecutor(max_workers=min(n_jobs, len(sources))) as pool:
+            futures = {var_name: pool.submit(_read_arrays, path) for var_name, path in sources.items()}
+        results = {var_name: future.result() for var_name, future in futures.items()}
+
+    frames, failures = {}, []
+    for var_name, (arrays, error) in results.items():
+        if error is None:
+            frames[var_name] = _long_frame(*arrays, var_name)
+        else:
+            failures.append((var_name, str(sources[var_name]), error))
+    return frames, pd.DataFrame(failures, columns=['变量', '路径', '错误'])
+
+
+def raise_for_failures(failures):
+    """read_sources 返回的失败表非空时，列出全部失败的工作簿及其路径后抛出 OSError。"""
+    if len(failures):
+        lines = [f"  {row.变量}: {row.路径}（{row.错误}）" for row in failures.itertuples()]
+        raise OSError(f"{len(failures)} 个工作簿读取失败:\n" + '\n'.join(lines))
+
+
+def _read_arrays(file_path):
+    """进程池中读取一个工作簿：返回 ((国家, 年份, 数值块), None)，失败时返回 (None, 错误信息)。"""
+    try:
+        return _read_wide(file_path), None
+    except Exception as exc:
+        # 异常对象不一定能序列化回主进程，只传回类型和信息
+        return None, f'{type(exc).__name__}: {exc}'
+
+
+@contextmanager
+def _hide_main_module():
+    """
+    spawn 方式（Windows 的默认方式）启动的子进程会重新执行主脚本的顶层代码，而分析脚本没有
+    if __name__ == '__main__' 保护。创建进程期间暂时去掉主模块的 __file__ 和 __spec__，
+    子进程按交互式会话处理，只导入本模块；fork 方式下不受影响。
+    """
+    main = sys.modules.get('__main__')
+    saved = {name: main.__dict__.pop(name) for name in ('__file__', '__spec__')
+             if main is not None and name in main.__dict__}
+    if main is not None and '__spec__' in saved:
+        main.__spec__ = None
+    try:
+        yield
+    finally:
+        if main is not None:
+            main.__dict__.update(saved)
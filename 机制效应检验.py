@@ -32,3 +32,11 @@ total_effect = direct_effect + indirect_effect
 
 print(f"直接效应 (FDI 对 GWG 的影响): {direct_effect:.4f}")
 print(f"总效应 (Direct Effect + Indirect Effect): {total_effect:.4f}")
+
+# Sobel 检验与按国家聚类的自助置信区间，检验间接效应是否显著
+from 中介效应 import mediation_analysis
+mediation, _ = mediation_analysis(data.reset_index(), 'FDI', 'FEM_EMP', 'GWG',
+                                  ['GDP_per_capita', 'Total_average_wage', 'HDI', 'Fertility'],
+                                  time_effects=False, n_boot=5000, seed=0)
+print("中介效应检验结果：")
+print(mediation.T)
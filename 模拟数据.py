@@ -1,31 +1,181 @@
-import pandas as pd
+from pathlib import Path
+
 import numpy as np
+import pandas as pd
+
+# 真实的数据生成过程（DGP）中的系数，可通过 simulate_panel(coefficients=...) 覆盖其中任意几项：
+#   FDI     = a_i + π·HIST_TRADE + Σ δ_w·W + v,          v = ρ·u + sqrt(1 - ρ²)·ε   （ρ 为 endogeneity）
+#   FEM_EMP = m_i + τ_t + a·FDI + Σ γ_w·W + e
+#   GWG     = α_i + λ_t + c'·FDI + b·FEM_EMP + Σ β_w·W + u
+# W 为控制变量 GDP_per_capita、Total_average_wage、HDI、Fertility，HIST_TRADE 只通过 FDI 影响 GWG（有效工具变量）
+DEFAULT_COEFFICIENTS = {
+    'GWG~FDI': -0.02,                  # 直接效应 c'
+    'GWG~FEM_EMP': -0.15,              # 中介变量对结果的效应 b
+    'GWG~GDP_per_capita': -2e-6,
+    'GWG~Total_average_wage': 1e-5,
+    'GWG~HDI': -0.1,
+    'GWG~Fertility': 0.02,
+    'FEM_EMP~FDI': 0.04,               # FDI 对中介变量的效应 a
+    'FEM_EMP~GDP_per_capita': 2e-6,
+    'FEM_EMP~Total_average_wage': 0.0,
+    'FEM_EMP~HDI': 0.2,
+    'FEM_EMP~Fertility': -0.05,
+    'FDI~HIST_TRADE': 1.5,             # 第一阶段系数 π
+    'FDI~GDP_per_capita': 1e-5,
+    'FDI~Total_average_wage': 0.0,
+    'FDI~HDI': 1.0,
+    'FDI~Fertility': -0.2,
+}
+
+CONTROLS = ['GDP_per_capita', 'Total_average_wage', 'HDI', 'Fertility']
+# 控制变量与工具变量的 (均值, 国家间标准差, 国家内标准差)，国家间部分与国家固定效应相关，混合 OLS 因而有偏
+# 吸收固定效应后工具变量只剩国家内变异：π 与 HIST_TRADE 的国家内标准差共同决定第一阶段强度，
+# 默认 20×25 面板上第一阶段 F 约为 50~80，远高于弱工具变量的经验阈值 10
+_EXOG_SCALES = {
+    'GDP_per_capita': (30000.0, 8000.0, 2000.0),
+    'Total_average_wage': (3000.0, 800.0, 200.0),
+    'HDI': (0.85, 0.05, 0.01),
+    'Fertility': (2.3, 0.5, 0.15),
+    'HIST_TRADE': (0.5, 0.15, 0.25),
+}
+VARIABLES = ['FDI', *CONTROLS, 'GWG', 'FEM_EMP', 'HIST_TRADE']
+MISSING_PATTERNS = ('random', 'leading')
+
+
+def simulate_panel(n_countries=20, n_years=25, first_year=2000, unbalanced=0.0, missing=0.0,
+                   missing_pattern='random', endogeneity=0.0, coefficients=None, seed=42):
+    """
+    按已知的数据生成过程模拟国家×年份面板，用于基准测试和检验估计量能否还原真实系数。
+
+      - n_countries × n_years 个 (Country, Year) 键互不重复，全部按向量化方式一次生成，可到数百万行
+      - 国家固定效应、年份固定效应（GWG、FEM_EMP 含年份效应），控制变量与国家效应相关
+      - HIST_TRADE 为有效工具变量：与 FDI 相关，与 GWG 的误差项无关
+      - FEM_EMP 为 FDI → GWG 的中介变量，间接效应为 a·b
+      - endogeneity：FDI 的误差与 GWG 误差的相关系数 ρ，0 时 OLS 一致；不为 0 时 FEM_EMP 经由 FDI 同样内生，
+        以 HIST_TRADE 为工具变量、不控制 FEM_EMP 的 2SLS 估计的是总效应 c' + a·b
+      - unbalanced：随机删去的 (国家, 年份) 行所占比例，得到含年份缺口的非平衡面板
+      - missing：各变量取值缺失的比例（单个数或 {变量: 比例}）；missing_pattern 为 'random'（完全随机缺失）
+        或 'leading'（各国家序列开头若干年缺失，类似数据较晚才开始公布的国家）
+      - coefficients：覆盖 DEFAULT_COEFFICIENTS 中的部分系数
+
+    返回 (面板, 真实参数)：面板为按 Country、Year 排序的长格式 DataFrame（Country、Year 为列），
+    真实参数为 pd.Series，含各方程系数以及 间接效应、总效应。
+    """
+    if missing_pattern not in MISSING_PATTERNS:
+        raise ValueError(f"missing_pattern 只能为 'random' 或 'leading'，收到: {missing_pattern!r}")
+    if not 0 <= unbalanced < 1:
+        raise ValueError(f"unbalanced 须在 [0, 1) 之间，收到: {unbalanced}")
+    if not -1 <= endogeneity <= 1:
+        raise ValueError(f"endogeneity 须在 [-1, 1] 之间，收到: {endogeneity}")
+    unknown = sorted(set(coefficients or {}) - set(DEFAULT_COEFFICIENTS))
+    if unknown:
+        raise ValueError(f"未知的系数: {unknown}")
+    coef = {**DEFAULT_COEFFICIENTS, **(coefficients or {})}
+    rng = np.random.default_rng(seed)
+
+    n = n_countries * n_years
+    entity = np.repeat(np.arange(n_countries), n_years)
+    year = np.tile(np.arange(n_years), n_countries)
+    # 国家名称补零，使字符串排序与编号一致
+    width = len(str(n_countries))
+    names = np.array([f'Country_{i:0{width}d}' for i in range(1, n_countries + 1)], dtype=object)
+
+    def entity_effect(scale):
+        return (scale * rng.standard_normal(n_countries))[entity]
+
+    def year_effect(scale):
+        return (scale * rng.standard_normal(n_years))[year]
+
+    # 国家层面的共同因子，使控制变量、FDI 与国家固定效应相关
+    factor = rng.standard_normal(n_countries)[entity]
+    values = {}
+    for name, (mean, between, within) in _EXOG_SCALES.items():
+        values[name] = mean + between * (0.6 * factor + 0.8 * rng.standard_normal(n_countries)[entity]) + \
+            within * rng.standard_normal(n)
+
+    def controls(equation):
+        # 控制变量以均值为中心进入各方程，方程截距因而不随控制变量的系数变化
+        return sum(coef[f'{equation}~{w}'] * (values[w] - _EXOG_SCALES[w][0]) for w in CONTROLS)
+
+    u = 0.03 * rng.standard_normal(n)
+    v = endogeneity * u / 0.03 + np.sqrt(1 - endogeneity ** 2) * rng.standard_normal(n)
+    values['FDI'] = 2.5 + 0.8 * factor + entity_effect(0.6) + \
+        coef['FDI~HIST_TRADE'] * (values['HIST_TRADE'] - _EXOG_SCALES['HIST_TRADE'][0]) + controls('FDI') + v
+    values['FEM_EMP'] = 0.5 + 0.05 * factor + entity_effect(0.08) + year_effect(0.02) + \
+        coef['FEM_EMP~FDI'] * values['FDI'] + controls('FEM_EMP') + 0.03 * rng.standard_normal(n)
+    values['GWG'] = 0.25 + 0.03 * factor + entity_effect(0.05) + year_effect(0.01) + \
+        coef['GWG~FDI'] * values['FDI'] + coef['GWG~FEM_EMP'] * values['FEM_EMP'] + controls('GWG') + u
+
+    panel = pd.DataFrame({'Country': names[entity], 'Year': first_year + year})
+    for name in VARIABLES:
+        panel[name] = values[name]
+
+    if unbalanced > 0:
+        panel = panel[rng.random(n) >= unbalanced].reset_index(drop=True)
+    if any(missing.values()) if isinstance(missing, dict) else missing:
+        _plant_missing(panel, missing, missing_pattern, rng)
+
+    truth = pd.Series(coef, name='真实值', dtype='float64')
+    truth['间接效应'] = coef['FEM_EMP~FDI'] * coef['GWG~FEM_EMP']
+    truth['总效应'] = coef['GWG~FDI'] + truth['间接效应']
+    return panel, truth
+
+
+def _plant_missing(panel, missing, pattern, rng):
+    """按比例把各变量的部分取值设为缺失；'leading' 时每个国家缺失开头若干个观测，期望比例与 missing 相同。"""
+    shares = missing if isinstance(missing, dict) else {name: missing for name in VARIABLES}
+    codes, uniques = pd.factorize(panel['Country'])
+    counts = np.bincount(codes, minlength=len(uniques))
+    # 行已按国家排序，各行在所属国家内的位置
+    position = np.arange(len(panel)) - np.r_[0, np.cumsum(counts)[:-1]][codes]
+    for name, share in shares.items():
+        if not 0 <= share < 1:
+            raise ValueError(f"{name} 的缺失比例须在 [0, 1) 之间，收到: {share}")
+        if pattern == 'random':
+            drop = rng.random(len(panel)) < share
+        else:
+            # 各国家缺失的开头年数在 0 到 2·share·T 之间均匀取值
+            lead = rng.integers(0, np.floor(2 * share * counts).astype('int64') + 1)
+            drop = position < lead[codes]
+        panel.loc[drop, name] = np.nan
+
+
+def write_wide(panel, directory, variables=None, file_format='xlsx', entity='Country', time='Year'):
+    """
+    把长格式面板按变量写成数据加载所用的宽格式文件（第一行为国家名称，第一列为年份），每个变量一个文件。
+      - file_format='xlsx'：与原始工作簿相同的布局，国家数不能超过 Excel 的 16383 列
+      - file_format='parquet'：列名为国家，第一列为年份，read_and_melt / read_sources 同样可以读取
+    返回 {变量名: 文件路径}，可直接传给 load_panel / build_panel。
+    """
+    if file_format not in ('xlsx', 'parquet'):
+        raise ValueError(f"file_format 只能为 'xlsx' 或 'parquet'，收到: {file_format!r}")
+    variables = [c for c in panel.columns if c not in (entity, time)] if variables is None else list(variables)
+    entity_codes, countries = pd.factorize(panel[entity], sort=True)
+    time_codes, years = pd.factorize(panel[time], sort=True)
+    if file_format == 'xlsx' and len(countries) > 16383:
+        raise ValueError(f"国家数 {len(countries)} 超过 Excel 的列数上限，请改用 file_format='parquet'")
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    sources = {}
+    for name in variables:
+        # 年份×国家的数值块，不在面板中的 (国家, 年份) 为缺失
+        block = np.full((len(years), len(countries)), np.nan)
+        block[time_codes, entity_codes] = panel[name].to_numpy(dtype='float64')
+        wide = pd.DataFrame(block, columns=pd.Index(countries.astype(str)))
+        wide.insert(0, time, np.asarray(years))
+        path = directory / f'{name}.{file_format}'
+        if file_format == 'xlsx':
+            wide.to_excel(path, index=False)
+        else:
+            wide.to_parquet(path, index=False)
+        sources[name] = str(path)
+    return sources
+
 
-# 设置随机种子，以确保结果可复现
-np.random.seed(42)
-
-# 模拟20个国家（编号1到20）和25年（2000到2024）
-countries = [f'Country_{i}' for i in range(1, 21)]
-years = list(range(2000, 2025))
-
-# 模拟数据
-n_countries = len(countries)
-n_years = len(years)
-
-# 创建面板数据框架
-data = pd.DataFrame({
-    'Country': np.random.choice(countries, n_countries * n_years, replace=True),
-    'Year': np.random.choice(years, n_countries * n_years, replace=True),
-    'FDI': np.random.uniform(0, 5, n_countries * n_years),  # FDI占GDP的比重
-    'GDP_per_capita': np.random.uniform(10000, 50000, n_countries * n_years),  # 人均GDP
-    'Total_average_wage': np.random.uniform(1000, 5000, n_countries * n_years),  # 总平均工资
-    'HDI': np.random.uniform(0.7, 1.0, n_countries * n_years),  # 人类发展指数
-    'Fertility': np.random.uniform(1.2, 3.5, n_countries * n_years),  # 生育率
-    'GWG': np.random.uniform(0, 0.5, n_countries * n_years),  # 性别工资差距
-})
-
-# 将 'Country' 和 'Year' 设置为索引，模拟面板数据结构
-data.set_index(['Country', 'Year'], inplace=True)
-
-# 查看前几行数据
-print(data.head())
+if __name__ == '__main__':
+    data, truth = simulate_panel()
+    # 将 'Country' 和 'Year' 设置为索引，模拟面板数据结构
+    data = data.set_index(['Country', 'Year'])
+    print(data.head())
+    print(truth)
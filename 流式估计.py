@@ -0,0 +1,280 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from 共线性诊断 import check_collinearity
+from 固定效应估计 import AbsorbedOLSResults, _check_cov_type, _cov_label, _nested_df, _score_meat
+
+DEFAULT_CHUNKSIZE = 1_000_000
+# 只有叉积矩阵时的共线性容差：A - Σ S S'/C 的抵消使组内叉积只有约 sqrt(机器精度) 的相对精度，
+# 不能沿用 check_collinearity 在设计矩阵上使用的 1e-8
+_GRAM_TOL = 1e-5
+
+
+def fit_streaming(source, dependent, exog, entity='Country', time='Year', entity_effects=True, time_effects=True,
+                  cov_type='unadjusted', cluster='entity', bandwidth=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    不把面板整体读入内存的固定效应估计：按块读取长格式面板，累积组内变换所需的叉积后求解。
+
+    source 为 Parquet（如 cached_panel_path 返回的面板缓存）或 CSV 文件路径、路径列表，
+    或每次调用都返回一个新 DataFrame 块迭代器的函数。每块只读取 entity、time、dependent 和 exog 列，
+    删除所用变量缺失的行。
+
+    第一遍逐块累积：A = Σ z z'（z = [y, X]）、各国家之和 S_i 与观测数 C_i、各年份之和与观测数，
+    吸收年份效应时另记国家×年份的出现矩阵 P（每格 1 字节）。按国家去均值后的叉积为 A - Σ_i S_i S_i'/C_i，
+    年份效应由 D'MD = diag(n_t) - P' diag(1/C) P、D'Mz = Σ_{t} z - P'(S/C) 以 Frisch-Waugh-Lovell 消去，
+    与 rolling_fit 中的做法相同。'unadjusted' 以外的协方差再读一遍数据，逐块计算残差化的 X 与残差，
+    只累积按国家/年份汇总的得分或 k×k 的得分叉积。
+    内存占用为 O(k² + 国家数 ×(k + 年份数))，与行数无关；单块的内存由 chunksize 控制。
+
+    与 fit_absorbed_ols 一样先做共线性检查：以组内叉积的平方根代替设计矩阵交给 check_collinearity，
+    剔除与固定效应或其它解释变量共线的列（记录在结果的 dropped 中）后再求解。
+    至少吸收一类固定效应；cov_type、cluster、bandwidth 的含义与 fit_absorbed_ols 相同，结果也相同。
+    返回 AbsorbedOLSResults，其中不含残差和设计矩阵（resids 为 None，不能再用 with_cov 换用协方差）。
+    """
+    _check_cov_type(cov_type, cluster)
+    if not entity_effects and not time_effects:
+        raise ValueError("流式估计至少需要吸收国家或年份固定效应之一")
+    exog = list(exog)
+    columns = [entity, time, dependent] + exog
+    chunks = _chunk_reader(source, columns, chunksize)
+    track_cells = time_effects and entity_effects or (cov_type == 'clustered' and cluster == 'both')
+
+    # 第一遍：累积充分统计量
+    stats_ = _StreamStats(len(exog) + 1, track_cells)
+    for chunk in chunks():
+        stats_.add(*_chunk_arrays(chunk, columns, stats_))
+    if stats_.nobs == 0:
+        raise ValueError("数据中没有完整的观测")
+    stats_.finish()
+
+    n_entities, n_times, nobs = len(stats_.entities), len(stats_.years), stats_.nobs
+    means = stats_.sums / stats_.counts[:, None]
+    year_means = stats_.year_sums / stats_.year_counts[:, None]
+    within = stats_.gram.copy()
+    if entity_effects:
+        within -= stats_.sums.T @ means
+    else:
+        within -= stats_.year_sums.T @ year_means
+    gamma = entity_adjust = None
+    if entity_effects and time_effects:
+        # 年份虚拟变量以第一年为基准；出现矩阵分块转为浮点，避免一次性展开为 国家数×年份数 的 float64 数组
+        dd = np.diag(stats_.year_counts[1:])
+        dz = stats_.year_sums[1:].copy()
+        for rows, presence in _presence_blocks(stats_.presence):
+            dd -= presence.T @ (presence / stats_.counts[rows, None])
+            dz -= presence.T @ means[rows]
+        gamma = np.vstack([np.zeros((1, within.shape[0])), np.linalg.solve(dd, dz)])
+        within -= dz.T @ gamma[1:]
+        entity_adjust = np.empty_like(means)
+        for rows, presence in _presence_blocks(stats_.presence):
+            entity_adjust[rows] = presence @ gamma[1:] / stats_.counts[rows, None]
+
+    keep, dropped = check_collinearity(_gram_root(within[1:, 1:], np.diag(stats_.gram)[1:]), exog,
+                                       np.sqrt(np.diag(stats_.gram)[None, 1:]), tol=_GRAM_TOL)
+    cols = [0] + [1 + j for j in keep]
+    within = within[np.ix_(cols, cols)]
+    exog = [exog[j] for j in keep]
+
+    df_absorbed = (n_entities if entity_effects else 0) + (n_times if time_effects else 0) - \
+        (1 if entity_effects and time_effects else 0)
+    k = len(exog)
+    df_resid = nobs - k - df_absorbed
+    bread = np.linalg.inv(within[1:, 1:])
+    beta = bread @ within[1:, 0]
+    ssr = within[0, 0] - beta @ within[1:, 0]
+
+    if cov_type == 'unadjusted':
+        cov = bread * (ssr / df_resid)
+    else:
+        # 第二遍：逐块计算 FWL 残差化的 X 与残差，只累积汇总后的得分
+        outer = np.zeros((k, k))
+        entity_scores = np.zeros((n_entities, k))
+        time_scores = np.zeros((n_times, k))
+        for chunk in chunks():
+            entity_codes, time_codes, z = _chunk_arrays(chunk, columns, stats_, known=True)
+            if entity_effects:
+                z = z - means[entity_codes]
+                if time_effects:
+                    z = z - gamma[time_codes] + entity_adjust[entity_codes]
+            else:
+                z = z - year_means[time_codes]
+            z = z[:, cols]
+            scores = z[:, 1:] * (z[:, 0] - z[:, 1:] @ beta)[:, None]
+            outer += scores.T @ scores
+            for j in range(k):
+                entity_scores[:, j] += np.bincount(entity_codes, weights=scores[:, j], minlength=n_entities)
+                time_scores[:, j] += np.bincount(time_codes, weights=scores[:, j], minlength=n_times)
+        nested = _nested_df(cov_type, cluster, entity_effects, time_effects, n_entities, n_times)
+        cov = bread @ _stream_meat(outer, entity_scores, time_scores, nobs, df_resid + nested, cov_type, cluster,
+                                   bandwidth) @ bread
+        cov = (cov + cov.T) / 2
+
+    effects = [name for name, on in (('国家', entity_effects), ('年份', time_effects)) if on]
+    return AbsorbedOLSResults(
+        params=pd.Series(beta, index=exog, name='系数'),
+        cov=pd.DataFrame(cov, index=exog, columns=exog),
+        resids=None,
+        nobs=nobs,
+        df_resid=df_resid,
+        df_absorbed=df_absorbed,
+        rsquared_within=1 - ssr / within[0, 0],
+        dependent=dependent,
+        effects=effects,
+        n_entities=n_entities,
+        n_times=n_times,
+        cov_type=_cov_label(cov_type, cluster, bandwidth),
+        dropped=dropped,
+    )
+
+
+def _gram_root(gram, raw_squares):
+    """
+    对称半正定矩阵 gram 的平方根 R（R'R = gram），作为与设计矩阵列范数和 QR 分解相同的替身交给 check_collinearity。
+    先把对角元单位化再分解，避免量纲悬殊的变量互相淹没；组内平方和相对原始平方和只剩舍入误差的列
+    （被固定效应吸收）置为零列，不参与分解。
+    """
+    squares = np.diag(gram)
+    alive = squares > _GRAM_TOL ** 2 * np.maximum(raw_squares, 1.0)
+    norms = np.where(alive, np.sqrt(np.where(alive, squares, 1.0)), 0.0)
+    scaled = gram / np.outer(np.where(alive, norms, 1.0), np.where(alive, norms, 1.0))
+    scaled[~alive] = 0.0
+    scaled[:, ~alive] = 0.0
+    eigenvalues, vectors = np.linalg.eigh(scaled)
+    root = (vectors * np.sqrt(np.clip(eigenvalues, 0.0, None))) @ vectors.T
+    return root * norms
+
+
+def _stream_meat(outer, entity_scores, time_scores, nobs, df_resid, cov_type, cluster, bandwidth):
+    """由累积的得分叉积、按国家/年份汇总的得分计算夹心估计的中间矩阵，校正方式与 _score_meat 相同。"""
+    if cov_type == 'robust':
+        return outer * (nobs / df_resid)
+    if cov_type == 'driscoll-kraay':
+        return _score_meat(time_scores, df_resid, cov_type, np.arange(len(time_scores)), bandwidth, nobs=nobs)
+    terms = {'entity': [(entity_scores, 1)], 'time': [(time_scores, 1)]}.get(cluster)
+    if terms is None:
+        # 双向聚类：国家×年份的交叉组即单个观测（键唯一），其得分叉积为 outer
+        meat = outer * (-nobs / (nobs - 1))
+        terms = [(entity_scores, 1), (time_scores, 1)]
+    else:
+        meat = 0
+    for sums, sign in terms:
+        meat = meat + sign * len(sums) / (len(sums) - 1) * (sums.T @ sums)
+    return meat * (nobs - 1) / df_resid
+
+
+class _StreamStats:
+    """
+    第一遍的累加器：国家、年份取值在读取过程中逐步编码（字典），各国家的数组按需倍增容量。
+    finish() 后年份按取值排序重新编码（Driscoll-Kraay 依赖时间顺序）。
+    """
+
+    def __init__(self, p, track_cells):
+        self.entities = {}
+        self.years = {}
+        self.shift = None
+        self.nobs = 0
+        self.gram = np.zeros((p, p))
+        self.sums = np.zeros((0, p))
+        self.counts = np.zeros(0)
+        self.year_sums = np.zeros((0, p))
+        self.year_counts = np.zeros(0)
+        self.track_cells = track_cells
+        self.presence = np.zeros((0, 0), dtype='uint8')
+        self.year_order = None
+
+    def add(self, entity_codes, time_codes, z):
+        n_entities, n_years = len(self.entities), len(self.years)
+        self.sums = _grow(self.sums, n_entities)
+        self.counts = _grow(self.counts, n_entities)
+        self.year_sums = _grow(self.year_sums, n_years)
+        self.year_counts = _grow(self.year_counts, n_years)
+        self.nobs += len(z)
+        self.gram += z.T @ z
+        self.counts[:n_entities] += np.bincount(entity_codes, minlength=n_entities)
+        self.year_counts[:n_years] += np.bincount(time_codes, minlength=n_years)
+        for j in range(z.shape[1]):
+            self.sums[:n_entities, j] += np.bincount(entity_codes, weights=z[:, j], minlength=n_entities)
+            self.year_sums[:n_years, j] += np.bincount(time_codes, weights=z[:, j], minlength=n_years)
+        if self.track_cells:
+            self.presence = _grow(_grow(self.presence, n_entities), n_years, axis=1)
+            cells = self.presence[entity_codes, time_codes]
+            if cells.any() or np.unique(entity_codes.astype('int64') * n_years + time_codes).size < len(z):
+                raise ValueError("存在重复的 (国家, 年份) 键")
+            self.presence[entity_codes, time_codes] = 1
+
+    def finish(self):
+        n_entities, n_years = len(self.entities), len(self.years)
+        self.year_order = np.argsort(np.array(list(self.years), dtype='float64'), kind='stable')
+        # 旧编码 -> 排序后的编码
+        self.year_recode = np.empty(n_years, dtype='int64')
+        self.year_recode[self.year_order] = np.arange(n_years)
+        self.sums, self.counts = self.sums[:n_entities], self.counts[:n_entities]
+        self.year_sums = self.year_sums[:n_years][self.year_order]
+        self.year_counts = self.year_counts[:n_years][self.year_order]
+        if self.track_cells:
+            self.presence = self.presence[:n_entities, :n_years][:, self.year_order]
+
+
+def _presence_blocks(presence, block_size=65536):
+    """按行分块返回 (行切片, 去掉基准年份后的 float64 出现矩阵块)。"""
+    for start in range(0, len(presence), block_size):
+        rows = slice(start, start + block_size)
+        yield rows, presence[rows, 1:].astype('float64')
+
+
+def _grow(array, size, axis=0):
+    """容量不足 size 时按倍增扩展（新位置补 0）。"""
+    if array.shape[axis] >= size:
+        return array
+    shape = list(array.shape)
+    shape[axis] = max(size, 2 * array.shape[axis])
+    out = np.zeros(shape, dtype=array.dtype)
+    out[tuple(slice(0, n) for n in array.shape)] = array
+    return out
+
+
+def _encode(index, values, known):
+    """按字典 index 把取值编码为整数：known=False 时新取值追加编码，True 时只查已有编码。"""
+    inverse, uniques = pd.factorize(values)
+    if known:
+        codes = np.array([index[u] for u in uniques], dtype='int64')
+    else:
+        codes = np.array([index.setdefault(u, len(index)) for u in uniques], dtype='int64')
+    return codes[inverse]
+
+
+def _chunk_arrays(chunk, columns, stats_, known=False):
+    """一块数据 -> (国家编码, 年份编码, z = [y, X] - 平移量)；第二遍（known=True）年份编码为排序后的编码。"""
+    entity, time = columns[:2]
+    chunk = chunk[columns].dropna()
+    z = chunk[columns[2:]].to_numpy(dtype='float64')
+    # 以第一块的均值平移全部数据，不改变组内结果，只减小叉积的数值误差
+    if stats_.shift is None:
+        stats_.shift = z.mean(axis=0) if len(z) else np.zeros(z.shape[1])
+    entity_codes = _encode(stats_.entities, chunk[entity].to_numpy(), known)
+    time_codes = _encode(stats_.years, chunk[time].to_numpy(), known)
+    if known:
+        time_codes = stats_.year_recode[time_codes]
+    return entity_codes, time_codes, z - stats_.shift
+
+
+def _chunk_reader(source, columns, chunksize):
+    """返回一个每次调用都重新从头逐块读取的函数（两遍读取各调用一次）。"""
+    if callable(source):
+        return source
+    paths = [Path(source)] if isinstance(source, (str, Path)) else [Path(p) for p in source]
+
+    def read():
+        for path in paths:
+            if path.suffix.lower() == '.csv':
+                yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+            else:
+                import pyarrow.parquet as pq
+                # 关闭预读和多线程解码，否则 pyarrow 会提前缓冲多个行组，内存随文件增大
+                reader = pq.ParquetFile(path, pre_buffer=False)
+                for batch in reader.iter_batches(batch_size=chunksize, columns=columns, use_threads=False):
+                    yield batch.to_pandas()
+
+    return read
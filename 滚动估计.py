@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+
+from 固定效应估计 import _check_cov_type, _covariance, _cov_groups, _nested_df, _prepare_sample
+
+
+def rolling_fit(data, dependent, exog, window=10, expanding=False, entity='Country', time='Year', time_effects=True,
+                cov_type='clustered', cluster='entity', bandwidth=None, level=0.95):
+    """
+    按年份窗口滚动（或扩展）估计吸收国家固定效应的回归，返回系数路径。
+
+      - expanding=False：长度为 window 年的滚动窗口，每步向后移动一年，如 2000–2009、2001–2010、…
+      - expanding=True：起点固定为样本第一年，窗口从 window 年开始每步多一年
+    国家固定效应总是被吸收（在每个窗口内按国家去均值），time_effects=True 时再加入窗口内的年份固定效应。
+
+    逐年维护充分统计量，窗口移动时只加入新的一年、减去移出的一年，不重新拟合：
+      - A = Σ z z'（z = [y, X]），S_i = Σ_t z_it（各国家之和），C_i（各国家观测数）
+    窗口内按国家去均值后的叉积为 A - Σ_i S_i S_i' / C_i；年份固定效应的叉积
+    D'MD = diag(n_s) - P' diag(1/C) P、D'Mz = Σ_{t=s} z - Σ_{i∈s} S_i / C_i（P 为国家×年份的出现矩阵）
+    只涉及窗口内的年份数，由窗口内的行按年份汇总得到，再由 Frisch-Waugh-Lovell 消去后解 k×k 方程组。'unadjusted' 以外的协方差需要逐观测得分，
+    每个窗口对窗口内的行做一次 O(nk) 的计算（不做组内变换迭代），结果与对该窗口调用 fit_absorbed_ols 相同。
+
+    返回整洁的系数路径表：起始年份、结束年份、变量、系数、标准误、t值、P值、下限、上限、观测数、国家数，
+    每个窗口每个变量一行；自由度不足或设计矩阵奇异的窗口系数为缺失。
+    """
+    _check_cov_type(cov_type, cluster)
+    exog = list(exog)
+    _, entity_codes, entity_levels, time_codes, time_levels, values = \
+        _prepare_sample(data, dependent, exog, entity, time)
+    years = np.asarray(time_levels, dtype='int64')
+    first, last = int(years.min()), int(years.max())
+    if window < 1 or window > last - first + 1:
+        raise ValueError(f"window 须在 1 到样本年数 {last - first + 1} 之间，收到: {window}")
+
+    # 行按年份排序：每个窗口内的行是连续的一段；减去全样本均值不改变组内结果，只是减小叉积的数值误差
+    order = np.argsort(time_codes, kind='stable')
+    z = values[order] - values.mean(axis=0)
+    entity_codes = entity_codes[order]
+    year_of_row = years[time_codes[order]]
+    n_entities, p = len(entity_levels), z.shape[1]
+    bounds = np.searchsorted(year_of_row, np.arange(first, last + 2))
+
+    if expanding:
+        windows = [(first, end) for end in range(first + window - 1, last + 1)]
+    else:
+        windows = [(start, start + window - 1) for start in range(first, last - window + 2)]
+
+    gram = np.zeros((p, p))
+    sums = np.zeros((n_entities, p))
+    counts = np.zeros(n_entities)
+
+    def update(year, sign):
+        rows = slice(bounds[year - first], bounds[year - first + 1])
+        block, codes = z[rows], entity_codes[rows]
+        gram[...] += sign * (block.T @ block)
+        # 同一年份内每个国家至多一行，可直接按编码累加
+        sums[codes] += sign * block
+        counts[codes] += sign
+
+    records = []
+    lo, hi = first, first - 1
+    q_level = 0.5 + level / 2
+    for start, end in windows:
+        for year in range(hi + 1, end + 1):
+            update(year, 1)
+        for year in range(lo, start):
+            update(year, -1)
+        lo, hi = start, end
+        rows = slice(bounds[start - first], bounds[end - first + 1])
+        fit = _window_fit(gram, sums, counts, z[rows], entity_codes[rows], year_of_row[rows] - start,
+                          end - start + 1, time_effects, cov_type, cluster, bandwidth)
+        beta, se, nobs, df_resid, n_active = fit
+        q = stats.t.ppf(q_level, df_resid) if df_resid > 0 else np.nan
+        for j, name in enumerate(exog):
+            records.append((start, end, name, beta[j], se[j], nobs, n_active, df_resid, q))
+
+    path = pd.DataFrame(records, columns=['起始年份', '结束年份', '变量', '系数', '标准误', '观测数', '国家数',
+                                          '残差自由度', '_q'])
+    tstats = path['系数'] / path['标准误']
+    path.insert(5, 't值', tstats)
+    path.insert(6, 'P值', 2 * stats.t.sf(np.abs(tstats), path['残差自由度']))
+    path.insert(7, '下限', path['系数'] - path['_q'] * path['标准误'])
+    path.insert(8, '上限', path['系数'] + path['_q'] * path['标准误'])
+    return path.drop(columns=['残差自由度', '_q'])
+
+
+def _window_fit(gram, sums, counts, z, entity_codes, year_codes, n_years, time_effects, cov_type, cluster, bandwidth):
+    """
+    由窗口的充分统计量求解一个窗口：返回 (系数, 标准误, 观测数, 残差自由度, 国家数)。
+    z、entity_codes、year_codes 为窗口内的行（年份编码为相对窗口起点的偏移），只在需要逐观测得分时使用。
+    """
+    k = gram.shape[0] - 1
+    nan = np.full(k, np.nan)
+    active = counts > 0
+    n_active = int(active.sum())
+    means = np.zeros_like(sums)
+    means[active] = sums[active] / counts[active, None]
+    # 按国家去均值后的叉积
+    within = gram - sums[active].T @ means[active]
+
+    nobs = len(z)
+    df_absorbed = n_active
+    row_means = means[entity_codes]
+    if time_effects:
+        present = np.bincount(year_codes, minlength=n_years) > 0
+        # 年份虚拟变量去掉窗口内第一个有观测的年份作为基准
+        dummy_years = np.flatnonzero(present)[1:]
+        incidence = np.zeros((len(sums), n_years))
+        incidence[entity_codes, year_codes] = 1
+        incidence = incidence[:, dummy_years]
+        inv_counts = np.where(active, 1 / np.maximum(counts, 1), 0)
+        dd = np.diag(incidence.sum(axis=0)) - incidence.T @ (incidence * inv_counts[:, None])
+        year_sums = np.column_stack([np.bincount(year_codes, weights=col, minlength=n_years)
+                                     for col in (z - row_means).T])
+        dz = year_sums[dummy_years]
+        df_absorbed += len(dummy_years)
+        try:
+            gamma = np.linalg.solve(dd, dz)
+        except np.linalg.LinAlgError:
+            return nan, nan, nobs, nobs - k - df_absorbed, n_active
+        within = within - dz.T @ gamma
+
+    df_resid = nobs - k - df_absorbed
+    if df_resid <= 0:
+        return nan, nan, nobs, df_resid, n_active
+    try:
+        bread = np.linalg.inv(within[1:, 1:])
+    except np.linalg.LinAlgError:
+        return nan, nan, nobs, df_resid, n_active
+    beta = bread @ within[1:, 0]
+
+    if cov_type == 'unadjusted':
+        ssr = within[0, 0] - beta @ within[1:, 0]
+        return beta, np.sqrt(np.diag(bread) * ssr / df_resid), nobs, df_resid, n_active
+
+    # 逐观测的 FWL 残差化数据：按国家去均值，再减去年份虚拟变量（同样按国家去均值）的拟合部分
+    resid_z = z - row_means
+    if time_effects:
+        fitted = np.zeros((n_years, gamma.shape[1]))
+        fitted[dummy_years] = gamma
+        entity_fitted = np.column_stack([np.bincount(entity_codes, weights=col, minlength=len(sums))
+                                         for col in fitted[year_codes].T]) * inv_counts[:, None]
+        resid_z = resid_z - fitted[year_codes] + entity_fitted[entity_codes]
+    x = resid_z[:, 1:]
+    resids = resid_z[:, 0] - x @ beta
+    groups = _cov_groups(cov_type, cluster, _dense(entity_codes), _dense(year_codes))
+    # 窗口内总是按国家吸收；只有国家效应且按国家聚类时不扣除这些自由度（见 _nested_df）
+    nested = _nested_df(cov_type, cluster, True, time_effects, n_active, 0)
+    cov = _covariance(x, resids, bread, df_resid + nested, cov_type, groups, bandwidth)
+    return beta, np.sqrt(np.diag(cov)), nobs, df_resid, n_active
+
+
+def _dense(codes):
+    """把窗口内出现的编码压缩为 0 起始的连续整数（聚类数按窗口内实际出现的组计算）。"""
+    return np.unique(codes, return_inverse=True)[1].ravel()
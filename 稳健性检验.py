@@ -1,8 +1,10 @@
-# 引入FDI的滞后变量
-data['FDI_lag'] = data.groupby('Country')['FDI'].shift(1)
+# 引入FDI的滞后变量：按实际年份对齐，上一年不在数据中时滞后为缺失，而不是取同一国家的上一条记录
+from 面板特征 import panel_features
+lag_data, _ = panel_features(data, ['FDI'], lags=[1])
+lag_data = lag_data.rename(columns={'FDI_lag1': 'FDI_lag'})
 
 # 固定效应回归，包含滞后变量
-fixed_effect_lag_model = PanelOLS.from_formula('GWG ~ FDI_lag + GDP_per_capita + Total_average_wage + HDI + Fertility + EntityEffects', data)
+fixed_effect_lag_model = PanelOLS.from_formula('GWG ~ FDI_lag + GDP_per_capita + Total_average_wage + HDI + Fertility + EntityEffects', lag_data)
 fixed_effect_lag_result = fixed_effect_lag_model.fit()
 
 # 输出结果
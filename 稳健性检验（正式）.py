@@ -1,72 +1,42 @@
 import pandas as pd
-import statsmodels.formula.api as smf
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-def read_and_melt(file_path, var_name):
-    """
-    读取Excel文件，假设第一行为国家名称，第一列为年份（作为索引），
-    然后将宽格式转换成长格式（包含Year, Country, var_name）
-    """
-    # 使用 header=0 和 index_col=0 读取文件
-    df = pd.read_excel(file_path, header=0, index_col=0)
-    df.index.name = 'Year'
-    # 重置索引，将 Year 变为普通列
-    df = df.reset_index()
-    # 去除列名和数据中的空格
-    df.columns = df.columns.str.strip()
-    df['Year'] = df['Year'].astype(str).str.strip()
-    # 转换成长格式
-    df_long = df.melt(id_vars='Year', var_name='Country', value_name=var_name)
-    df_long['Country'] = df_long['Country'].astype(str).str.strip()
-    # 将 Year 转换为数值型
-    df_long['Year'] = pd.to_numeric(df_long['Year'], errors='coerce')
-    return df_long
-
-# 读取各个文件（请根据实际路径修改）
-df_gwg  = read_and_melt(r"D:\GWG(2).xlsx", 'GWG')
-df_fdi  = read_and_melt(r"D:\FDI_STOCK.xlsx", 'FDI')
-df_gdp  = read_and_melt(r"D:\GDP_per_Capita(1).xlsx", 'GDP_PC')
-df_inc  = read_and_melt(r"D:\Total Average Wage(1).xlsx", 'TAW')
-df_hdi  = read_and_melt(r"D:\HDI(1).xlsx", 'HDI')
-df_fert = read_and_melt(r"D:\Fertility_Rate(1).xlsx", 'FERT')
-df_unemp = read_and_melt(r"D:\FEM_UNEMP(1).xlsx", 'FEM_UNEMP')
-
-# 依次合并各数据集（以 Year 和 Country 为键）
-df_panel = df_gwg.merge(df_fdi, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.merge(df_gdp, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.merge(df_inc, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.merge(df_hdi, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.merge(df_fert, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.merge(df_unemp, on=['Year', 'Country'], how='outer')
-df_panel = df_panel.sort_values(['Country', 'Year'])
-
-print("合并后的面板数据预览:")
-print(df_panel.head(10))
-
-# 检查缺失情况
-numeric_vars = ['GWG', 'FDI', 'GDP_PC', 'TAW', 'HDI', 'FERT', 'FEM_UNEMP']
-print("缺失统计:")
-print(df_panel[numeric_vars].isnull().sum())
-
-# 缺失值处理：按 Country 分组对每个数值变量进行线性插值，然后前向填充和后向填充
-df_panel_filled = df_panel.copy()
-
-for var in numeric_vars:
-    # 使用 transform 保证输出与原始 DataFrame 索引对齐
-    df_panel_filled[var] = df_panel_filled.groupby('Country')[var].transform(lambda group: group.interpolate(method='linear'))
-    df_panel_filled[var] = df_panel_filled.groupby('Country')[var].transform(lambda group: group.ffill().bfill())
-
-# 创建FDI的一年滞后变量
-df_panel_filled['FDI_LAG1'] = df_panel_filled.groupby('Country')['FDI'].shift(1)
-
-# 处理滞后变量可能产生的缺失值
-df_panel_filled['FDI_LAG1'] = df_panel_filled.groupby('Country')['FDI_LAG1'].transform(lambda group: group.interpolate(method='linear'))
-df_panel_filled['FDI_LAG1'] = df_panel_filled.groupby('Country')['FDI_LAG1'].transform(lambda group: group.ffill().bfill())
-
-print("缺失值处理后的数据预览(包含FDI滞后变量):")
+from 固定效应估计 import fit_absorbed_ols, std_error_table
+from 性能记录 import stage
+from 面板特征 import panel_features
+from 面板缓存 import load_panel
+from 设定曲线 import specification_curve
+
+
+# 各变量对应的文件（请根据实际路径修改）
+sources = {
+    'GWG': r"D:\GWG(2).xlsx",
+    'FDI': r"D:\FDI_STOCK.xlsx",
+    'GDP_PC': r"D:\GDP_per_Capita(1).xlsx",
+    'TAW': r"D:\Total Average Wage(1).xlsx",
+    'HDI': r"D:\HDI(1).xlsx",
+    'FERT': r"D:\Fertility_Rate(1).xlsx",
+    'FEM_UNEMP': r"D:\FEM_UNEMP(1).xlsx",
+}
+numeric_vars = list(sources)
+
+# 以 Year 和 Country 为键外连接，按 Country 分组线性插值，然后前向填充和后向填充；
+# 源文件未变化时直接读取磁盘缓存
+# 设置环境变量 GWG_TRACE=阶段记录.json 运行时，各阶段的耗时和内存会写入该文件并在结束时汇总
+with stage('读取面板') as s:
+    df_panel_filled = s.set_shape(load_panel(sources, how='outer', fill=True))
+
+# 创建FDI的一年滞后变量：按实际年份对齐，上一年不在面板中时滞后为缺失，不再按行位移；
+# 各国第一年没有滞后值，回归时自然剔除，不再插值或后向填充（那样会把当年的 FDI 当作滞后值）
+with stage('构造滞后变量') as s:
+    df_panel_filled, lag_gaps = s.set_shape(panel_features(df_panel_filled, ['FDI'], lags=[1]))
+df_panel_filled = df_panel_filled.rename(columns={'FDI_lag1': 'FDI_LAG1'})
+print("因年份缺口而缺失的滞后值:", lag_gaps['FDI_lag1'])
+
+print("数据预览(包含FDI滞后变量):")
 print(df_panel_filled.head(10))
-print("处理后缺失统计:")
+print("缺失统计（FDI_LAG1 的缺失主要为各国第一年）:")
 print(df_panel_filled[numeric_vars + ['FDI_LAG1']].isnull().sum())
 
 # 检查 Country 与 Year 的唯一值
@@ -74,15 +44,40 @@ print("Unique Countries:", df_panel_filled['Country'].unique())
 print("Unique Years:", df_panel_filled['Year'].unique())
 
 # 相关性分析
-correlation_matrix = df_panel_filled[numeric_vars + ['FDI_LAG1']].corr()
+with stage('相关性分析'):
+    correlation_matrix = df_panel_filled[numeric_vars + ['FDI_LAG1']].corr()
 print("\n相关性矩阵:")
 print(correlation_matrix)
 
 
 # 构建使用FDI滞后变量的回归模型
-formula_lag = 'GWG ~ FDI_LAG1 + GDP_PC + TAW + HDI + FERT + FEM_UNEMP + C(Country) + C(Year)'
-model_lag = smf.ols(formula=formula_lag, data=df_panel_filled).fit()
+# GWG ~ FDI_LAG1 + GDP_PC + TAW + HDI + FERT + FEM_UNEMP + 国家、年份固定效应（组内变换吸收）
+with stage('滞后模型拟合') as s:
+    model_lag = s.set_shape(fit_absorbed_ols(df_panel_filled, 'GWG', ['FDI_LAG1', 'GDP_PC', 'TAW', 'HDI', 'FERT',
+                                                                     'FEM_UNEMP']))
 
 print("\nFDI滞后一年的回归模型结果摘要:")
-print(model_lag.summary())
-
+print(model_lag.summary)
+
+# 同一次拟合在不同协方差下的标准误：稳健、按国家聚类、国家和年份双向聚类、Driscoll-Kraay，无需重新拟合
+print("\nFDI滞后一年的回归模型在不同协方差下的标准误:")
+with stage('多种协方差标准误'):
+    se_table = std_error_table(model_lag)
+print(se_table.to_string(float_format=lambda v: f'{v:.4f}'))
+
+
+# 设定曲线：FDI 当期与滞后一期 × 控制变量的全部子集 × 国家/双向固定效应 × 全样本与 2005 年及以后，
+# 共 2 × 32 × 2 × 2 = 256 个设定，全部按国家聚类；每个设定只在共用的叉积矩阵上解一个小方程组
+with stage('设定曲线') as s:
+    curve = s.set_shape(specification_curve(df_panel_filled, ['GWG'], ['FDI', 'FDI_LAG1'],
+                                            ['GDP_PC', 'TAW', 'HDI', 'FERT', 'FEM_UNEMP'],
+                                            effects=('entity', 'both'),
+                                            samples={'全样本': None, '2005年及以后': lambda d: d['Year'] >= 2005},
+                                            cov_type='clustered'))
+print(f"\n设定曲线：共 {len(curve)} 个设定，协方差类型 {curve.attrs['协方差类型']}")
+print(curve.groupby('处理变量')['系数'].describe().to_string(float_format=lambda v: f'{v:.4f}'))
+significant = curve['P值'] < 0.05
+print("5% 水平下显著为正的设定占比:", f"{(significant & (curve['系数'] > 0)).mean():.2%}")
+print("5% 水平下显著为负的设定占比:", f"{(significant & (curve['系数'] < 0)).mean():.2%}")
+with stage('保存Excel'):
+    curve.sort_values('系数').to_excel(r'D:\PythonProject\203\203正式\设定曲线结果.xlsx', index=False)
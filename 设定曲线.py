@@ -0,0 +1,196 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import scipy.linalg
+import scipy.stats as stats
+
+from 中介效应 import _cluster_blocks
+from 固定效应估计 import _check_cov_type, _cov_label, _covariance, _nested_df, _score_meat, within_transform
+from 面板结构 import PanelFrame
+
+# 固定效应结构：键与 fit_fe_family 的结果键一致
+EFFECTS = {'pooled': '无', 'entity': '国家', 'time': '年份', 'both': '国家和年份'}
+# 解释变量叉积矩阵单位化对角元后 Cholesky 主元平方（即 1 - 该列对前面各列的 R²）的下限，低于它视为共线
+_PIVOT_TOL = 1e-10
+# 组内变换后范数相对原始范数小于此值的变量视为被固定效应吸收，与 check_collinearity 的 tol 相同
+_ABSORBED_TOL = 1e-8
+
+
+def specification_curve(data, outcomes, treatments, controls=(), control_sets=None, effects=('entity', 'both'),
+                        samples=None, entity='Country', time='Year', cov_type='clustered', cluster='entity',
+                        bandwidth=None, level=0.95):
+    """
+    设定曲线（multiverse）分析：对 结果变量 × 处理变量 × 控制变量组合 × 固定效应结构 × 样本 的全部组合逐一估计，
+    返回处理变量系数的整洁表，每行一个设定，可直接用于画设定曲线。
+
+      - outcomes：结果变量列表，如 ['GWG']
+      - treatments：处理变量列表，如 ['FDI', 'FDI_STOCK', 'FDI_lag1']（滞后等先用 panel_features 构造）
+      - controls / control_sets：control_sets 为显式的控制变量组合列表；为 None 时取 controls 的全部子集（含空集）
+      - effects：固定效应结构，取 EFFECTS 的键（'pooled' 不吸收固定效应并加入常数项）
+      - samples：{样本名: 布尔掩码或 data -> 掩码的函数}，None 时只用全样本；data 为 PanelFrame 时函数收到
+        data.to_frame() 的长格式 DataFrame（行顺序与面板相同），如 lambda d: d['Year'] >= 2010
+    每个设定删除其自身所用变量缺失的行，点估计和标准误与对该设定单独调用 fit_absorbed_ols 相同。
+
+    计算方式（Frisch-Waugh-Lovell）：缺失模式相同的设定共用同一个样本，在该样本上把全部变量一次性做组内变换，
+    求出全部变量的叉积矩阵 Z'Z，以及聚类/Driscoll-Kraay 协方差所需的按组叉积块 Σ_g Z_g'Z_g。
+    之后每个设定只是从中取出子矩阵解一个 k×k 的方程组：β = (X'X)^{-1} X'y，
+    残差平方和 = y'y - β'X'y，组得分 X_g'e_g = X_g'y_g - X_g'X_g β，不再接触原始数据。
+    'robust' 和双向聚类需要逐观测得分，每个设定额外计算一次残差（O(nk)）。
+
+    返回的表包含 样本、固定效应、结果变量、处理变量、控制变量、控制变量数、系数、标准误、t值、P值、
+    置信区间、观测数、R²（有固定效应时为组内 R²）；解释变量被固定效应吸收或相互（近似）共线的设定系数为缺失。
+    """
+    _check_cov_type(cov_type, cluster)
+    unknown = [e for e in effects if e not in EFFECTS]
+    if unknown:
+        raise ValueError(f"effects 只能取 {tuple(EFFECTS)}，收到: {unknown}")
+    outcomes, treatments = list(outcomes), list(treatments)
+    if control_sets is None:
+        controls = list(controls)
+        control_sets = [subset for r in range(len(controls) + 1) for subset in combinations(controls, r)]
+    else:
+        control_sets = [tuple(subset) for subset in control_sets]
+    if samples is None:
+        samples = {'全样本': None}
+
+    variables = list(dict.fromkeys(outcomes + treatments + [c for subset in control_sets for c in subset]))
+    column = {name: j for j, name in enumerate(variables)}
+    if isinstance(data, PanelFrame):
+        entity_codes, time_codes = data.entity_codes, data.time_codes
+        values = data.values(variables)
+    else:
+        entity_codes = pd.factorize(data[entity])[0]
+        time_codes = pd.factorize(data[time], sort=True)[0]
+        values = data[variables].to_numpy(dtype='float64')
+    present = ~np.isnan(values)
+
+    # 样本函数按 DataFrame 的列名取国家、年份等，PanelFrame 只转换一次
+    frame = data.to_frame() if isinstance(data, PanelFrame) and any(map(callable, samples.values())) else data
+    blocks_by_mask = {}
+    rows = []
+    for sample_name, sample in samples.items():
+        base = np.ones(len(values), dtype=bool) if sample is None else \
+            np.asarray(sample(frame) if callable(sample) else sample, dtype=bool)
+        for effect in effects:
+            for outcome in outcomes:
+                for treatment in treatments:
+                    for subset in control_sets:
+                        if treatment in subset or outcome == treatment or outcome in subset:
+                            continue
+                        spec = [column[v] for v in (outcome, treatment) + subset]
+                        mask = base & present[:, spec].all(axis=1)
+                        key = (effect, np.packbits(mask).tobytes())
+                        if key not in blocks_by_mask:
+                            blocks_by_mask[key] = _SpecBlock(values, present, mask, entity_codes, time_codes,
+                                                             effect, cov_type, cluster, bandwidth)
+                        estimate = blocks_by_mask[key].fit(spec)
+                        rows.append((sample_name, EFFECTS[effect], outcome, treatment,
+                                     '、'.join(subset) if subset else '无', len(subset)) + estimate)
+
+    table = pd.DataFrame(rows, columns=['样本', '固定效应', '结果变量', '处理变量', '控制变量', '控制变量数',
+                                        '系数', '标准误', '观测数', '残差自由度', 'R²'])
+    df_resid = table['残差自由度'].to_numpy(dtype='float64')
+    tstats = table['系数'] / table['标准误']
+    q = stats.t.ppf(0.5 + level / 2, df_resid)
+    table.insert(8, 't值', tstats)
+    table.insert(9, 'P值', 2 * stats.t.sf(np.abs(tstats), df_resid))
+    table.insert(10, '下限', table['系数'] - q * table['标准误'])
+    table.insert(11, '上限', table['系数'] + q * table['标准误'])
+    table.attrs.update({'协方差类型': _cov_label(cov_type, cluster, bandwidth), '样本块数': len(blocks_by_mask)})
+    return table
+
+
+class _SpecBlock:
+    """
+    一个 (固定效应结构, 样本) 上的充分统计量：组内变换后全部变量的叉积矩阵，以及协方差所需的按组叉积块。
+    只包含在该样本上无缺失的变量；fit 按变量列号取子矩阵求解一个设定。
+    """
+
+    def __init__(self, values, present, mask, entity_codes, time_codes, effect, cov_type, cluster, bandwidth):
+        self.columns = np.flatnonzero(present[mask].all(axis=0))
+        self.position = np.full(values.shape[1], -1)
+        self.position[self.columns] = np.arange(len(self.columns))
+        z = values[mask][:, self.columns]
+        raw_norms = np.linalg.norm(z, axis=0)
+        entity_codes = np.unique(entity_codes[mask], return_inverse=True)[1].ravel()
+        time_codes = np.unique(time_codes[mask], return_inverse=True)[1].ravel()
+        self.nobs = len(z)
+        n_entities = entity_codes.max() + 1 if self.nobs else 0
+        n_times = time_codes.max() + 1 if self.nobs else 0
+
+        self.pooled = effect == 'pooled'
+        if self.pooled:
+            # 混合 OLS：常数项放在最后一列
+            z = np.column_stack([z, np.ones(self.nobs)])
+            raw_norms = np.r_[raw_norms, np.sqrt(self.nobs)]
+            self.df_absorbed = 0
+        else:
+            absorb_entity, absorb_time = effect in ('entity', 'both'), effect in ('time', 'both')
+            z = within_transform(z, entity_codes if absorb_entity else None, time_codes if absorb_time else None)
+            self.df_absorbed = (n_entities if absorb_entity else 0) + (n_times if absorb_time else 0) - \
+                (1 if absorb_entity and absorb_time else 0)
+        # 协方差的残差自由度加回嵌套在聚类中的固定效应（见 _nested_df）
+        self.nested = 0 if self.pooled else _nested_df(cov_type, cluster, absorb_entity, absorb_time, n_entities,
+                                                       n_times)
+        self.gram = z.T @ z
+        # 组内变换后只剩舍入误差的变量（如不随时间变化的国家特征）
+        self.absorbed = np.sqrt(np.diag(self.gram)) <= _ABSORBED_TOL * np.maximum(raw_norms, 1.0)
+
+        self.cov_type, self.bandwidth = cov_type, bandwidth
+        self.blocks = self.z = self.groups = None
+        if cov_type == 'driscoll-kraay' or (cov_type == 'clustered' and cluster != 'both'):
+            groups = entity_codes if cov_type == 'clustered' and cluster == 'entity' else time_codes
+            self.blocks = _cluster_blocks(z, groups, groups.max() + 1)
+            self.groups = np.arange(len(self.blocks))
+        elif cov_type != 'unadjusted':
+            # 稳健（HC1）与双向聚类需要逐观测得分，保留变换后的数据
+            self.z = z
+            self.groups = (entity_codes, time_codes) if cov_type == 'clustered' else None
+
+    def fit(self, spec):
+        """spec 为 [结果变量, 处理变量, 控制变量...] 的列号；返回 (系数, 标准误, 观测数, 残差自由度, R²)。"""
+        y, *x = self.position[spec]
+        if self.pooled:
+            x.append(len(self.columns))
+        df_resid = self.nobs - len(x) - self.df_absorbed
+        xy = self.gram[x, y]
+        bread = self._bread(x)
+        if bread is None:
+            return np.nan, np.nan, self.nobs, df_resid, np.nan
+        beta = bread @ xy
+        ssr = self.gram[y, y] - beta @ xy
+        tss = self.gram[y, y]
+        if self.pooled:
+            tss -= self.gram[y, -1] ** 2 / self.nobs
+
+        if self.cov_type == 'unadjusted':
+            variance = bread[0, 0] * ssr / df_resid
+        elif self.blocks is not None:
+            # 组得分 X_g'e_g = X_g'y_g - X_g'X_g β，全部由叉积块得到
+            scores = self.blocks[:, x, y] - self.blocks[:, x][:, :, x] @ beta
+            meat = _score_meat(scores, df_resid + self.nested, self.cov_type, self.groups, self.bandwidth,
+                               nobs=self.nobs)
+            variance = bread[0] @ meat @ bread[0]
+        else:
+            design = self.z[:, x]
+            resids = self.z[:, y] - design @ beta
+            variance = _covariance(design, resids, bread, df_resid + self.nested, self.cov_type, self.groups)[0, 0]
+        return beta[0], np.sqrt(variance), self.nobs, df_resid, 1 - ssr / tss
+
+    def _bread(self, x):
+        """
+        (X'X)^{-1}：对角元单位化后做 Cholesky 分解，主元低于 _PIVOT_TOL 或有变量被固定效应吸收时
+        视为不可识别，返回 None。np.linalg.inv 只在矩阵恰好奇异时报错，近似共线时会给出巨大而无意义的系数。
+        """
+        if self.absorbed[x].any():
+            return None
+        xx = self.gram[np.ix_(x, x)]
+        scale = np.sqrt(np.diag(xx))
+        try:
+            chol = np.linalg.cholesky(xx / np.outer(scale, scale))
+        except np.linalg.LinAlgError:
+            return None
+        if np.diag(chol).min() ** 2 <= _PIVOT_TOL:
+            return None
+        return scipy.linalg.cho_solve((chol, True), np.eye(len(x))) / np.outer(scale, scale)
@@ -0,0 +1,308 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from 固定效应估计 import _group_sum, _nested_df, _prepare_sample, _with_const, fit_absorbed_ols, within_transform
+from 工具变量估计 import _partial_out, fit_absorbed_iv
+
+# Webb 六点分布：±√(1/2)、±1、±√(3/2) 各占 1/6，聚类很少时比 Rademacher 有更多不同的抽样组合
+WEBB_POINTS = np.array([-np.sqrt(1.5), -1.0, -np.sqrt(0.5), np.sqrt(0.5), 1.0, np.sqrt(1.5)])
+WEIGHT_TYPES = ('rademacher', 'webb')
+# 每个线程一次处理的自助次数，决定中间数组（聚类数 × 次数）的大小
+_CHUNK = 4096
+
+
+def wild_cluster_bootstrap(data, dependent, exog, endog=(), instruments=(), variables=None, null=0.0,
+                           weights='rademacher', n_boot=9999, level=0.95, ci=True, entity='Country', time='Year',
+                           entity_effects=True, time_effects=True, cluster='entity', n_jobs=None, seed=0):
+    """
+    吸收固定效应的 OLS 或 2SLS 系数的野聚类限制性自助（wild cluster restricted bootstrap, WCR）检验。
+    聚类数很少（如约 20 个国家）时，聚类稳健标准误的 t 检验明显过度拒绝，自助 P 值更可靠。
+
+      - endog 为空时检验 fit_absorbed_ols 的系数；否则检验 fit_absorbed_iv 中唯一内生变量的系数
+        （WRE：结构方程和第一阶段同时施加原假设后生成自助样本，Davidson-MacKinnon）
+      - variables：要检验的系数，默认为全部解释变量（OLS）或内生变量（IV）；null 为原假设下的取值
+      - weights：'rademacher'（±1）或 'webb'（六点分布）；Rademacher 权重在 2^G 不超过 n_boot 时
+        改为枚举全部 2^G 种组合，P 值是精确的
+      - cluster：'entity' 或 'time'，每个聚类共用一个权重
+      - ci=True 时反解检验得到置信区间：自助 P 值恰好等于 1 - level 的原假设取值，全部取值共用同一组权重；
+        弱工具变量下区间可能在一侧或两侧无界（为 ±inf）
+      - n_jobs：计算自助统计量的线程数（NumPy 矩阵运算释放 GIL）；结果与线程数无关
+    固定效应先用组内变换吸收，自助样本在变换后的数据上生成；t 统计量使用与 cov_type='clustered' 相同的
+    CR1 小样本校正，因此原始 t 值与 fit_absorbed_ols/fit_absorbed_iv 的聚类 t 值相同。
+    每次自助的 t* 与把自助样本重新代入 fit_absorbed_ols/fit_absorbed_iv 拟合（重新估计控制变量和固定效应）的结果相同：
+    v∘ũ 不再与控制变量及不嵌套在聚类中的固定效应正交，重新拟合会把它们投影掉，聚类得分随之改变，
+    这部分同样只通过聚类层面的小矩阵计算（见 _Nuisance）。
+
+    计算方式：原假设下自助样本是权重 v 的线性函数，每个聚类的得分只依赖若干聚类层面的小矩阵。
+      - OLS：记 A = (X'X)^{-1}、a 为 A 的第 j 列、S_g = X_g'ũ_g（ũ 为限制性残差）、H_g = X_g'X_g，
+        则 β*_j - r = c'v，c_g = a'S_g；各聚类得分 = c ∘ v - M v，M = (H_g a)' A S' 加上重新吸收
+        不嵌套的固定效应带来的 G×G 修正项，一次自助只是 G 维向量与 G×G 矩阵相乘，不再接触原始数据
+      - IV：Z_g'X*_g = Z_g'Z_g π̃ + v_g Z_g'ṽ_g、Z_g'u*_g = v_g Z_g'ũ_g，再减去控制变量和不嵌套的固定效应
+        对 v∘ṽ、v∘ũ 的投影，2SLS 系数及其聚类得分都由这些 G×L 的块按权重组合得到
+    因此 99,999 次自助只需数秒；ũ 随原假设取值线性变化，反解置信区间时每个候选值也只需重算这些小矩阵。
+
+    返回以变量为索引的表：系数、聚类标准误、t值、原假设、自助P值、自助CI下限、自助CI上限；
+    attrs 中记录聚类数、观测数、自助次数、权重和置信水平。
+    """
+    if weights not in WEIGHT_TYPES:
+        raise ValueError(f"weights 只能为 {WEIGHT_TYPES} 之一，收到: {weights!r}")
+    if cluster not in ('entity', 'time'):
+        raise ValueError(f"cluster 只能为 'entity' 或 'time'，收到: {cluster!r}")
+    exog, endog, instruments = list(exog), list(endog), list(instruments)
+    if len(endog) > 1:
+        raise ValueError(f"工具变量估计的自助检验只支持一个内生变量，收到: {endog}")
+
+    options = dict(entity=entity, time=time, entity_effects=entity_effects, time_effects=time_effects,
+                   cov_type='clustered', cluster=cluster)
+    if endog:
+        fit = fit_absorbed_iv(data, dependent, exog, endog, instruments, **options)
+        variables = list(endog) if variables is None else list(variables)
+        if variables != endog:
+            raise ValueError(f"工具变量估计只能检验内生变量 {endog} 的系数，收到: {variables}")
+    else:
+        fit = fit_absorbed_ols(data, dependent, exog, **options)
+        variables = [v for v in fit.params.index if v != 'const'] if variables is None else list(variables)
+    unknown = [v for v in variables if v not in fit.params.index]
+    if unknown:
+        raise KeyError(f"模型中没有这些系数（可能因共线性被剔除）: {unknown}")
+
+    # 与拟合相同的样本和组内变换；之后只取拟合中保留的列（因共线性剔除的列不参与）
+    used = exog + endog + instruments
+    _, entity_codes, _, time_codes, _, values = _prepare_sample(data, dependent, used, entity, time)
+    if entity_effects or time_effects:
+        values = within_transform(values, entity_codes if entity_effects else None,
+                                  time_codes if time_effects else None)
+    else:
+        values = _with_const(values)
+        used = ['const'] + used
+    column = {name: j + 1 for j, name in enumerate(used)}
+    take = lambda cols: values[:, [column[c] for c in cols]]
+    y = values[:, 0]
+    codes = entity_codes if cluster == 'entity' else time_codes
+    n_clusters = int(codes.max()) + 1
+    # 与聚类同一维度的固定效应嵌套在聚类中；另一维度的固定效应在重新拟合时需要投影掉
+    nested, crossed = (entity_effects, time_codes if time_effects else None) if cluster == 'entity' else \
+        (time_effects, entity_codes if entity_effects else None)
+    # 与 _score_meat 的聚类校正相同：G/(G-1)·(n-1)/残差自由度，残差自由度加回嵌套在聚类中的固定效应
+    df_resid = fit.df_resid + _nested_df('clustered', cluster, entity_effects, time_effects, fit.n_entities,
+                                         fit.n_times)
+    scale = n_clusters / (n_clusters - 1) * (fit.nobs - 1) / df_resid
+
+    draws = _draw_weights(weights, n_clusters, n_boot, seed)
+    chunks = [draws[:, i:i + _CHUNK] for i in range(0, draws.shape[1], _CHUNK)]
+
+    rows = []
+    for name in variables:
+        if endog:
+            w = take([c for c in fit.params.index if c not in endog])
+            partialled = _partial_out(w, np.column_stack([y, take(endog), take(instruments)]))
+            nuisance = _Nuisance(codes, n_clusters, nested, crossed, w)
+            stat = _IVStatistic(partialled[:, 0], partialled[:, 1], partialled[:, 2:], codes, n_clusters, scale,
+                                nuisance)
+        else:
+            nuisance = _Nuisance(codes, n_clusters, nested, crossed)
+            stat = _OLSStatistic(y, take(list(fit.params.index)), list(fit.params.index).index(name), codes,
+                                 n_clusters, scale, nuisance)
+        p_value = _p_value(stat, null, chunks, n_jobs)
+        se = fit.std_errors[name]
+        lower = upper = np.nan
+        if ci:
+            lower, upper = (_invert(stat, fit.params[name], se, side, 1 - level, chunks, n_jobs)
+                            for side in (-1, 1))
+        rows.append({'变量': name, '系数': fit.params[name], '聚类标准误': se, 't值': (fit.params[name] - null) / se,
+                     '原假设': null, '自助P值': p_value, '自助CI下限': lower, '自助CI上限': upper})
+
+    table = pd.DataFrame(rows).set_index('变量')
+    table.attrs.update({'聚类数': n_clusters, '观测数': fit.nobs, '自助次数': draws.shape[1], '权重': weights,
+                        '聚类': cluster, '置信水平': level})
+    return table
+
+
+def _draw_weights(kind, n_clusters, n_boot, seed):
+    """聚类数 × 自助次数的权重矩阵；Rademacher 权重在 2^G ≤ n_boot 时枚举全部组合（不含全为 1 的原始样本）。"""
+    if kind == 'rademacher' and n_clusters < 63 and 2 ** n_clusters <= n_boot:
+        combos = np.arange(1, 2 ** n_clusters)
+        return 1.0 - 2.0 * ((combos[None, :] >> np.arange(n_clusters)[:, None]) & 1)
+    rng = np.random.default_rng(seed)
+    if kind == 'rademacher':
+        return 2.0 * rng.integers(0, 2, size=(n_clusters, n_boot)) - 1.0
+    return WEBB_POINTS[rng.integers(0, len(WEBB_POINTS), size=(n_clusters, n_boot))]
+
+
+class _Nuisance:
+    """
+    重新拟合自助样本时被投影掉、但 v∘a 不与之正交的变量 N：不嵌套在聚类中的固定效应的虚拟变量
+    （已按嵌套的固定效应去均值）以及控制变量 w。重新拟合的残差中含 M_N(v∘a)，
+    于是 Q_g'(M_N(v∘a))_g = v_g Q_g'a_g - (Q_g'N_g) (N'N)⁺ Σ_h v_h N_h'a_h。
+    Q、a 都已吸收全部固定效应，嵌套的固定效应在每个聚类内部作用，Q_g'N_g 与 N_h'a_h 可以直接用
+    未去均值的虚拟变量按 (聚类, 水平) 汇总，不生成 n × 水平数 的虚拟变量矩阵。
+    嵌套的固定效应不需要处理：聚类内 v 为常数，v∘a 仍与它们正交。
+    """
+
+    def __init__(self, codes, n_clusters, nested, crossed, w=None):
+        self.codes, self.n_clusters, self.crossed = codes, n_clusters, crossed
+        self.w = np.empty((len(codes), 0)) if w is None else w
+        blocks = [[self.w.T @ self.w]]
+        if crossed is not None:
+            n_levels = int(crossed.max()) + 1
+            self.n_levels = n_levels
+            counts = np.bincount(crossed, minlength=n_levels).astype('float64')
+            dd = np.diag(counts)
+            if nested:
+                # 虚拟变量按嵌套维度（即聚类）去均值后的叉积：D'D - C' diag(1/n_g) C，C 为 聚类 × 水平 的计数
+                cells = np.bincount(codes * n_levels + crossed, minlength=n_clusters * n_levels)
+                cells = cells.reshape(n_clusters, n_levels).astype('float64')
+                dd -= cells.T @ (cells / np.maximum(cells.sum(axis=1), 1)[:, None])
+            # w 已吸收全部固定效应，与去均值前后的虚拟变量的叉积相同
+            dw = _group_sum(self.w, crossed) if self.w.shape[1] else np.empty((n_levels, 0))
+            blocks = [[dd, dw], [dw.T, self.w.T @ self.w]]
+        gram = np.block(blocks)
+        self.size = len(gram)
+        if self.size:
+            # 虚拟变量与控制变量的量纲相差悬殊，先单位化对角元再求伪逆；去均值后的虚拟变量线性相关，秩不足是正常的
+            norm = np.sqrt(np.diag(gram))
+            norm[norm == 0] = 1.0
+            self.inverse = np.linalg.pinv(gram / np.outer(norm, norm), hermitian=True) / np.outer(norm, norm)
+
+    def cross(self, q):
+        """各聚类的 Q_g'N_g：q 为 (n, p) 数组，返回 G × p × 列数。"""
+        out = []
+        if self.crossed is not None:
+            cell = self.codes * self.n_levels + self.crossed
+            out.append(np.stack([np.bincount(cell, weights=q[:, k], minlength=self.n_clusters * self.n_levels)
+                                 .reshape(self.n_clusters, self.n_levels) for k in range(q.shape[1])], axis=1))
+        if self.w.shape[1]:
+            out.append(_group_sum((q[:, :, None] * self.w[:, None, :]).reshape(len(q), -1), self.codes)
+                       .reshape(self.n_clusters, q.shape[1], self.w.shape[1]))
+        return np.concatenate(out, axis=2) if out else np.zeros((self.n_clusters, q.shape[1], 0))
+
+    def projection(self, q, a):
+        """
+        投影修正的系数矩阵 K：G × p × G，使 Σ_h K[g, :, h] v_h = Q_g'(P_N(v∘a))_g，
+        q 为 (n, p) 数组，a 为 (n,) 数组。没有需要投影的变量时为 None。
+        """
+        if not self.size:
+            return None
+        left = np.einsum('gpk,kl->gpl', self.cross(q), self.inverse)
+        return np.einsum('gpl,hl->gph', left, self.cross(a[:, None])[:, 0, :])
+
+
+class _OLSStatistic:
+    """
+    OLS 系数 j 在原假设 β_j = r 下的自助 t 统计量。限制性残差 ũ(r) = ũ₀ - r x̃_j
+    （ũ₀、x̃_j 为 y、x_j 对其余解释变量回归的残差），因此 S(r)、c(r)、M(r) 都是 r 的线性函数，
+    聚类层面的矩阵只需在构造时计算一次。解释变量本身都在模型中，只有不嵌套的固定效应需要投影（nuisance）。
+    """
+
+    def __init__(self, y, x, j, codes, n_clusters, scale, nuisance):
+        bread = np.linalg.inv(x.T @ x)
+        a = bread[:, j]
+        rest = np.delete(x, j, axis=1)
+        u0 = _partial_out(rest, y[:, None])[:, 0]
+        x_j = _partial_out(rest, x[:, [j]])[:, 0]
+        # 每个聚类的 H_g a = X_g'(X_g a)，S_g = X_g'ũ_g 分为与 r 无关和与 r 成比例的两部分
+        q = _group_sum(x * (x @ a)[:, None], codes)
+        s0, s1 = _group_sum(x * u0[:, None], codes), _group_sum(x * x_j[:, None], codes)
+        self._c = (s0 @ a, s1 @ a)
+        self._m = (q @ bread @ s0.T, q @ bread @ s1.T)
+        k0, k1 = nuisance.projection(x, u0), nuisance.projection(x, x_j)
+        if k0 is not None:
+            # 聚类得分中减去 a'X_g'(P_N(v∘ũ))_g
+            self._m = (self._m[0] + np.einsum('p,gph->gh', a, k0), self._m[1] + np.einsum('p,gph->gh', a, k1))
+        self.scale = scale
+
+    def at(self, r):
+        """返回计算一组权重下 t 统计量的函数。"""
+        c = self._c[0] - r * self._c[1]
+        m = self._m[0] - r * self._m[1]
+
+        def stats(v):
+            scores = c[:, None] * v - m @ v
+            return (c @ v) / np.sqrt(self.scale * np.einsum('gb,gb->b', scores, scores))
+        return stats
+
+
+class _IVStatistic:
+    """
+    单个内生变量 x 的 2SLS 系数在原假设 β = r 下的 WRE 自助 t 统计量（外生变量和固定效应已投影掉）。
+    限制性结构残差 ũ = y - r x；第一阶段把 x 对 [Z, ũ] 回归得到 π̃，ṽ = x - Zπ̃；
+    自助样本 x* = Zπ̃ + v∘ṽ、y* = r x* + v∘ũ，只通过 Z_g'Z_g π̃、Z_g'ṽ_g、Z_g'ũ_g 三个 G×L 块，
+    以及控制变量与不嵌套的固定效应对 v∘ṽ、v∘ũ 的投影修正（nuisance）进入统计量。
+    ũ = ũ₀ - r x 对 r 线性，ṽ = x - Zπ̃ 对 π̃ 线性，投影修正按 y、x、Z 各列在构造时计算一次。
+    """
+
+    def __init__(self, y, x, z, codes, n_clusters, scale, nuisance):
+        self.y, self.x, self.z, self.codes, self.scale = y, x, z, codes, scale
+        self.bread_z = np.linalg.inv(z.T @ z)
+        self._k = None
+        if nuisance.projection(z, y) is not None:
+            self._k = (nuisance.projection(z, y), nuisance.projection(z, x),
+                       np.stack([nuisance.projection(z, z[:, l]) for l in range(z.shape[1])], axis=-1))
+
+    def at(self, r):
+        u = self.y - r * self.x
+        design = np.column_stack([self.z, u])
+        pi = np.linalg.lstsq(design, self.x, rcond=None)[0][:-1]
+        fitted = self.z @ pi
+        p = _group_sum(self.z * fitted[:, None], self.codes)
+        q = _group_sum(self.z * (self.x - fitted)[:, None], self.codes)
+        s = _group_sum(self.z * u[:, None], self.codes)
+        bread_z, scale = self.bread_z, self.scale
+        if self._k is not None:
+            k_y, k_x, k_z = self._k
+            k_u = k_y - r * k_x                                     # 对 v∘ũ 的投影
+            k_v = k_x - k_z @ pi                                    # 对 v∘ṽ 的投影
+
+        def stats(v):
+            zx = p[:, :, None] + q[:, :, None] * v[:, None, :]      # Z_g'x*_g，G × L × B
+            zu = s[:, :, None] * v[:, None, :]                      # Z_g'u*_g
+            if self._k is not None:
+                zx = zx - k_v @ v
+                zu = zu - k_u @ v
+            pi_hat = np.einsum('kl,gkb->lb', bread_z, zx)            # 第一阶段系数 (Z'Z)^{-1} Z'x*
+            denom = np.einsum('lb,glb->b', pi_hat, zx)               # x̂*'x*
+            delta = np.einsum('lb,glb->b', pi_hat, zu) / denom       # β* - r
+            scores = np.einsum('lb,glb->gb', pi_hat, zu - delta * zx)
+            # 聚类方差为 scale · Σ_g 得分² / (x̂*'x*)²
+            return delta * np.abs(denom) / np.sqrt(scale * np.einsum('gb,gb->b', scores, scores))
+        return stats
+
+
+def _p_value(stat, r, chunks, n_jobs):
+    """原假设 r 下的对称自助 P 值：|t*| ≥ |t̂| 的比例，t̂ 即全部权重为 1 时的统计量。"""
+    stats = stat.at(r)
+    observed = abs(stats(np.ones((chunks[0].shape[0], 1)))[0])
+    count = lambda v: int(np.count_nonzero(np.abs(stats(v)) >= observed))
+    if n_jobs is not None and n_jobs > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            total = sum(pool.map(count, chunks))
+    else:
+        total = sum(count(v) for v in chunks)
+    return total / sum(v.shape[1] for v in chunks)
+
+
+def _invert(stat, estimate, se, side, alpha, chunks, n_jobs, tol=1e-4, max_expand=20):
+    """
+    沿 side（-1 为下限，1 为上限）方向找自助 P 值降到 alpha 的原假设取值：先以标准误为步长倍增找到区间，
+    再二分到宽度小于 tol 个标准误。自助 P 值是阶梯函数，结果为其跨过 alpha 处的位置。
+    倍增 max_expand 次后 P 值仍不低于 alpha 时（弱工具变量下 WRE 区间可以无界）返回 ±inf。
+    """
+    inner, step = estimate, 2 * se
+    outer = None
+    for _ in range(max_expand):
+        candidate = estimate + side * step
+        if _p_value(stat, candidate, chunks, n_jobs) < alpha:
+            outer = candidate
+            break
+        inner, step = candidate, step * 2
+    if outer is None:
+        return side * np.inf
+    while abs(outer - inner) > tol * se:
+        middle = (inner + outer) / 2
+        if _p_value(stat, middle, chunks, n_jobs) < alpha:
+            outer = middle
+        else:
+            inner = middle
+    return (inner + outer) / 2
@@ -0,0 +1,249 @@
+import ast
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from 性能记录 import stage
+from 面板缓存 import evict_cache, file_fingerprint
+
+# 阶段结果缓存目录默认放在脚本旁边，可通过参数或环境变量 GWG_STAGE_CACHE 改到其它位置
+DEFAULT_STAGE_DIR = Path(os.environ.get('GWG_STAGE_CACHE', Path(__file__).with_name('.stage_cache')))
+DEFAULT_MAX_STAGE_BYTES = 2 * 1024 ** 3
+# 本项目的模块都是这个目录下的 .py 文件；阶段函数依赖的这些模块的源代码计入缓存键
+_PROJECT_DIR = Path(__file__).resolve().parent
+
+
+class StageGraph:
+    """
+    由分析阶段组成的有向无环图（读取 → 合并 → 插值 → 构造变量 → 拟合 → 汇总表），每个阶段的结果按内容寻址缓存到磁盘。
+
+    阶段的缓存键由以下内容的 SHA-256 得到：
+      - 阶段函数的模块名、限定名和源代码，以及它所在模块和该模块直接或间接导入的本项目模块的源文件
+        （如 fit_absorbed_ols 所在的 固定效应估计.py 及其导入的 共线性诊断.py、面板结构.py），
+        改动其中任何一个文件，依赖它的阶段即失效；第三方库不计入，升级 NumPy 等时可修改 version 使全部缓存失效
+      - params 中的全部参数（可 JSON 序列化的按取值，其余按 pickle 内容，函数按源代码）
+      - files 中各文件的指纹（路径、大小、修改时间、内容哈希）
+      - 全部上游阶段的缓存键
+    因此修改一个设定只会使该阶段及其下游的键变化，重新运行时其余阶段直接读取缓存。
+
+    run 时缓存缺失的阶段按依赖顺序计算，依赖已满足的阶段在线程池中并发执行（NumPy 的矩阵运算会释放 GIL，
+    且各阶段共用同一份内存中的数据，无需复制到子进程），如同一面板上的两个中介效应阶段。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_STAGE_DIR, max_workers=None, max_cache_bytes=DEFAULT_MAX_STAGE_BYTES,
+                 version=''):
+        self.cache_dir = Path(cache_dir)
+        self.max_workers = max_workers
+        self.max_cache_bytes = max_cache_bytes
+        self.version = version
+        self.nodes = {}
+        # 最近一次 run 中各阶段的状态：节点、状态（缓存/计算）、秒数、键
+        self.log = pd.DataFrame(columns=['节点', '状态', '秒数', '键'])
+
+    def add(self, name, fn, inputs=(), params=None, files=()):
+        """
+        加入阶段 name：运行时调用 fn(*各上游阶段的结果, **params)。
+        inputs 为上游阶段名，必须先于本阶段加入（图因此不会有环）；files 为需要跟踪内容变化的输入文件。
+        返回 name，便于作为下游阶段的 inputs。
+        """
+        if name in self.nodes:
+            raise ValueError(f"阶段 {name!r} 已存在")
+        missing = [dep for dep in inputs if dep not in self.nodes]
+        if missing:
+            raise ValueError(f"阶段 {name!r} 的上游阶段尚未加入: {missing}")
+        self.nodes[name] = _Node(name, fn, tuple(inputs), dict(params or {}), tuple(files))
+        return name
+
+    def keys(self):
+        """按加入顺序（即拓扑顺序）计算全部阶段的缓存键。"""
+        keys = {}
+        for name, node in self.nodes.items():
+            payload = {
+                'function': _function_id(node.fn),
+                'params': _fingerprint(node.params),
+                'files': [file_fingerprint(path) for path in node.files],
+                'inputs': [keys[dep] for dep in node.inputs],
+                'version': self.version,
+            }
+            blob = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+            keys[name] = hashlib.sha256(blob).hexdigest()
+        return keys
+
+    def run(self, targets=None):
+        """
+        计算 targets（默认为全部阶段）并返回 {阶段名: 结果}。
+        已缓存的阶段直接读取，其上游阶段不会被读取或计算；缓存缺失的阶段先取得上游结果再计算，
+        相互独立的阶段并发执行。运行结束后按 max_cache_bytes 淘汰最久未使用的缓存。
+        """
+        targets = list(self.nodes) if targets is None else list(targets)
+        unknown = [t for t in targets if t not in self.nodes]
+        if unknown:
+            raise ValueError(f"未知的阶段: {unknown}")
+        keys = self.keys()
+        paths = {name: self.cache_dir / f'{key}.pkl' for name, key in keys.items()}
+
+        # 依次确定目标阶段及其所需上游：缓存能读出的阶段直接取用，不再查看其上游；
+        # 读取失败（文件不存在、损坏、依赖的类已变化，或在检查后被淘汰）的阶段视为缓存缺失，递归取得其上游
+        values, log = {}, {}
+        pending = []
+
+        def need(name):
+            if name in values or name in pending:
+                return
+            start = time.perf_counter()
+            loaded = _load(paths[name]) if paths[name].exists() else _MISSING
+            if loaded is not _MISSING:
+                values[name] = loaded
+                try:
+                    os.utime(paths[name])
+                except OSError:
+                    pass
+                log[name] = ('缓存', time.perf_counter() - start)
+                return
+            for dep in self.nodes[name].inputs:
+                need(dep)
+            pending.append(name)
+
+        for name in targets:
+            need(name)
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            running = {}
+            while pending or running:
+                for name in [n for n in pending if all(dep in values for dep in self.nodes[n].inputs)]:
+                    pending.remove(name)
+                    args = [values[dep] for dep in self.nodes[name].inputs]
+                    running[pool.submit(_compute, self.nodes[name], args, paths[name])] = name
+                if not running:
+                    raise RuntimeError(f"阶段的上游结果缺失，无法继续: {pending}")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    values[name], seconds = future.result()
+                    log[name] = ('计算', seconds)
+
+        evict_cache(self.cache_dir, self.max_cache_bytes, pattern='*.pkl')
+        self.log = pd.DataFrame([(name, *log[name], keys[name][:12]) for name in self.nodes if name in log],
+                                columns=['节点', '状态', '秒数', '键'])
+        return {name: values[name] for name in targets}
+
+
+class _Node:
+    __slots__ = ('name', 'fn', 'inputs', 'params', 'files')
+
+    def __init__(self, name, fn, inputs, params, files):
+        self.name = name
+        self.fn = fn
+        self.inputs = inputs
+        self.params = params
+        self.files = files
+
+
+_MISSING = object()
+
+
+def _compute(node, args, path):
+    """在线程池中计算一个阶段并写入缓存，返回 (结果, 秒数)；结果无法序列化时只提示，不缓存。"""
+    start = time.perf_counter()
+    with stage(node.name) as s:
+        result = s.set_shape(node.fn(*args, **node.params))
+    seconds = time.perf_counter() - start
+    tmp_path = path.with_suffix(f'.{os.getpid()}.{id(node)}.tmp')
+    try:
+        with open(tmp_path, 'wb') as fh:
+            pickle.dump(result, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError) as exc:
+        tmp_path.unlink(missing_ok=True)
+        print(f"警告: 阶段 {node.name!r} 的结果无法缓存（{exc}）")
+        return result, seconds
+    # 先写临时文件再改名，避免中断时留下不完整的缓存
+    os.replace(tmp_path, path)
+    return result, seconds
+
+
+def _load(path):
+    """读取缓存的阶段结果；文件损坏或依赖的类已变化时视为缓存缺失。"""
+    try:
+        with open(path, 'rb') as fh:
+            return pickle.load(fh)
+    except Exception:
+        # 截断或被覆盖的文件可能引发各种异常（UnpicklingError、ValueError、KeyError 等），一律按缺失处理
+        return _MISSING
+
+
+def _function_id(fn):
+    """
+    函数的模块名、限定名和源代码哈希，加上所在模块及其递归导入的本项目模块的源文件哈希；
+    取不到源代码（如内置函数）时只用名称，不在本项目中的模块没有依赖部分。
+    """
+    try:
+        source = hashlib.sha256(inspect.getsource(fn).encode('utf-8')).hexdigest()
+    except (OSError, TypeError):
+        source = None
+    module = getattr(fn, '__module__', None)
+    return [module, getattr(fn, '__qualname__', repr(fn)), source, _module_closure(module)]
+
+
+def _module_closure(module):
+    """模块 module 及其直接或间接导入的本项目模块：按模块名排序的 [模块名, 源文件哈希] 列表。"""
+    hashes = {}
+    pending = [module]
+    while pending:
+        name = pending.pop()
+        path = _project_source(name)
+        if name in hashes or path is None:
+            continue
+        stat = path.stat()
+        hashes[name], imports = _source_info(str(path), stat.st_mtime_ns, stat.st_size)
+        pending.extend(imports)
+    return sorted([name, digest] for name, digest in hashes.items())
+
+
+def _project_source(module):
+    """模块的源文件路径；不是本项目目录下的 .py 文件时为 None（第三方库、内置模块等）。"""
+    if module is None:
+        return None
+    path = getattr(sys.modules.get(module), '__file__', None)
+    path = Path(path).resolve() if path else _PROJECT_DIR / f'{module}.py'
+    return path if path.suffix == '.py' and path.parent == _PROJECT_DIR and path.exists() else None
+
+
+@functools.lru_cache(maxsize=None)
+def _source_info(path, mtime_ns, size):
+    """源文件的哈希及其中导入的顶层模块名（含函数内部的延迟导入）；按修改时间和大小缓存，文件变化后重新读取。"""
+    source = Path(path).read_bytes()
+    imports = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            imports.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            imports.add(node.module.split('.')[0])
+    return hashlib.sha256(source).hexdigest(), tuple(sorted(imports))
+
+
+def _fingerprint(value):
+    """把参数转换为可 JSON 序列化、且取值相同则结果相同的形式。"""
+    if isinstance(value, dict):
+        return {str(key): _fingerprint(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_fingerprint(item) for item in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Path):
+        return str(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if callable(value):
+        return {'function': _function_id(value)}
+    return {'pickle': hashlib.sha256(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()}
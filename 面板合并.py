@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+KEYS = ['Country', 'Year']
+
+
+def join_panel(frames, how='outer'):
+    """
+    将任意多个 read_and_melt 返回的长格式指标表（Year, Country, 指标）一次性对齐成面板。
+
+    全部表的 Country 与 Year 只各做一次 factorize，在 国家×年份 整数网格上定位每一行，
+    再按网格位置把每个指标直接写入结果数组，代替逐个 merge
+    （每次 merge 都要重新哈希键并复制已合并的全部列）。
+      - how='outer'：保留任一指标出现过的 (Country, Year)
+      - how='inner'：只保留全部指标都出现的 (Country, Year)
+
+    返回 (面板, 覆盖情况)：
+      - 面板为按 Country、Year 排序的长格式 DataFrame，列为 Year, Country 和各指标
+      - 覆盖情况以指标为索引，给出非缺失观测数、占面板行数的比例、国家数和年份范围
+    """
+    if how not in ('outer', 'inner'):
+        raise ValueError(f"how 只能为 'outer' 或 'inner'，收到: {how!r}")
+    if not frames:
+        raise ValueError("至少需要一个指标表")
+
+    # 每个表各自 factorize，再把各表的取值并到统一（排序后）的编码上，编码顺序即排序顺序
+    country_codes, countries = _shared_codes([f['Country'] for f in frames])
+    year_codes, years = _shared_codes([f['Year'] for f in frames])
+    n_cells = len(countries) * len(years)
+    # Country 或 Year 缺失的行无法对齐，统一落到网格末尾的哨兵位置 n_cells
+    frame_keys = [np.where((c >= 0) & (y >= 0), c.astype('int64') * len(years) + y, n_cells)
+                  for c, y in zip(country_codes, year_codes)]
+
+    # 在 国家×年份 的整数网格上计数，既用于检查重复键，也用于确定 outer / inner 的行集合
+    value_cols = []
+    counts = np.zeros(n_cells, dtype='int32')
+    for frame, fkeys in zip(frames, frame_keys):
+        cols = [c for c in frame.columns if c not in KEYS]
+        frame_counts = np.bincount(fkeys, minlength=n_cells + 1)[:n_cells]
+        if frame_counts.max(initial=0) > 1:
+            raise ValueError(f"指标 {cols} 存在重复的 (Country, Year) 键")
+        counts += frame_counts.astype('int32')
+        value_cols.append(cols)
+
+    flat_cols = [c for cols in value_cols for c in cols]
+    if len(set(flat_cols)) != len(flat_cols):
+        raise ValueError(f"指标名称重复: {flat_cols}")
+
+    panel_keys = np.flatnonzero(counts > 0 if how == 'outer' else counts == len(frames))
+    # 网格位置 -> 面板行号，不在面板中的位置为 -1
+    row_of = np.full(n_cells + 1, -1, dtype='int64')
+    row_of[panel_keys] = np.arange(len(panel_keys))
+
+    columns = {
+        'Year': years[panel_keys % len(years)],
+        'Country': countries[panel_keys // len(years)],
+    }
+    coverage = []
+    for frame, fkeys, cols in zip(frames, frame_keys, value_cols):
+        rows = row_of[fkeys]
+        hit = rows >= 0
+        for col in cols:
+            values = frame[col].to_numpy()
+            if pd.api.types.is_numeric_dtype(values.dtype):
+                out = np.full(len(panel_keys), np.nan)
+            else:
+                out = np.full(len(panel_keys), np.nan, dtype=object)
+            out[rows[hit]] = values[hit]
+            columns[col] = out
+
+            # 覆盖情况直接在整数键上统计，不再回到字符串列
+            present = fkeys[hit & pd.notna(values)]
+            present_years = present % len(years)
+            coverage.append({
+                '指标': col,
+                '非缺失观测': len(present),
+                '覆盖率': len(present) / len(panel_keys) if len(panel_keys) else np.nan,
+                '国家数': np.count_nonzero(np.bincount(present // len(years), minlength=len(countries))),
+                '起始年份': years[present_years.min()] if len(present) else np.nan,
+                '结束年份': years[present_years.max()] if len(present) else np.nan,
+            })
+
+    panel = pd.DataFrame(columns)
+    return panel, pd.DataFrame(coverage).set_index('指标')
+
+
+def _shared_codes(series_list):
+    """对多列分别 factorize 后映射到统一的排序编码，返回 (每列的编码列表, 排序后的取值)。"""
+    factorized = [pd.factorize(s) for s in series_list]
+    uniques = pd.Index(np.concatenate([np.asarray(u) for _, u in factorized])).unique().sort_values()
+    codes = [np.where(c >= 0, uniques.get_indexer(u)[c], -1) for c, u in factorized]
+    return codes, uniques.to_numpy()
+
+
+def panel_coverage(panel, columns):
+    """统计各指标在面板中的覆盖情况（非缺失观测数、覆盖率、国家数、起止年份）。"""
+    rows = []
+    for col in columns:
+        present = panel.loc[panel[col].notna(), KEYS]
+        rows.append({
+            '指标': col,
+            '非缺失观测': len(present),
+            '覆盖率': len(present) / len(panel) if len(panel) else float('nan'),
+            '国家数': present['Country'].nunique(),
+            '起始年份': present['Year'].min(),
+            '结束年份': present['Year'].max(),
+        })
+    return pd.DataFrame(rows).set_index('指标')
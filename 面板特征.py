@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+
+from 面板结构 import PanelFrame
+
+GAP_MODES = ('missing', 'previous')
+
+
+def panel_features(data, columns, lags=(), leads=(), diffs=(), moving_averages=(), entity='Country', time='Year',
+                   gaps='missing', min_periods=None):
+    """
+    一次性为多个变量构造滞后、超前、差分和移动平均变量，按实际年份对齐。
+
+    新列命名：
+      - {变量}_lag{k}：t - k 年的取值
+      - {变量}_lead{k}：t + k 年的取值
+      - {变量}_diff{k}：t 年取值减 t - k 年取值
+      - {变量}_ma{w}：t - w + 1 到 t 年的移动平均，窗口内非缺失年份不少于 min_periods（默认 w）时才计算
+    例如分布滞后模型的 5 阶滞后：panel_features(df, regressors, lags=range(1, 6))。
+
+    年份缺口的处理（gaps）：
+      - 'missing'：严格按年份对齐，所需年份不在面板中时结果为缺失（默认）
+      - 'previous'：按国家内的行位置移动，即取前（后）第 k 个观测到的年份，等价于 groupby(...).shift(k)，
+        仅在确认年份缺口可以忽略时使用
+    全部国家×年份先编码到一张整数网格上，每个年份偏移只做一次查表，所有变量共用同一组行号，
+    不再逐列分组移位。
+
+    data 可为长格式 DataFrame（entity、time 为列或 MultiIndex）或 PanelFrame，返回同类型的结果，
+    DataFrame 保持原有的行顺序和索引。
+    返回 (加入新列的数据, 各新列因年份缺口而缺失的单元格数)；年份缺口指所需年份落在该国家
+    首末年份之间却不在面板中，样本首末年份以外的缺失不计入。
+    """
+    if gaps not in GAP_MODES:
+        raise ValueError(f"gaps 只能为 'missing' 或 'previous'，收到: {gaps!r}")
+    columns = list(columns)
+    lags, leads, diffs, windows = (_check_orders(orders, label) for orders, label in
+                                   ((lags, 'lags'), (leads, 'leads'), (diffs, 'diffs'),
+                                    (moving_averages, 'moving_averages')))
+
+    if isinstance(data, PanelFrame):
+        codes, years, offsets, order = data.entity_codes, data.years.astype('int64'), data.offsets, None
+        values = data.values(columns).T
+    else:
+        if entity in data.columns:
+            entity_values, time_values = data[entity], data[time]
+        else:
+            entity_values, time_values = data.index.get_level_values(entity), data.index.get_level_values(time)
+        codes, _ = pd.factorize(entity_values)
+        if (codes < 0).any():
+            raise ValueError(f"{entity} 存在缺失值")
+        years = pd.to_numeric(time_values).to_numpy(dtype='float64')
+        if np.isnan(years).any() or (years != np.round(years)).any():
+            raise ValueError(f"{time} 必须是整数年份")
+        years = years.astype('int64')
+        # 按 (国家, 年份) 排序后每个国家的行连续，offsets 给出各国家的起止行
+        order = np.lexsort((years, codes))
+        codes, years = codes[order], years[order]
+        offsets = np.r_[0, np.cumsum(np.bincount(codes))]
+        values = np.ascontiguousarray(data[columns].to_numpy(dtype='float64').T)
+        duplicated = (codes[1:] == codes[:-1]) & (years[1:] == years[:-1])
+        if duplicated.any():
+            row = int(np.flatnonzero(duplicated)[0]) + 1
+            raise ValueError(f"存在重复的 ({entity}, {time}) 键: "
+                             f"({np.asarray(entity_values)[order[row]]}, {years[row]})")
+
+    # 结果直接按输出行顺序取值：DataFrame 为原始行顺序（values 不排序），PanelFrame 为排序后的顺序
+    if order is None:
+        inverse = None
+    else:
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+    shifter = _Shifter(values, codes, years, offsets, gaps, order, inverse)
+    blocks, suffixes = [], []
+
+    def add(suffix, result, gap):
+        blocks.append((result, gap))
+        suffixes.append(suffix)
+
+    for k in lags:
+        add(f'lag{k}', *shifter.shift(k))
+    for k in leads:
+        add(f'lead{k}', *shifter.shift(-k))
+    for k in diffs:
+        lagged, gap = shifter.shift(k)
+        add(f'diff{k}', shifter.shift(0)[0] - lagged, gap)
+    for w in windows:
+        needed = w if min_periods is None else min_periods
+        total = np.zeros((len(columns), len(codes)))
+        count = np.zeros(total.shape, dtype='int64')
+        gap = np.zeros(len(codes), dtype=bool)
+        for k in range(w):
+            lagged, lag_gap = shifter.shift(k)
+            present = ~np.isnan(lagged)
+            total += np.where(present, lagged, 0.0)
+            count += present
+            gap |= lag_gap
+        with np.errstate(invalid='ignore', divide='ignore'):
+            add(f'ma{w}', np.where(count >= needed, total / count, np.nan), gap)
+
+    # 新列按变量分组：同一变量的滞后、超前、差分、移动平均相邻
+    names = [f'{col}_{suffix}' for col in columns for suffix in suffixes]
+    # 各块为 (变量数, 行数)，按变量、块的顺序堆叠后转置即为 (行数, 新列数) 的 Fortran 序数组，
+    # pandas 按列存储，构造 DataFrame 时无需再复制转置
+    if blocks:
+        features = np.stack([result for result, _ in blocks], axis=1).reshape(len(names), -1)
+        gap_counts = np.stack([(gap & np.isnan(result)).sum(axis=1) for result, gap in blocks], axis=1)
+    else:
+        features, gap_counts = np.empty((0, len(codes))), np.empty((len(columns), 0))
+    gap_counts = pd.Series(gap_counts.reshape(-1).astype('int64'), index=names, name='年份缺口单元格数')
+
+    if order is None:
+        result = PanelFrame.__new__(PanelFrame)
+        result.__dict__.update(data.__dict__)
+        result._columns = dict(data._columns)
+        for name, column in zip(names, features):
+            result._columns[name] = column
+        return result, gap_counts
+
+    # DataFrame：已存在的同名列被替换
+    features = pd.DataFrame(features.T, columns=names, index=data.index, copy=False)
+    return pd.concat([data.drop(columns=[n for n in names if n in data.columns]), features], axis=1), gap_counts
+
+
+def _check_orders(orders, label):
+    """阶数须为正整数，去重并排序。"""
+    orders = sorted({int(k) for k in np.atleast_1d(orders)}) if np.size(orders) else []
+    if any(k < 1 for k in orders):
+        raise ValueError(f"{label} 的阶数必须为正整数，收到: {orders}")
+    return orders
+
+
+class _Shifter:
+    """
+    在已按 (国家, 年份) 排序的面板上取 t - k 年（k 为负时为 t + |k| 年）的取值，同一偏移只计算一次行号。
+    values 按变量存储为 (变量数, n)，末尾补一列缺失值作为哨兵，无来源的行指向哨兵列，
+    行号对全部变量通用，取值是沿行方向的一次 take。
+    给定 order/inverse 时 values 为原始行顺序：来源行号经 order 映射为原始行号，再按 inverse 排回原始行顺序，
+    数据本身无需排序或重排。
+    """
+
+    def __init__(self, values, codes, years, offsets, gaps, order=None, inverse=None):
+        self.padded = np.hstack([values, np.full((len(values), 1), np.nan)])
+        self.gaps = gaps
+        self.years = years
+        self.rows = np.arange(len(years))
+        self.start = offsets[:-1][codes]
+        self.end = offsets[1:][codes]
+        if gaps == 'missing' and len(years):
+            # 国家×年份整数网格：网格位置 -> 行号，不在面板中的位置为 -1
+            self.first_year = int(years.min())
+            self.span = int(years.max()) - self.first_year + 1
+            self.key = codes.astype('int64') * self.span + (years - self.first_year)
+            self.row_of = np.full((int(codes.max()) + 1) * self.span, -1, dtype='int64')
+            self.row_of[self.key] = self.rows
+            self.entity_first = years[self.start]
+            self.entity_last = years[self.end - 1]
+        self.order = order
+        self.inverse = inverse
+        self._cache = {}
+
+    def source(self, k):
+        """返回 (来源行号，无来源时为哨兵列 n；是否因年份缺口而无来源)。"""
+        if k not in self._cache:
+            n = len(self.rows)
+            if k == 0:
+                src, gap = self.rows, np.zeros(n, dtype=bool)
+            elif self.gaps == 'previous':
+                src = self.rows - k
+                src = np.where((src >= self.start) & (src < self.end), src, n)
+                gap = np.zeros(n, dtype=bool)
+            else:
+                target = self.years - k
+                inside = (target >= self.entity_first) & (target <= self.entity_last)
+                # 目标年份在国家首末年份之间时，网格位置 key - k 必然落在该国家自己的行块内
+                src = np.where(inside, self.row_of[np.where(inside, self.key - k, 0)], -1)
+                gap = inside & (src < 0)
+                src = np.where(src >= 0, src, n)
+            if self.order is not None:
+                src, gap = np.r_[self.order, n][src][self.inverse], gap[self.inverse]
+            self._cache[k] = (src, gap)
+        return self._cache[k]
+
+    def shift(self, k):
+        src, gap = self.source(k)
+        return np.take(self.padded, src, axis=1), gap
@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+from 缺失值处理 import FILL_METHODS, _check_methods, _fill_sorted
+
+
+class PanelFrame:
+    """
+    紧凑的长格式面板：国家存为 int32 编码，年份存为 int16，行按 (国家, 年份) 排序。
+
+    构造时只对国家名做一次哈希，之后滞后、补缺、组内变换和聚类都直接使用预先算好的整数编码：
+      - entities：排序后的国家名；entity_codes：每行的国家编码（int32）
+      - years：每行的年份（int16）；time_levels：排序后的年份；time_codes：每行的年份编码（int32）
+      - offsets：长度为 国家数 + 1，第 i 个国家的行位于 offsets[i]:offsets[i + 1]
+      - balanced：每个国家恰好覆盖全部年份各一次
+    数值列保存为 float64 数组，用 panel['GWG'] 读取、panel['GWG_lag1'] = 数组 写入。
+    与 DataFrame 互相转换见 from_frame / to_frame。
+    """
+
+    def __init__(self, entities, entity_codes, years, columns, entity='Country', time='Year'):
+        """entity_codes、years 须已按 (国家, 年份) 排序；一般通过 from_frame 构造。"""
+        self.entity = entity
+        self.time = time
+        self.entities = pd.Index(entities, name=entity)
+        self.entity_codes = np.asarray(entity_codes, dtype='int32')
+        self.years = np.asarray(years, dtype='int16')
+
+        # 年份范围很小，用 bincount 而不是排序或哈希得到编码
+        first = int(self.years.min()) if len(self.years) else 0
+        span = self.years.astype('int64') - first
+        present = np.bincount(span) > 0
+        self.time_levels = (np.flatnonzero(present) + first).astype('int16')
+        self.time_codes = (np.cumsum(present) - 1).astype('int32')[span]
+
+        duplicated = (self.entity_codes[1:] == self.entity_codes[:-1]) & (self.years[1:] == self.years[:-1])
+        if duplicated.any():
+            row = int(np.flatnonzero(duplicated)[0])
+            raise ValueError(f"存在重复的 ({entity}, {time}) 键: "
+                             f"({self.entities[self.entity_codes[row]]}, {self.years[row]})")
+        counts = np.bincount(self.entity_codes, minlength=len(self.entities))
+        self.offsets = np.r_[0, np.cumsum(counts)]
+        self.balanced = bool(len(counts) and (counts == len(self.time_levels)).all())
+
+        self._columns = {}
+        for name, values in columns.items():
+            self[name] = values
+
+    @classmethod
+    def from_frame(cls, df, entity='Country', time='Year', columns=None):
+        """
+        由长格式 DataFrame（如 read_and_melt、load_panel 的结果，entity、time 为列）
+        或以 (entity, time) 为 MultiIndex 的 DataFrame（PanelOLS 使用的格式）构造。
+        columns 为要保留的数值列，默认为除 entity、time 外的全部数值列。
+        """
+        if entity not in df.columns and isinstance(df.index, pd.MultiIndex):
+            df = df.reset_index()
+        years = pd.to_numeric(df[time]).to_numpy(dtype='float64')
+        if np.isnan(years).any() or (years != np.round(years)).any():
+            raise ValueError(f"{time} 必须是整数年份")
+        codes, entities = pd.factorize(df[entity], sort=True)
+        if (codes < 0).any():
+            raise ValueError(f"{entity} 存在缺失值")
+        if columns is None:
+            columns = [c for c in df.columns if c not in (entity, time) and pd.api.types.is_numeric_dtype(df[c])]
+        order = np.lexsort((years, codes))
+        data = {c: df[c].to_numpy(dtype='float64')[order] for c in columns}
+        return cls(entities, codes[order], years[order], data, entity=entity, time=time)
+
+    def to_frame(self, index=False):
+        """
+        转回 DataFrame：index=False 时为 Year, Country 加数值列的长格式（与 load_panel 的结果相同），
+        index=True 时以 (Country, Year) 为 MultiIndex，可直接用于 PanelOLS。
+        """
+        df = pd.DataFrame({
+            self.time: self.years.astype('int64'),
+            self.entity: self.entities.take(self.entity_codes).to_numpy(),
+            **self._columns,
+        })
+        return df.set_index([self.entity, self.time]) if index else df
+
+    @property
+    def index(self):
+        """(国家, 年份) MultiIndex，直接由编码构造，不重新哈希。"""
+        return pd.MultiIndex(levels=[self.entities, pd.Index(self.time_levels.astype('int64'), name=self.time)],
+                             codes=[self.entity_codes, self.time_codes], verify_integrity=False)
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    @property
+    def n_entities(self):
+        return len(self.entities)
+
+    @property
+    def n_times(self):
+        return len(self.time_levels)
+
+    def __len__(self):
+        return len(self.entity_codes)
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def __getitem__(self, name):
+        return self._columns[name]
+
+    def __setitem__(self, name, values):
+        values = np.asarray(values, dtype='float64')
+        if values.shape != (len(self),):
+            raise ValueError(f"列 {name} 的长度为 {len(values)}，面板行数为 {len(self)}")
+        self._columns[name] = values
+
+    def values(self, columns):
+        """返回 columns 对应的 (n, k) float64 数组。"""
+        return np.column_stack([self._columns[c] for c in columns]) if columns else np.empty((len(self), 0))
+
+    def __repr__(self):
+        kind = '平衡' if self.balanced else '非平衡'
+        return (f"PanelFrame({kind}面板, 观测数={len(self)}, 国家数={self.n_entities}, "
+                f"年份数={self.n_times}, 列={self.columns})")
+
+    def take(self, mask):
+        """按布尔掩码保留行（保持排序），国家编码重新压缩为连续整数。"""
+        codes = self.entity_codes[mask]
+        present = np.bincount(codes, minlength=self.n_entities) > 0
+        remap = np.cumsum(present) - 1
+        return PanelFrame(self.entities[present], remap[codes], self.years[mask],
+                          {name: values[mask] for name, values in self._columns.items()},
+                          entity=self.entity, time=self.time)
+
+    def dropna(self, columns=None):
+        """删除 columns（默认全部数值列）中任一缺失的行。"""
+        columns = self.columns if columns is None else list(columns)
+        return self.take(~np.isnan(self.values(columns)).any(axis=1))
+
+    def fill_gaps(self, columns, method=FILL_METHODS, max_gap=None):
+        """
+        与 fill_panel_gaps 相同的补缺，但直接用 offsets 定位每个国家的起止行，不再分组和排序。
+        返回 (补缺后的新 PanelFrame, 各变量补缺单元格数)；未补缺的列与原面板共用数组。
+        """
+        method = _check_methods(method)
+        columns = list(columns)
+        values = self.values(columns)
+        filled = _fill_sorted(values, self.years.astype('float64'), self.offsets[:-1][self.entity_codes],
+                              self.offsets[1:][self.entity_codes] - 1, method, max_gap)
+        result = PanelFrame.__new__(PanelFrame)
+        result.__dict__.update(self.__dict__)
+        result._columns = dict(self._columns)
+        for j, name in enumerate(columns):
+            result._columns[name] = filled[:, j]
+        imputed = pd.Series((np.isnan(values) & ~np.isnan(filled)).sum(axis=0), index=columns, name='补缺单元格数')
+        return result, imputed
+
+    def within(self, columns, entity_effects=True, time_effects=True):
+        """对 columns 做吸收国家和/或年份固定效应的组内变换，平衡面板标志直接取自 balanced。"""
+        # 组内变换在估计模块中实现，这里按需导入以避免两个模块互相依赖
+        from 固定效应估计 import within_transform
+        return within_transform(self.values(columns),
+                                self.entity_codes if entity_effects else None,
+                                self.time_codes if time_effects else None,
+                                balanced=self.balanced if entity_effects and time_effects else None)
+
+    def cluster_codes(self, cluster='entity'):
+        """聚类编码：'entity' 为国家，'time' 为年份，'both' 为二者的元组（双向聚类）。"""
+        return {'entity': self.entity_codes, 'time': self.time_codes,
+                'both': (self.entity_codes, self.time_codes)}[cluster]
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from 性能记录 import stage
+from 数据加载 import raise_for_failures, read_sources
+from 缺失值处理 import fill_panel_gaps
+from 面板合并 import join_panel
+
+# 缓存目录默认放在脚本旁边，可通过参数或环境变量 GWG_PANEL_CACHE 改到其它位置
+DEFAULT_CACHE_DIR = Path(os.environ.get('GWG_PANEL_CACHE', Path(__file__).with_name('.panel_cache')))
+# 缓存总大小上限（字节），超出时按最近使用时间淘汰最旧的面板
+DEFAULT_MAX_CACHE_BYTES = 2 * 1024 ** 3
+# 面板构建逻辑（合并、补缺）变化时递增，使旧缓存失效
+PANEL_BUILD_VERSION = 2
+
+
+def file_fingerprint(file_path, chunk_size=1024 * 1024):
+    """
+    计算源工作簿的指纹：绝对路径、文件大小、修改时间和内容的 SHA-256。
+    只要其中任何一项变化，对应的缓存面板就会失效。
+    """
+    path = Path(file_path).resolve()
+    stat = path.stat()
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            sha.update(chunk)
+    return {'path': str(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha.hexdigest()}
+
+
+def panel_cache_key(sources, **options):
+    """
+    由全部源文件指纹和清洗选项生成缓存键。
+    sources 为 {变量名: 文件路径}，变量顺序也计入键中，因为它决定了合并后的列顺序。
+    """
+    payload = {
+        'sources': [[var_name, file_fingerprint(path)] for var_name, path in sources.items()],
+        'options': options,
+        'version': PANEL_BUILD_VERSION,
+    }
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(blob).hexdigest()
+
+
+def build_panel(sources, how='outer', fill=True, dropna=False, n_jobs=None):
+    """
+    读取 {变量名: 文件路径} 中的全部工作簿，按 Year 与 Country 合并成长格式面板。
+      - fill=True 时按 Country 分组线性插值，再前向、后向填充
+      - dropna=True 时删除变量仍存在缺失的观测
+      - n_jobs：并行解析工作簿的进程数，见 read_sources
+    任何工作簿读取失败时，列出全部失败的文件及其路径后报错。
+    """
+    numeric_vars = list(sources)
+    with stage('读取工作簿') as s:
+        frames, failures = read_sources(sources, n_jobs=n_jobs)
+        s.rows, s.cols = sum(len(f) for f in frames.values()), len(frames)
+    raise_for_failures(failures)
+
+    # 以 Year 和 Country 为键一次性对齐全部指标，结果已按 Country、Year 排序
+    with stage('合并面板') as s:
+        df_panel, _ = s.set_shape(join_panel(list(frames.values()), how=how))
+
+    if fill:
+        with stage('插值填充') as s:
+            df_panel, _ = s.set_shape(fill_panel_gaps(df_panel, numeric_vars))
+
+    if dropna:
+        df_panel = df_panel.dropna(subset=numeric_vars).reset_index(drop=True)
+    return df_panel
+
+
+def evict_cache(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_CACHE_BYTES, pattern='*.parquet'):
+    """按最近使用时间（文件 mtime）从旧到新删除与 pattern 匹配的缓存，直到总大小不超过 max_bytes。"""
+    entries = sorted(Path(cache_dir).glob(pattern), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in entries)
+    for path in entries:
+        if total <= max_bytes:
+            break
+        total -= path.stat().st_size
+        path.unlink()
+
+
+def load_panel(sources, how='outer', fill=True, dropna=False, cache_dir=DEFAULT_CACHE_DIR,
+               max_cache_bytes=DEFAULT_MAX_CACHE_BYTES, use_cache=True, n_jobs=None):
+    """
+    与 build_panel 参数相同，但先查磁盘缓存：
+      - 命中时直接读取 Parquet 面板，完全跳过 openpyxl 解析、合并和插值
+      - 未命中时构建面板并写入缓存，随后按 max_cache_bytes 淘汰旧缓存
+    未安装 pyarrow 时退化为每次直接构建。n_jobs 只影响构建时的并行读取，不计入缓存键。
+    """
+    if not use_cache:
+        return build_panel(sources, how=how, fill=fill, dropna=dropna, n_jobs=n_jobs)
+
+    cache_dir = Path(cache_dir)
+    key = panel_cache_key(sources, how=how, fill=fill, dropna=dropna)
+    cache_path = cache_dir / f'{key}.parquet'
+
+    if cache_path.exists():
+        try:
+            with stage('读取面板缓存') as s:
+                df_panel = s.set_shape(pd.read_parquet(cache_path))
+        except ImportError:
+            return build_panel(sources, how=how, fill=fill, dropna=dropna, n_jobs=n_jobs)
+        # 更新修改时间，作为 LRU 淘汰的依据
+        os.utime(cache_path)
+        return df_panel
+
+    df_panel = build_panel(sources, how=how, fill=fill, dropna=dropna, n_jobs=n_jobs)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix('.parquet.tmp')
+    try:
+        df_panel.to_parquet(tmp_path, index=False)
+    except ImportError:
+        print("警告: 未安装 pyarrow，面板缓存未启用")
+        return df_panel
+    # 先写临时文件再改名，避免中断时留下不完整的缓存
+    os.replace(tmp_path, cache_path)
+    evict_cache(cache_dir, max_cache_bytes)
+    return df_panel
+
+
+def cached_panel_path(sources, how='outer', fill=True, dropna=False, cache_dir=DEFAULT_CACHE_DIR,
+                      max_cache_bytes=DEFAULT_MAX_CACHE_BYTES):
+    """
+    返回面板缓存（Parquet 文件）的路径，缓存不存在时先构建并写入。
+    供 fit_streaming 等按块读取的代码使用，无需把面板读入内存；需要 pyarrow。
+    """
+    key = panel_cache_key(sources, how=how, fill=fill, dropna=dropna)
+    cache_path = Path(cache_dir) / f'{key}.parquet'
+    if not cache_path.exists():
+        load_panel(sources, how=how, fill=fill, dropna=dropna, cache_dir=cache_dir, max_cache_bytes=max_cache_bytes)
+        if not cache_path.exists():
+            raise ImportError("未安装 pyarrow，无法写入面板缓存")
+    return cache_path